@@ -0,0 +1,87 @@
+"""
+Benchmarks of the algorithms in :mod:`clifford.tools.g3c`
+"""
+import contextlib
+import io
+
+import numpy as np
+
+from clifford.tools.g3c import (
+    random_line, random_sphere, random_conformal_point, random_euc_mv,
+    random_rotation_translation_rotor, generate_random_object_cluster,
+    generate_n_clusters, project_points_to_sphere, apply_rotor, up, down
+)
+from clifford.tools.g3c.cost_functions import object_set_cost_matrix
+from clifford.tools.g3c.model_matching import REFORM
+from clifford.tools.g3c.object_clustering import n_clusters_objects
+from clifford.tools.g3c.object_fitting import fit_sphere
+
+
+class CostMatrix:
+    """ :func:`clifford.tools.g3c.cost_functions.object_set_cost_matrix` between two sets of lines """
+    params = ([10, 100], ['generic', 'lines'])
+    param_names = ['n', 'object_type']
+
+    def setup(self, n, object_type):
+        np.random.seed(0)
+        self.a = [random_line() for i in range(n)]
+        self.b = [random_line() for i in range(n)]
+        object_set_cost_matrix(self.a[:1], self.b[:1], object_type=object_type)
+
+    def time_object_set_cost_matrix(self, n, object_type):
+        object_set_cost_matrix(self.a, self.b, object_type=object_type)
+
+
+class ModelMatching:
+    """ Registering a displaced cluster of lines with :func:`clifford.tools.g3c.model_matching.REFORM` """
+    params = [10, 20]
+    param_names = ['n_objects']
+    timeout = 300
+
+    def setup(self, n_objects):
+        np.random.seed(0)
+        self.query = generate_random_object_cluster(
+            n_objects, random_line, max_cluster_trans=0.5, max_cluster_rot=np.pi / 3)
+        disturbance_rotor = random_rotation_translation_rotor(maximum_translation=2, maximum_angle=np.pi / 8)
+        self.reference = [apply_rotor(c, disturbance_rotor).normal() for c in self.query]
+        self._reform(iterations=1)
+
+    def _reform(self, iterations):
+        # REFORM prints its progress
+        with contextlib.redirect_stdout(io.StringIO()):
+            REFORM(self.reference, self.query, n_samples=8, objects_per_sample=5,
+                   iterations=iterations, covergence_threshold=0.00000001)
+
+    def time_REFORM(self, n_objects):
+        self._reform(iterations=5)
+
+
+class Clustering:
+    """ Clustering lines with :func:`clifford.tools.g3c.object_clustering.n_clusters_objects` """
+    params = [2, 5]
+    param_names = ['n_clusters']
+    timeout = 300
+
+    def setup(self, n_clusters):
+        np.random.seed(0)
+        self.objects, _ = generate_n_clusters(random_line, n_clusters, 10)
+        n_clusters_objects(n_clusters, self.objects[:2 * n_clusters])
+
+    def time_n_clusters_objects(self, n_clusters):
+        n_clusters_objects(n_clusters, self.objects)
+
+
+class ObjectFitting:
+    """ Fitting a sphere to noisy points with :func:`clifford.tools.g3c.object_fitting.fit_sphere` """
+    params = [100, 1000]
+    param_names = ['n_points']
+
+    def setup(self, n_points):
+        np.random.seed(0)
+        sphere = random_sphere()
+        point_list = project_points_to_sphere([random_conformal_point() for i in range(n_points)], sphere)
+        self.point_list = [up(down(P) + 0.1 * random_euc_mv()) for P in point_list]
+        fit_sphere(self.point_list[:10])
+
+    def time_fit_sphere(self, n_points):
+        fit_sphere(self.point_list)
@@ -0,0 +1,111 @@
+"""
+Benchmarks of writing and reading files of multivectors
+"""
+import functools
+import os
+import tempfile
+
+import numpy as np
+
+from clifford.g3c import layout
+from clifford.io import (
+    write_ga_file, read_ga_file, write_json_file, read_json_file, hdf5plugin_available
+)
+from clifford.tools.g3c import random_conformal_point, random_line, random_rotation_translation_rotor
+
+
+class RoundTrip:
+    """ Writing and then reading back an ``(n, gaDims)`` array of coefficients """
+    params = ([100, 10000], ['ga', 'json', 'json-buffer', 'json-list'], [False, True])
+    param_names = ['n', 'format', 'compression']
+    timeout = 300
+
+    def setup(self, n, format, compression):
+        if format.startswith('json') and compression:
+            # json files are never compressed
+            raise NotImplementedError
+        np.random.seed(0)
+        self.compression = compression
+        self.value = np.random.randn(n, layout.gaDims)
+        self.basis_names = np.array(list(sorted(layout.basis_vectors.keys())), dtype=bytes)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        if format == 'ga':
+            self.file_name = os.path.join(self.tmpdir.name, 'test.ga')
+            self.write, self.read = write_ga_file, read_ga_file
+        else:
+            self.file_name = os.path.join(self.tmpdir.name, 'test.json')
+            encoding = {'json': 'base64', 'json-buffer': 'buffer', 'json-list': 'list'}[format]
+            self.write = functools.partial(write_json_file, encoding=encoding)
+            self.read = read_json_file
+        # a file for the read benchmark
+        self._write()
+
+    def teardown(self, n, format, compression):
+        self.tmpdir.cleanup()
+
+    def _write(self):
+        self.write(self.file_name, self.value, layout.metric, self.basis_names,
+                   compression=self.compression, transpose=False,
+                   sparse=False, support=False)
+
+    def time_write(self, n, format, compression):
+        self._write()
+
+    def time_read(self, n, format, compression):
+        self.read(self.file_name)
+
+    def time_round_trip(self, n, format, compression):
+        self._write()
+        self.read(self.file_name)
+
+    def track_file_size(self, n, format, compression):
+        # including any side-car files
+        return sum(
+            os.path.getsize(os.path.join(self.tmpdir.name, f))
+            for f in os.listdir(self.tmpdir.name)
+        )
+    track_file_size.unit = 'bytes'
+
+
+class Compression:
+    """ Writing and reading ga files of ``n`` g3c objects with each compressor """
+    params = (
+        ['points', 'lines', 'rotors'],
+        ['gzip', 'gzip-shuffle', 'lzf', 'lzf-shuffle', 'blosc:lz4', 'blosc:zstd'],
+        [1, 4],
+    )
+    param_names = ['objects', 'compression', 'threads']
+    timeout = 300
+    n = 10000
+
+    def setup(self, objects, compression, threads):
+        if compression.startswith('blosc') and not hdf5plugin_available:
+            raise NotImplementedError
+        np.random.seed(0)
+        random_object = {
+            'points': random_conformal_point,
+            'lines': random_line,
+            'rotors': random_rotation_translation_rotor,
+        }[objects]
+        self.value = np.array([random_object().value for i in range(self.n)])
+        self.basis_names = np.array(list(sorted(layout.basis_vectors.keys())), dtype=bytes)
+        self.compression, _, shuffle = compression.partition('-')
+        self.shuffle = bool(shuffle)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.tmpdir.name, 'test.ga')
+        # a file for the read benchmark
+        self.time_write(objects, compression, threads)
+
+    def teardown(self, objects, compression, threads):
+        self.tmpdir.cleanup()
+
+    def time_write(self, objects, compression, threads):
+        write_ga_file(self.file_name, self.value, layout.metric, self.basis_names,
+                      compression=self.compression, shuffle=self.shuffle, threads=threads)
+
+    def time_read(self, objects, compression, threads):
+        read_ga_file(self.file_name, threads=threads)
+
+    def track_file_size(self, objects, compression, threads):
+        return os.path.getsize(self.file_name)
+    track_file_size.unit = 'bytes'
@@ -0,0 +1,52 @@
+"""
+Benchmarks of constructing layouts
+"""
+import clifford
+from clifford import caching
+
+
+# (p, q, r) signatures of each family of algebras, for `n` dimensions
+_signatures = {
+    'euclidean': lambda n: (n, 0, 0),
+    'spacetime': lambda n: (n - 1, 1, 0),
+    'degenerate': lambda n: (n - 1, 0, 1),
+}
+
+
+class LayoutConstruction:
+    """ Constructing a layout, without the disk cache of :mod:`clifford.caching` """
+    params = ([2, 4, 6, 8, 10], list(_signatures))
+    param_names = ['dims', 'signature']
+    timeout = 300
+
+    def setup(self, dims, signature):
+        self.sig = _signatures[signature](dims)
+        self.cache_dir = caching.get_cache_dir()
+        caching.set_cache_dir(None)
+
+    def teardown(self, dims, signature):
+        caching.set_cache_dir(self.cache_dir)
+
+    def time_Cl(self, dims, signature):
+        clifford.Cl(*self.sig)
+
+    def time_Cl_bitmap(self, dims, signature):
+        clifford.Cl(*self.sig, engine='bitmap')
+
+    def time_gmt_table(self, dims, signature):
+        # layouts build their tables lazily
+        clifford.Cl(*self.sig)[0].gmt
+
+
+class LayoutConstructionCached:
+    """ Constructing a layout whose tables are already in the disk cache """
+    params = [2, 4, 6, 8, 10]
+    param_names = ['dims']
+    timeout = 300
+
+    def setup(self, dims):
+        # populate the cache
+        clifford.Cl(dims)[0].gmt
+
+    def time_gmt_table(self, dims):
+        clifford.Cl(dims)[0].gmt
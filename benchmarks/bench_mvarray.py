@@ -0,0 +1,91 @@
+"""
+Benchmarks of arrays of multivectors
+"""
+import numpy as np
+
+from clifford import MVArray, DenseMVArray
+from clifford.g3c import layout
+
+
+class MVArrayOperations:
+    """ Operations on an :class:`clifford.MVArray` of g3c multivectors """
+    params = [10, 1000]
+    param_names = ['n']
+
+    def setup(self, n):
+        np.random.seed(0)
+        self.a = MVArray(layout.randomMV(n))
+        self.b = MVArray(layout.randomMV(n))
+        self.R = layout.randomRotor()
+        # compile outside of the timing
+        self.a[:1].sum()
+        self.a[:1].gp()
+        self.a[:1].normal()
+        self.a[:1].dual()
+        self.a[:1] * self.b[:1]
+
+    def time_mul(self, n):
+        self.a * self.b
+
+    def time_xor(self, n):
+        self.a ^ self.b
+
+    def time_apply_rotor(self, n):
+        self.R * self.a * ~self.R
+
+    def time_sum(self, n):
+        self.a.sum()
+
+    def time_gp(self, n):
+        self.a.gp()
+
+    def time_normal(self, n):
+        self.a.normal()
+
+    def time_dual(self, n):
+        self.a.dual()
+
+    def time_from_value_array(self, n):
+        MVArray.from_value_array(layout, self.a.value)
+
+
+class DenseMVArrayOperations:
+    """ The same operations on a :class:`clifford.DenseMVArray` """
+    params = [10, 1000, 100000]
+    param_names = ['n']
+    timeout = 300
+
+    def setup(self, n):
+        np.random.seed(0)
+        self.a = DenseMVArray(layout, np.random.randn(n, layout.gaDims))
+        self.b = DenseMVArray(layout, np.random.randn(n, layout.gaDims))
+        self.R = layout.randomRotor()
+        # compile outside of the timing
+        self.time_mul(n)
+        self.time_xor(n)
+        self.time_apply_rotor(n)
+        self.time_sum(n)
+        self.time_gp(n)
+        self.time_normal(n)
+        self.time_inv(n)
+
+    def time_mul(self, n):
+        self.a * self.b
+
+    def time_xor(self, n):
+        self.a ^ self.b
+
+    def time_apply_rotor(self, n):
+        self.R * self.a * ~self.R
+
+    def time_sum(self, n):
+        self.a.sum()
+
+    def time_gp(self, n):
+        self.a.gp()
+
+    def time_normal(self, n):
+        self.a.normal()
+
+    def time_inv(self, n):
+        self.a.inv()
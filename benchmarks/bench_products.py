@@ -0,0 +1,113 @@
+"""
+Benchmarks of the first and later calls of the core operations.
+
+The first call of each operation compiles it with numba, so the ``timeraw_``
+benchmarks here run it in a new python process, where asv times only the
+statement and not the setup. Setting ``cache`` to True first runs the
+operation in a separate process, so that it is timed when loaded from the
+disk caches of numba and :mod:`clifford.caching` instead.
+"""
+import subprocess
+import sys
+
+import numpy as np
+
+import clifford
+
+
+_operations = {
+    'gmt': 'layout.gmt_func(a, b)',
+    'omt': 'layout.omt_func(a, b)',
+    'imt': 'layout.imt_func(a, b)',
+    'inv': 'layout.inv_func(a)',
+    'exp': 'B.exp()',
+}
+
+_setup_template = """
+import numpy as np
+from clifford import Cl, caching
+{disable_cache}
+layout, blades = Cl({dims})
+a = np.random.randn(layout.gaDims)
+b = np.random.randn(layout.gaDims)
+B = layout.randomMV(grades=[2])
+"""
+
+
+class FirstCall:
+    """ The time of the first call of each operation in a new process """
+    params = (list(_operations), [3, 5], [False, True])
+    param_names = ['operation', 'dims', 'cache']
+    timeout = 300
+
+    def _setup_code(self, dims, cache):
+        return _setup_template.format(
+            dims=dims, disable_cache='' if cache else 'caching.set_cache_dir(None)')
+
+    def setup(self, operation, dims, cache):
+        if cache:
+            code = self._setup_code(dims, cache) + _operations[operation]
+            subprocess.check_call([sys.executable, '-c', code])
+
+    def timeraw_first_call(self, operation, dims, cache):
+        return _operations[operation], self._setup_code(dims, cache)
+
+
+class SteadyState:
+    """ The time of each operation once it has been compiled """
+    params = (list(_operations), [3, 5, 8])
+    param_names = ['operation', 'dims']
+
+    def setup(self, operation, dims):
+        self.layout, _ = clifford.Cl(dims)
+        self.a = np.random.randn(self.layout.gaDims)
+        self.b = np.random.randn(self.layout.gaDims)
+        self.B = self.layout.randomMV(grades=[2])
+        self.A = self.layout.MultiVector(value=self.a)
+        self.func = {
+            'gmt': lambda: self.layout.gmt_func(self.a, self.b),
+            'omt': lambda: self.layout.omt_func(self.a, self.b),
+            'imt': lambda: self.layout.imt_func(self.a, self.b),
+            'inv': lambda: self.layout.inv_func(self.a),
+            'exp': lambda: self.B.exp(),
+        }[operation]
+        # compile outside of the timing
+        self.func()
+
+    def time_operation(self, operation, dims):
+        self.func()
+
+
+class MultiVectorOperators:
+    """ The python overhead of the operators of :class:`clifford.MultiVector` """
+    params = [3, 5]
+    param_names = ['dims']
+
+    def setup(self, dims):
+        layout, _ = clifford.Cl(dims)
+        self.a = layout.randomMV()
+        self.b = layout.randomMV()
+        self.R = layout.randomRotor()
+        self.a * self.b
+        self.a ^ self.b
+        self.a | self.b
+        self.R * self.a * ~self.R
+        self.a.inv()
+
+    def time_mul(self, dims):
+        self.a * self.b
+
+    def time_xor(self, dims):
+        self.a ^ self.b
+
+    def time_or(self, dims):
+        self.a | self.b
+
+    def time_sandwich(self, dims):
+        self.R * self.a * ~self.R
+
+    def time_inv(self, dims):
+        self.a.inv()
+
+    def time_add(self, dims):
+        self.a + self.b
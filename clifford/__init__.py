@@ -17,6 +17,10 @@ Classes
     MultiVector
     Layout
     Frame
+    MVArray
+    DenseMVArray
+    GradedMultiVector
+    FusedExpression
 
 Functions
 ================
@@ -28,15 +32,21 @@ Functions
     Cl
     conformalize
     grade_obj
+    mult_batch
+    inv_batch
+    jit_expr
     bases
     randomMV
     pretty
     ugly
     eps
+    batch_threads
+    batch_chunk_size
 
 """
 
 # Standard library imports.
+import functools
 from functools import reduce
 import os
 import itertools
@@ -52,6 +62,7 @@ import sparse
 from clifford.io import write_ga_file, read_ga_file  # noqa: F401
 
 from ._version import __version__  # noqa: F401
+from . import _bivector
 
 _eps = 1e-12            # float epsilon for float comparisons
 _pretty = True          # pretty-print global
@@ -65,6 +76,25 @@ except KeyError:
 else:
     NUMBA_PARALLEL = not bool(NUMBA_DISABLE_PARALLEL)
 
+# The number of threads used by the batched kernels, and the number of
+# consecutive multivectors each of them takes at a time, see `batch_threads`
+# and `batch_chunk_size`.
+_batch_threads = numba.config.NUMBA_NUM_THREADS if NUMBA_PARALLEL else 1
+_batch_chunk_size = 256
+
+
+def _batch_schedule(n: int) -> Tuple[int, int]:
+    """
+    The number of workers to split a batch of `n` multivectors between, and
+    the size of the chunks they take in turn.
+
+    The batched kernels run ``numba.prange(n_workers)``, so that no more than
+    `n_workers` threads are ever busy, and worker ``w`` processes chunks
+    ``w``, ``w + n_workers``, ``w + 2*n_workers``, and so on.
+    """
+    n_chunks = (n + _batch_chunk_size - 1) // _batch_chunk_size
+    return max(1, min(_batch_threads, n_chunks)), _batch_chunk_size
+
 
 def linear_operator_as_matrix(func, input_blades, output_blades):
     """
@@ -84,14 +114,14 @@ def get_adjoint_function(gradeList):
     This function returns a fast jitted adjoint function
     '''
     grades = np.array(gradeList)
-    signs = np.power(-1, grades*(grades-1)//2)
+    signs = np.power(-1, grades*(grades-1)//2).astype(np.int8)
     @numba.njit
     def adjoint_func(value):
         return signs * value  # elementwise multiplication
     return adjoint_func
 
 
-@numba.njit(parallel=NUMBA_PARALLEL, nogil=True)
+@numba.njit(parallel=NUMBA_PARALLEL, nogil=True, cache=True)
 def _numba_construct_tables(
     gradeList, linear_map_to_bitmap, bitmap_to_linear_map, signature
 ):
@@ -160,24 +190,33 @@ def get_mult_function(mt: sparse.COO, gradeList,
     '''
     Returns a function that implements the mult_table on two input multivectors
     '''
+    if filter_mask is None and (grades_a is None or grades_b is None):
+        return _get_mult_function_runtime_sparse(mt)
+
+    return _get_mult_function(filter_mult_table(
+        mt, gradeList, grades_a=grades_a, grades_b=grades_b, filter_mask=filter_mask))
+
+
+def filter_mult_table(mt: sparse.COO, gradeList,
+                      grades_a=None, grades_b=None, filter_mask=None) -> sparse.COO:
+    '''
+    Restrict a multiplication table to the entries selected by `filter_mask`,
+    or if not given, to those with operands of grades `grades_a` and `grades_b`.
+    '''
     if (filter_mask is None) and (grades_a is not None) and (grades_b is not None):
-        # If not specified explicitly, we can specify sparseness by grade
-        filter_mask = np.zeros(mt.nnz, dtype=bool)
+        # If not specified explicitly, we can specify sparseness by grade.
+        # The mask lines up with the entries of `mt`, so we can select them
+        # directly rather than paying for a call to `sparse.where`.
         k_list, _, m_list = mt.coords
-        for i in range(len(filter_mask)):
-            if gradeList[k_list[i]] in grades_a:
-                if gradeList[m_list[i]] in grades_b:
-                    filter_mask[i] = 1
-        filter_mask = sparse.COO(coords=mt.coords, data=filter_mask, shape=mt.shape)
+        gradeList = np.asarray(gradeList)
+        keep = np.isin(gradeList[k_list], grades_a) & np.isin(gradeList[m_list], grades_b)
+        return sparse.COO(coords=mt.coords[:, keep], data=mt.data[keep], shape=mt.shape)
 
     if filter_mask is not None:
         # We can pass the sparse filter mask directly
-        mt = sparse.where(filter_mask, mt, mt.dtype.type(0))
-
-        return _get_mult_function(mt)
+        return sparse.where(filter_mask, mt, mt.dtype.type(0))
 
-    else:
-        return _get_mult_function_runtime_sparse(mt)
+    return mt
 
 
 def _get_mult_function_result_type(a: numba.types.Type, b: numba.types.Type, mt: np.dtype):
@@ -186,14 +225,58 @@ def _get_mult_function_result_type(a: numba.types.Type, b: numba.types.Type, mt:
     return np.result_type(a_dt, mt, b_dt)
 
 
+def _get_matrix_result_type(x: numba.types.Type) -> np.dtype:
+    """
+    The dtype of a matrix built from the coefficients of `x`, which is at
+    least single precision as it is used to solve linear systems, but is not
+    upcast any further, so that float32 values stay float32.
+    """
+    return np.result_type(numba.numpy_support.as_dtype(x.dtype), np.float32)
+
+
+def _out_is_omitted(out: numba.types.Type) -> bool:
+    """ Whether the optional `out` argument of a generated_jit function was not given """
+    return out is None or isinstance(out, (numba.types.NoneType, numba.types.Omitted))
+
+
+@numba.njit(nogil=True, cache=True)
+def _numba_mult_into(value, other_value, k_list, l_list, m_list, mult_table_vals, output):
+    for ind in range(len(k_list)):
+        output[l_list[ind]] += value[k_list[ind]] * mult_table_vals[ind] * other_value[m_list[ind]]
+
+
+@numba.njit(nogil=True, cache=True)
+def _numba_grade_mask(value, grades):
+    """ A bitmask of the grades of the nonzero coefficients in `value` """
+    mask = 0
+    for i in range(value.shape[0]):
+        if value[i] != 0:
+            mask |= 1 << grades[i]
+    return mask
+
+
+@numba.njit(nogil=True, cache=True)
+def _numba_mult_runtime_sparse_into(value, other_value, k_list, l_list, m_list, mult_table_vals, output):
+    for ind, k in enumerate(k_list):
+        v_val = value[k]
+        if v_val != 0.0:
+            m = m_list[ind]
+            ov_val = other_value[m]
+            if ov_val != 0.0:
+                l = l_list[ind]
+                output[l] += v_val * mult_table_vals[ind] * ov_val
+
+
 def _get_mult_function(mt: sparse.COO):
     """
     Get a function similar to `` lambda a, b: np.einsum('i,ijk,k->j', a, mt, b)``
 
     Returns
     -------
-    func : function (array_like (n_dims,), array_like (n_dims,)) -> array_like (n_dims,)
-        A function that computes the appropriate multiplication
+    func : function (array_like (n_dims,), array_like (n_dims,), out=None) -> array_like (n_dims,)
+        A function that computes the appropriate multiplication. If `out` is
+        given, the result is written into it and it is returned, in which case
+        it must not overlap with either input.
     """
     # unpack for numba
     dims = mt.shape[1]
@@ -201,16 +284,21 @@ def _get_mult_function(mt: sparse.COO):
     mult_table_vals = mt.data
 
     @numba.generated_jit(nopython=True)
-    def mv_mult(value, other_value):
+    def mv_mult(value, other_value, out=None):
         # this casting will be done at jit-time
         ret_dtype = _get_mult_function_result_type(value, other_value, mult_table_vals.dtype)
         mult_table_vals_t = mult_table_vals.astype(ret_dtype)
 
-        def mult_inner(value, other_value):
-            output = np.zeros(dims, dtype=ret_dtype)
-            for k, l, m, val in zip(k_list, l_list, m_list, mult_table_vals_t):
-                output[l] += value[k] * val * other_value[m]
-            return output
+        if _out_is_omitted(out):
+            def mult_inner(value, other_value, out=None):
+                output = np.zeros(dims, dtype=ret_dtype)
+                _numba_mult_into(value, other_value, k_list, l_list, m_list, mult_table_vals_t, output)
+                return output
+        else:
+            def mult_inner(value, other_value, out=None):
+                out[:] = 0
+                _numba_mult_into(value, other_value, k_list, l_list, m_list, mult_table_vals_t, out)
+                return out
 
         return mult_inner
 
@@ -232,28 +320,131 @@ def _get_mult_function_runtime_sparse(mt: sparse.COO):
     mult_table_vals = mt.data
 
     @numba.generated_jit(nopython=True)
-    def mv_mult(value, other_value):
+    def mv_mult(value, other_value, out=None):
         # this casting will be done at jit-time
         ret_dtype = _get_mult_function_result_type(value, other_value, mult_table_vals.dtype)
         mult_table_vals_t = mult_table_vals.astype(ret_dtype)
 
-        def mult_inner(value, other_value):
-            output = np.zeros(dims, dtype=ret_dtype)
-            for ind, k in enumerate(k_list):
-                v_val = value[k]
-                if v_val != 0.0:
-                    m = m_list[ind]
-                    ov_val = other_value[m]
-                    if ov_val != 0.0:
-                        l = l_list[ind]
-                        output[l] += v_val * mult_table_vals_t[ind] * ov_val
-            return output
+        if _out_is_omitted(out):
+            def mult_inner(value, other_value, out=None):
+                output = np.zeros(dims, dtype=ret_dtype)
+                _numba_mult_runtime_sparse_into(value, other_value, k_list, l_list, m_list, mult_table_vals_t, output)
+                return output
+        else:
+            def mult_inner(value, other_value, out=None):
+                out[:] = 0
+                _numba_mult_runtime_sparse_into(value, other_value, k_list, l_list, m_list, mult_table_vals_t, out)
+                return out
         return mult_inner
 
     return mv_mult
 
 
-@numba.njit
+@numba.njit(parallel=NUMBA_PARALLEL, nogil=True, cache=True)
+def _numba_mult_batch(value, other_value, k_list, l_list, m_list, mult_table_vals, n_workers, chunk_size, output):
+    n, n_dims = output.shape
+    for worker in numba.prange(n_workers):
+        for start in range(worker * chunk_size, n, n_workers * chunk_size):
+            for i in range(start, min(n, start + chunk_size)):
+                for j in range(n_dims):
+                    output[i, j] = 0
+                for ind in range(len(k_list)):
+                    output[i, l_list[ind]] += value[i, k_list[ind]] * mult_table_vals[ind] * other_value[i, m_list[ind]]
+
+
+def _as_2d_view(arr, dims):
+    """ Reshape ``arr`` to ``(-1, dims)`` without copying, or raise """
+    arr_2d = arr.view()
+    try:
+        arr_2d.shape = (-1, dims)
+    except AttributeError:
+        raise ValueError("out must be reshapeable to (-1, {}) without copying".format(dims))
+    return arr_2d
+
+
+def mult_batch(mt: sparse.COO, a, b, out=None, dtype=None):
+    """
+    Apply the product described by `mt` to broadcastable stacks of multivectors
+
+    This is the batched counterpart of the functions returned by
+    :func:`get_mult_function`, and runs the entire loop in a single compiled
+    kernel which releases the GIL, split between the threads given by
+    :func:`batch_threads`.
+
+    Parameters
+    ----------
+    mt : sparse.COO
+        The multiplication table, such as ``layout.gmt``
+    a, b : array_like (..., n_dims)
+        The coefficients of the left and right operands. The leading
+        dimensions are broadcast against each other.
+    out : ndarray (..., n_dims), optional
+        An array to write the result into. It must have the broadcast shape.
+    dtype : data-type, optional
+        If given, the operands are cast to this type before the product is
+        computed, such as ``np.float32`` to halve the memory traffic of large
+        batches. By default, the result type is that of the operands.
+
+    Returns
+    -------
+    out : ndarray (..., n_dims)
+    """
+    dims = mt.shape[1]
+    a_2d, b_2d, out = _broadcast_batch_operands(a, b, dims, mt.dtype, out, dtype)
+    k_list, l_list, m_list = mt.coords
+    _numba_mult_batch(
+        a_2d, b_2d, k_list, l_list, m_list, mt.data.astype(out.dtype),
+        *_batch_schedule(len(a_2d)), _as_2d_view(out, dims)
+    )
+    return out
+
+
+def _broadcast_batch_operands(a, b, dims, mt_dtype, out, dtype=None):
+    """
+    Broadcast the operands of a batched product against each other, casting
+    them to `dtype` if given, and allocate or check the output array.
+
+    Returns the operands as ``(-1, dims)`` arrays of rows, see
+    :func:`_batch_operand_2d`, and the output array.
+    """
+    a = np.asarray(a, dtype=dtype)
+    b = np.asarray(b, dtype=dtype)
+    if a.shape[-1:] != (dims,) or b.shape[-1:] != (dims,):
+        raise ValueError("operands must have a last dimension of length {}".format(dims))
+
+    shape = np.broadcast(a[..., 0], b[..., 0]).shape + (dims,)
+    ret_dtype = np.result_type(a.dtype, mt_dtype, b.dtype)
+    if out is None:
+        out = np.empty(shape, dtype=ret_dtype)
+    elif out.shape != shape:
+        raise ValueError("out has shape {}, expected {}".format(out.shape, shape))
+
+    return _batch_operand_2d(a, out), _batch_operand_2d(b, out), out
+
+
+def _batch_operand_2d(x, out):
+    """
+    Broadcast an operand of a batched kernel to ``(-1, dims)`` rows matching
+    those of `out`, without copying it where possible
+
+    The kernels write each row of `out` before reading the next rows of the
+    operands, so operands which overlap `out` are copied first.
+    """
+    dims = out.shape[-1]
+    if np.may_share_memory(x, out):
+        x = x.copy()
+    if x.size == dims:
+        # a single multivector is repeated with a stride of zero
+        return np.broadcast_to(x.reshape(dims), (out.size // dims, dims))
+    x = np.broadcast_to(x, out.shape)
+    try:
+        return _as_2d_view(x, dims)
+    except ValueError:
+        # broadcast along some leading dimensions but not others
+        return x.reshape(-1, dims)
+
+
+@numba.njit(cache=True)
 def gmt_element(bitmap_a, bitmap_b, sig_array, bitmap_to_linear_mapping):
     """
     Element of the geometric multiplication table given blades a, b.
@@ -266,7 +457,7 @@ def gmt_element(bitmap_a, bitmap_b, sig_array, bitmap_to_linear_mapping):
     return idx, output_sign
 
 
-@numba.njit
+@numba.njit(cache=True)
 def imt_check(grade_list_idx, grade_list_i, grade_list_j):
     """
     A check used in imt table generation
@@ -274,7 +465,7 @@ def imt_check(grade_list_idx, grade_list_i, grade_list_j):
     return ((grade_list_idx == abs(grade_list_i - grade_list_j)) and (grade_list_i != 0) and (grade_list_j != 0))
 
 
-@numba.njit
+@numba.njit(cache=True)
 def omt_check(grade_list_idx, grade_list_i, grade_list_j):
     """
     A check used in omt table generation
@@ -282,7 +473,7 @@ def omt_check(grade_list_idx, grade_list_i, grade_list_j):
     return grade_list_idx == (grade_list_i + grade_list_j)
 
 
-@numba.njit
+@numba.njit(cache=True)
 def lcmt_check(grade_list_idx, grade_list_i, grade_list_j):
     """
     A check used in lcmt table generation
@@ -290,7 +481,7 @@ def lcmt_check(grade_list_idx, grade_list_i, grade_list_j):
     return grade_list_idx == (grade_list_j - grade_list_i)
 
 
-@numba.njit
+@numba.njit(cache=True)
 def grade_obj_func(objin_val, gradeList, threshold):
     """ returns the modal grade of a multivector """
     modal_value_count = np.zeros(objin_val.shape)
@@ -313,26 +504,585 @@ def get_leftLaInv(mult_table, gradeList):
     k_list, l_list, m_list = mult_table.coords
     mult_table_vals = mult_table.data
     n_dims = mult_table.shape[1]
-
-    identity = np.zeros((n_dims,))
-    identity[gradeList.index(0)] = 1
+    scalar_index = gradeList.index(0)
 
     @numba.njit
     def leftLaInvJIT(value):
         intermed = _numba_val_get_left_gmt_matrix(value, k_list, l_list, m_list, mult_table_vals, n_dims)
         if abs(linalg.det(intermed)) < _eps:
             raise ValueError("multivector has no left-inverse")
+        identity = np.zeros(n_dims, dtype=intermed.dtype)
+        identity[scalar_index] = 1
         sol = linalg.solve(intermed, identity)
         return sol
 
     return leftLaInvJIT
 
 
+@numba.njit(nogil=True, cache=True)
+def _numba_versor_inv_into(adjoint, value_adjoint, scalar_index, eps, output):
+    """
+    Write ``adjoint / value_adjoint`` into output if ``value_adjoint``, the
+    product of a multivector with its reverse, is a nonzero scalar, to within
+    `eps` relative to the squared magnitude of the multivector.
+
+    Returns whether this was possible.
+    """
+    # the coefficients of value_adjoint are sums of products of pairs of
+    # coefficients, so their rounding errors scale with this
+    tol = 0.0
+    for j in range(len(adjoint)):
+        tol += adjoint[j] * adjoint[j]
+    tol *= eps
+    s = value_adjoint[scalar_index]
+    if abs(s) <= tol:
+        return False
+    for j in range(len(value_adjoint)):
+        if j != scalar_index and abs(value_adjoint[j]) > tol:
+            return False
+    for j in range(len(output)):
+        output[j] = adjoint[j] / s
+    return True
+
+
+@numba.njit(nogil=True, cache=True)
+def _numba_solve_scalar_into(intermed, scalar_index, eps, output):
+    """
+    Solve ``intermed @ output == 1`` by Gaussian elimination with partial
+    pivoting, where ``1`` is the scalar blade. This overwrites intermed.
+
+    Returns False if intermed is singular, meaning a pivot is smaller than
+    `eps` relative to the largest entry.
+    """
+    n = intermed.shape[0]
+    tol = 0.0
+    for i in range(n):
+        for j in range(n):
+            tol = max(tol, abs(intermed[i, j]))
+    tol *= eps
+    output[:] = 0
+    output[scalar_index] = 1
+    for col in range(n):
+        pivot = col
+        for row in range(col + 1, n):
+            if abs(intermed[row, col]) > abs(intermed[pivot, col]):
+                pivot = row
+        if abs(intermed[pivot, col]) <= tol:
+            return False
+        if pivot != col:
+            for j in range(col, n):
+                intermed[col, j], intermed[pivot, j] = intermed[pivot, j], intermed[col, j]
+            output[col], output[pivot] = output[pivot], output[col]
+        for row in range(col + 1, n):
+            f = intermed[row, col] / intermed[col, col]
+            if f != 0:
+                for j in range(col, n):
+                    intermed[row, j] -= f * intermed[col, j]
+                output[row] -= f * output[col]
+    for row in range(n - 1, -1, -1):
+        acc = output[row]
+        for j in range(row + 1, n):
+            acc -= intermed[row, j] * output[j]
+        output[row] = acc / intermed[row, row]
+    return True
+
+
+@numba.njit(parallel=NUMBA_PARALLEL, nogil=True, cache=True)
+def _numba_inv_batch(value, k_list, l_list, m_list, mult_table_vals, adjoint_signs, scalar_index, eps,
+                     n_workers, chunk_size, output, ok):
+    n, n_dims = value.shape
+    for worker in numba.prange(n_workers):
+        # workspace reused for every element handled by this worker
+        adjoint = np.empty(n_dims, dtype=output.dtype)
+        value_adjoint = np.empty(n_dims, dtype=output.dtype)
+        intermed = np.empty((n_dims, n_dims), dtype=output.dtype)
+        for start in range(worker * chunk_size, n, n_workers * chunk_size):
+            for i in range(start, min(n, start + chunk_size)):
+                for j in range(n_dims):
+                    adjoint[j] = adjoint_signs[j] * value[i, j]
+                value_adjoint[:] = 0
+                _numba_mult_runtime_sparse_into(
+                    value[i], adjoint, k_list, l_list, m_list, mult_table_vals, value_adjoint)
+                if _numba_versor_inv_into(adjoint, value_adjoint, scalar_index, eps, output[i]):
+                    ok[i] = True
+                else:
+                    _numba_val_get_left_gmt_matrix_into(value[i], k_list, l_list, m_list, mult_table_vals, intermed)
+                    ok[i] = _numba_solve_scalar_into(intermed, scalar_index, eps, output[i])
+
+
+def _prepare_inv_batch(a, dims, gradeList, out, dtype=None):
+    """
+    Check the operand of a batched inverse, casting it to `dtype` if given,
+    and allocate or check the output array.
+
+    Returns the operand reshaped to ``(-1, dims)``, the output array, and the
+    arguments common to both engines.
+    """
+    a = np.asarray(a, dtype=dtype)
+    if a.shape[-1:] != (dims,):
+        raise ValueError("operand must have a last dimension of length {}".format(dims))
+    ret_dtype = np.result_type(a.dtype, 1.0)
+    if out is None:
+        out = np.empty(a.shape, dtype=ret_dtype)
+    elif out.shape != a.shape:
+        raise ValueError("out has shape {}, expected {}".format(out.shape, a.shape))
+    a_2d = np.ascontiguousarray(a.reshape(-1, dims), dtype=out.dtype)
+
+    adjoint_signs, scalar_index = _inv_batch_constants(tuple(gradeList))
+    # a relative tolerance, which must be looser in single precision
+    eps = max(_eps, 1e3 * np.finfo(out.dtype).eps)
+    return a_2d, out, (adjoint_signs, scalar_index, eps) + _batch_schedule(len(a_2d))
+
+
+@functools.lru_cache()
+def _inv_batch_constants(gradeList):
+    grades = np.array(gradeList)
+    adjoint_signs = np.power(-1, grades*(grades-1)//2).astype(np.int8)
+    return adjoint_signs, gradeList.index(0)
+
+
+def _check_inv_batch(ok):
+    if not np.all(ok):
+        raise ValueError("multivector has no inverse")
+
+
+def inv_batch(mt: sparse.COO, gradeList, a, out=None, dtype=None):
+    """
+    Invert a stack of multivectors
+
+    This is the batched counterpart of :func:`get_leftLaInv`. Where ``M*~M``
+    is a nonzero scalar, as is the case for versors, the inverse is
+    ``~M / (M*~M)``. Otherwise, the linear system for the left-multiplication
+    matrix of ``M`` is solved by LU decomposition, reusing the same workspace
+    for every multivector.
+
+    Parameters
+    ----------
+    mt : sparse.COO
+        The geometric multiplication table, ``layout.gmt``
+    gradeList : list of int
+        The grade of each blade, ``layout.gradeList``
+    a : array_like (..., n_dims)
+        The coefficients of the multivectors to invert
+    out : ndarray (..., n_dims), optional
+        An array to write the result into. It must have the same shape as `a`.
+    dtype : data-type, optional
+        If given, `a` is cast to this type first, as for :func:`mult_batch`
+
+    Returns
+    -------
+    out : ndarray (..., n_dims)
+
+    Raises
+    ------
+    ValueError
+        If any of the multivectors has no inverse
+    """
+    dims = mt.shape[1]
+    a_2d, out, args = _prepare_inv_batch(a, dims, gradeList, out, dtype)
+    out_2d = _as_2d_view(out, dims)
+    ok = np.empty(len(a_2d), dtype=np.bool_)
+    k_list, l_list, m_list = mt.coords
+    _numba_inv_batch(a_2d, k_list, l_list, m_list, mt.data.astype(out.dtype), *args, out_2d, ok)
+    _check_inv_batch(ok)
+    return out
+
+
+@numba.njit(parallel=NUMBA_PARALLEL, nogil=True, cache=True)
+def _numba_scale_batch(value, scales, n_workers, chunk_size, output):
+    """ Scale each coefficient, as for grade projections and involutions """
+    n = output.shape[0]
+    for worker in numba.prange(n_workers):
+        for start in range(worker * chunk_size, n, n_workers * chunk_size):
+            for i in range(start, min(n, start + chunk_size)):
+                for j in range(output.shape[1]):
+                    output[i, j] = scales[j] * value[i, j]
+
+
+@numba.njit(nogil=True, cache=True)
+def _numba_mag2(value, weights):
+    """
+    The scalar part of ``~M*M``, where `weights` is that of ``~e*e`` for
+    each blade ``e``. Other pairs of blades never multiply to a scalar.
+    """
+    acc = weights[0] * value[0] * value[0]
+    for j in range(1, value.shape[0]):
+        acc += weights[j] * value[j] * value[j]
+    return acc
+
+
+@numba.njit(parallel=NUMBA_PARALLEL, nogil=True, cache=True)
+def _numba_mag2_batch(value, weights, n_workers, chunk_size, output):
+    n = output.shape[0]
+    for worker in numba.prange(n_workers):
+        for start in range(worker * chunk_size, n, n_workers * chunk_size):
+            for i in range(start, min(n, start + chunk_size)):
+                output[i] = _numba_mag2(value[i], weights)
+
+
+@numba.njit(parallel=NUMBA_PARALLEL, nogil=True, cache=True, error_model='numpy')
+def _numba_normal_batch(value, weights, n_workers, chunk_size, output):
+    n = output.shape[0]
+    for worker in numba.prange(n_workers):
+        for start in range(worker * chunk_size, n, n_workers * chunk_size):
+            for i in range(start, min(n, start + chunk_size)):
+                norm = np.sqrt(abs(_numba_mag2(value[i], weights)))
+                for j in range(output.shape[1]):
+                    output[i, j] = value[i, j] / norm
+
+
+def _unary_batch(kernel, constants, a, dims, out, scalar=False, inexact=False, dtype=None):
+    """
+    Apply `kernel` to a ``(..., dims)`` array of coefficients, as
+    ``kernel(a_2d, constants, n_workers, chunk_size, out_2d)``, after casting
+    them to `dtype` if given.
+
+    If `scalar`, the output has one entry for each multivector rather than
+    `dims`. If `inexact`, the output is at least floating point.
+    """
+    a = np.asarray(a, dtype=dtype)
+    if a.shape[-1:] != (dims,):
+        raise ValueError("operand must have a last dimension of length {}".format(dims))
+    shape = a.shape[:-1] if scalar else a.shape
+    ret_dtype = np.result_type(a.dtype, constants.dtype)
+    if inexact:
+        ret_dtype = np.result_type(ret_dtype, 1.0)
+    if out is None:
+        out = np.empty(shape, dtype=ret_dtype)
+    elif out.shape != shape:
+        raise ValueError("out has shape {}, expected {}".format(out.shape, shape))
+
+    if scalar:
+        out_flat = out.view()
+        try:
+            out_flat.shape = (-1,)
+        except AttributeError:
+            raise ValueError("out must be reshapeable to (-1,) without copying")
+    else:
+        out_flat = _as_2d_view(out, dims)
+    a_2d = a.reshape(-1, dims)
+    kernel(a_2d, constants, *_batch_schedule(len(a_2d)), out_flat)
+    return out
+
+
+# Reductions are computed in two stages. Each chunk of consecutive rows is
+# reduced in parallel into its own partial result, and then the partial
+# results are combined in order. The chunks only depend on the chunk size, so
+# the result is the same for any number of threads.
+
+@numba.njit(parallel=NUMBA_PARALLEL, nogil=True, cache=True)
+def _numba_sum_reduce(value, n_workers, chunk_size, output):
+    n, n_dims = value.shape
+    n_chunks = (n + chunk_size - 1) // chunk_size
+    partials = np.zeros((n_chunks, n_dims), dtype=output.dtype)
+    for worker in numba.prange(n_workers):
+        for chunk in range(worker, n_chunks, n_workers):
+            for i in range(chunk * chunk_size, min(n, (chunk + 1) * chunk_size)):
+                for j in range(n_dims):
+                    partials[chunk, j] += value[i, j]
+    for chunk in range(n_chunks):
+        for j in range(n_dims):
+            output[j] += partials[chunk, j]
+
+
+def get_mult_reduce_function(mult_func):
+    """
+    Get a jitted function computing the product of the rows of a 2d array,
+    ``value[0] * value[1] * ... * value[n-1]``, using `mult_func`, which
+    must accept an `out` argument like the functions returned by
+    :func:`get_mult_function`. As products are associative, the rows can be
+    multiplied in chunks in parallel, but the order of the factors is kept.
+    """
+    @numba.njit(parallel=NUMBA_PARALLEL, nogil=True)
+    def mult_reduce(value, n_workers, chunk_size, output):
+        n, n_dims = value.shape
+        n_chunks = (n + chunk_size - 1) // chunk_size
+        partials = np.empty((n_chunks, n_dims), dtype=output.dtype)
+        for worker in numba.prange(n_workers):
+            tmp = np.empty(n_dims, dtype=output.dtype)
+            for chunk in range(worker, n_chunks, n_workers):
+                start = chunk * chunk_size
+                partials[chunk, :] = value[start]
+                for i in range(start + 1, min(n, start + chunk_size)):
+                    mult_func(partials[chunk], value[i], tmp)
+                    partials[chunk, :] = tmp
+        output[:] = partials[0]
+        tmp_out = np.empty(n_dims, dtype=output.dtype)
+        for chunk in range(1, n_chunks):
+            mult_func(output, partials[chunk], tmp_out)
+            output[:] = tmp_out
+    return mult_reduce
+
+
+def _reduce_batch(kernel, a, dims, mt_dtype, scalar_index=None):
+    """
+    Reduce an ``(n, dims)`` array of coefficients to a single multivector with
+    `kernel`, called as ``kernel(a, n_workers, chunk_size, out)``.
+
+    If `scalar_index` is given, the reduction of no multivectors is the scalar
+    1 rather than 0.
+    """
+    a = np.asarray(a)
+    if a.ndim != 2 or a.shape[1] != dims:
+        raise ValueError("operand must have shape (n, {}), not {}".format(dims, a.shape))
+    out = np.zeros(dims, dtype=np.result_type(a.dtype, mt_dtype))
+    if len(a) == 0:
+        if scalar_index is not None:
+            out[scalar_index] = 1
+        return out
+    kernel(np.ascontiguousarray(a), *_batch_schedule(len(a)), out)
+    return out
+
+
+# Codes for the products computed by the bitmap engine, which computes the
+# entries of the multiplication tables on the fly rather than storing them.
+# This trades speed for memory, which makes algebras of 10 or more dimensions
+# usable, as their tables have ``4**dims`` entries before pruning.
+_BITMAP_GMT = 0
+_BITMAP_IMT = 1
+_BITMAP_OMT = 2
+_BITMAP_LCMT = 3
+
+
+@numba.njit(cache=True)
+def _bitmap_product_check(product, grade_list_idx, grade_list_i, grade_list_j):
+    """
+    Whether the product selects the given grade of the geometric product
+    """
+    if product == _BITMAP_IMT:
+        return imt_check(grade_list_idx, grade_list_i, grade_list_j)
+    elif product == _BITMAP_OMT:
+        return omt_check(grade_list_idx, grade_list_i, grade_list_j)
+    elif product == _BITMAP_LCMT:
+        return lcmt_check(grade_list_idx, grade_list_i, grade_list_j)
+    return True
+
+
+@numba.njit(nogil=True, cache=True)
+def _numba_bitmap_mult_into(value, other_value, linear_map_to_bitmap, bitmap_to_linear_map, signature,
+                            product, output):
+    other_nonzero = np.nonzero(other_value)[0]
+    for i in range(len(value)):
+        v_val = value[i]
+        if v_val != 0.0:
+            bitmap_i = linear_map_to_bitmap[i]
+            grade_i = count_set_bits(bitmap_i)
+            for m in other_nonzero:
+                bitmap_m = linear_map_to_bitmap[m]
+                bitmap_l = bitmap_i ^ bitmap_m
+                if _bitmap_product_check(product, count_set_bits(bitmap_l), grade_i, count_set_bits(bitmap_m)):
+                    sign = canonical_reordering_sign(bitmap_i, bitmap_m, signature)
+                    if sign != 0:
+                        output[bitmap_to_linear_map[bitmap_l]] += v_val * sign * other_value[m]
+
+
+@numba.njit(parallel=NUMBA_PARALLEL, nogil=True, cache=True)
+def _numba_bitmap_mult_batch(value, other_value, linear_map_to_bitmap, bitmap_to_linear_map, signature,
+                             product, n_workers, chunk_size, output):
+    n = output.shape[0]
+    for worker in numba.prange(n_workers):
+        for start in range(worker * chunk_size, n, n_workers * chunk_size):
+            for i in range(start, min(n, start + chunk_size)):
+                output[i, :] = 0
+                _numba_bitmap_mult_into(value[i], other_value[i], linear_map_to_bitmap, bitmap_to_linear_map,
+                                        signature, product, output[i])
+
+
+@numba.njit(nogil=True, cache=True)
+def _numba_bitmap_val_get_left_gmt_matrix_into(x, linear_map_to_bitmap, bitmap_to_linear_map, signature,
+                                               intermed):
+    ndims = len(x)
+    intermed[:] = 0
+    for k in range(ndims):
+        if x[k] != 0.0:
+            bitmap_k = linear_map_to_bitmap[k]
+            for m in range(ndims):
+                bitmap_m = linear_map_to_bitmap[m]
+                sign = canonical_reordering_sign(bitmap_k, bitmap_m, signature)
+                intermed[bitmap_to_linear_map[bitmap_k ^ bitmap_m], m] += sign * x[k]
+
+
+@numba.generated_jit(nopython=True, nogil=True, cache=True)
+def _numba_bitmap_val_get_left_gmt_matrix(x, linear_map_to_bitmap, bitmap_to_linear_map, signature):
+    ret_dtype = _get_matrix_result_type(x)
+
+    def get_matrix(x, linear_map_to_bitmap, bitmap_to_linear_map, signature):
+        ndims = len(x)
+        intermed = np.zeros((ndims, ndims), dtype=ret_dtype)
+        _numba_bitmap_val_get_left_gmt_matrix_into(x, linear_map_to_bitmap, bitmap_to_linear_map, signature,
+                                                   intermed)
+        return intermed
+    return get_matrix
+
+
+def get_bitmap_mult_function(product: int, linear_map_to_bitmap, bitmap_to_linear_map, signature):
+    """
+    Get a function computing a product without a multiplication table
+
+    This is the bitmap-engine counterpart of :func:`get_mult_function`.
+    Products between blades are computed on the fly, and zero coefficients of
+    either operand are skipped entirely, which makes it fast for grade-sparse
+    operands.
+
+    Parameters
+    ----------
+    product : int
+        One of ``_BITMAP_GMT``, ``_BITMAP_IMT``, ``_BITMAP_OMT``, or
+        ``_BITMAP_LCMT``.
+    """
+    dims = len(linear_map_to_bitmap)
+
+    @numba.generated_jit(nopython=True)
+    def mv_mult(value, other_value, out=None):
+        # this casting will be done at jit-time
+        ret_dtype = _get_mult_function_result_type(value, other_value, np.dtype(np.int8))
+
+        if _out_is_omitted(out):
+            def mult_inner(value, other_value, out=None):
+                output = np.zeros(dims, dtype=ret_dtype)
+                _numba_bitmap_mult_into(value, other_value, linear_map_to_bitmap, bitmap_to_linear_map, signature,
+                                        product, output)
+                return output
+        else:
+            def mult_inner(value, other_value, out=None):
+                out[:] = 0
+                _numba_bitmap_mult_into(value, other_value, linear_map_to_bitmap, bitmap_to_linear_map, signature,
+                                        product, out)
+                return out
+        return mult_inner
+
+    return mv_mult
+
+
+def bitmap_mult_batch(product: int, linear_map_to_bitmap, bitmap_to_linear_map, signature, a, b, out=None,
+                      dtype=None):
+    """
+    The bitmap-engine counterpart of :func:`mult_batch`
+    """
+    dims = len(linear_map_to_bitmap)
+    a_2d, b_2d, out = _broadcast_batch_operands(a, b, dims, np.int8, out, dtype)
+    _numba_bitmap_mult_batch(
+        a_2d, b_2d, linear_map_to_bitmap, bitmap_to_linear_map, signature,
+        product, *_batch_schedule(len(a_2d)), _as_2d_view(out, dims)
+    )
+    return out
+
+
+def get_bitmap_leftLaInv(linear_map_to_bitmap, bitmap_to_linear_map, signature, gradeList):
+    """
+    The bitmap-engine counterpart of :func:`get_leftLaInv`
+    """
+    n_dims = len(gradeList)
+    scalar_index = gradeList.index(0)
+
+    @numba.njit
+    def leftLaInvJIT(value):
+        intermed = _numba_bitmap_val_get_left_gmt_matrix(value, linear_map_to_bitmap, bitmap_to_linear_map, signature)
+        if abs(linalg.det(intermed)) < _eps:
+            raise ValueError("multivector has no left-inverse")
+        identity = np.zeros(n_dims, dtype=intermed.dtype)
+        identity[scalar_index] = 1
+        sol = linalg.solve(intermed, identity)
+        return sol
+
+    return leftLaInvJIT
+
+
+@numba.njit(cache=True)
+def _numba_bitmap_mult_table(product, blades_a, blades_b, linear_map_to_bitmap, bitmap_to_linear_map, signature):
+    n = len(blades_a) * len(blades_b)
+    coords = np.zeros((3, n), dtype=np.int64)
+    mult_table_vals = np.zeros(n, dtype=np.int8)
+    count = 0
+    for k in blades_a:
+        bitmap_k = linear_map_to_bitmap[k]
+        grade_k = count_set_bits(bitmap_k)
+        for m in blades_b:
+            bitmap_m = linear_map_to_bitmap[m]
+            bitmap_l = bitmap_k ^ bitmap_m
+            if _bitmap_product_check(product, count_set_bits(bitmap_l), grade_k, count_set_bits(bitmap_m)):
+                sign = canonical_reordering_sign(bitmap_k, bitmap_m, signature)
+                if sign != 0:
+                    coords[0, count] = k
+                    coords[1, count] = bitmap_to_linear_map[bitmap_l]
+                    coords[2, count] = m
+                    mult_table_vals[count] = sign
+                    count += 1
+    return coords[:, :count], mult_table_vals[:count]
+
+
+def bitmap_mult_table(product: int, linear_map_to_bitmap, bitmap_to_linear_map, signature, gradeList,
+                      grades_a, grades_b) -> sparse.COO:
+    """
+    Build the part of a multiplication table with operands of grades
+    `grades_a` and `grades_b`
+
+    This is the bitmap-engine counterpart of :func:`filter_mult_table`, which
+    never builds the full table.
+    """
+    gradeList = np.asarray(gradeList)
+    dims = len(gradeList)
+    coords, mult_table_vals = _numba_bitmap_mult_table(
+        product,
+        np.flatnonzero(np.isin(gradeList, grades_a)),
+        np.flatnonzero(np.isin(gradeList, grades_b)),
+        linear_map_to_bitmap, bitmap_to_linear_map, signature
+    )
+    return sparse.COO(coords=coords, data=mult_table_vals, shape=(dims, dims, dims))
+
+
+@numba.njit(parallel=NUMBA_PARALLEL, nogil=True, cache=True)
+def _numba_bitmap_inv_batch(value, linear_map_to_bitmap, bitmap_to_linear_map, signature,
+                            adjoint_signs, scalar_index, eps, n_workers, chunk_size, output, ok):
+    n, n_dims = value.shape
+    for worker in numba.prange(n_workers):
+        # workspace reused for every element handled by this worker
+        adjoint = np.empty(n_dims, dtype=output.dtype)
+        value_adjoint = np.empty(n_dims, dtype=output.dtype)
+        intermed = np.empty((n_dims, n_dims), dtype=output.dtype)
+        for start in range(worker * chunk_size, n, n_workers * chunk_size):
+            for i in range(start, min(n, start + chunk_size)):
+                for j in range(n_dims):
+                    adjoint[j] = adjoint_signs[j] * value[i, j]
+                value_adjoint[:] = 0
+                _numba_bitmap_mult_into(value[i], adjoint, linear_map_to_bitmap, bitmap_to_linear_map, signature,
+                                        _BITMAP_GMT, value_adjoint)
+                if _numba_versor_inv_into(adjoint, value_adjoint, scalar_index, eps, output[i]):
+                    ok[i] = True
+                else:
+                    _numba_bitmap_val_get_left_gmt_matrix_into(
+                        value[i], linear_map_to_bitmap, bitmap_to_linear_map, signature, intermed)
+                    ok[i] = _numba_solve_scalar_into(intermed, scalar_index, eps, output[i])
+
+
+def bitmap_inv_batch(linear_map_to_bitmap, bitmap_to_linear_map, signature, gradeList, a, out=None, dtype=None):
+    """
+    The bitmap-engine counterpart of :func:`inv_batch`
+    """
+    dims = len(linear_map_to_bitmap)
+    a_2d, out, args = _prepare_inv_batch(a, dims, gradeList, out, dtype)
+    out_2d = _as_2d_view(out, dims)
+    ok = np.empty(len(a_2d), dtype=np.bool_)
+    _numba_bitmap_inv_batch(a_2d, linear_map_to_bitmap, bitmap_to_linear_map, signature, *args, out_2d, ok)
+    _check_inv_batch(ok)
+    return out
+
+
 def general_exp(x, max_order=15):
     """
     This implements the series expansion of e**mv where mv is a multivector
     The parameter order is the maximum order of the taylor series to use
+
+    If mv is a bivector (plus an optional scalar) which is the sum of at most
+    two commuting simple bivectors, as is always the case in 5 or fewer
+    dimensions, the exponential is instead computed in closed form.
     """
+    if isinstance(x, MultiVector):
+        other_grades = ~(x.layout.grade_mask(0) | x.layout.grade_mask(2))
+        if np.all(np.abs(x.value[other_grades]) < _eps):
+            value, ok = _bivector.exp_value(x.layout, x.value)
+            if ok:
+                return x._newMV(value)
 
     result = 1.0
     if max_order == 0:
@@ -406,7 +1156,7 @@ def generate_bitmap_to_linear_index_map(bladeTupList, firstIdx):
     return bitmap_map
 
 
-@numba.njit
+@numba.njit(cache=True)
 def count_set_bits(bitmap):
     """
     Counts the number of bits set to 1 in bitmap
@@ -422,7 +1172,7 @@ def count_set_bits(bitmap):
     return count
 
 
-@numba.njit
+@numba.njit(cache=True)
 def canonical_reordering_sign_euclidean(bitmap_a, bitmap_b):
     """
     Computes the sign for the product of bitmap_a and bitmap_b
@@ -439,7 +1189,7 @@ def canonical_reordering_sign_euclidean(bitmap_a, bitmap_b):
         return -1
 
 
-@numba.njit
+@numba.njit(cache=True)
 def canonical_reordering_sign(bitmap_a, bitmap_b, metric):
     """
     Computes the sign for the product of bitmap_a and bitmap_b
@@ -499,16 +1249,26 @@ def compute_blade_representation(bitmap: int, firstIdx: int) -> Tuple[int, ...]:
 
 
 # todo: work out how to let numba use the COO objects directly
-@numba.njit
-def _numba_val_get_left_gmt_matrix(x, k_list, l_list, m_list, mult_table_vals, ndims):
-    intermed = np.zeros((ndims, ndims))
+@numba.njit(nogil=True, cache=True)
+def _numba_val_get_left_gmt_matrix_into(x, k_list, l_list, m_list, mult_table_vals, intermed):
+    intermed[:] = 0
     test_ind = 0
     for k in k_list:
         j = l_list[test_ind]
         i = m_list[test_ind]
         intermed[j, i] += mult_table_vals[test_ind] * x[k]
         test_ind = test_ind + 1
-    return intermed
+
+
+@numba.generated_jit(nopython=True, cache=True)
+def _numba_val_get_left_gmt_matrix(x, k_list, l_list, m_list, mult_table_vals, ndims):
+    ret_dtype = _get_matrix_result_type(x)
+
+    def get_matrix(x, k_list, l_list, m_list, mult_table_vals, ndims):
+        intermed = np.zeros((ndims, ndims), dtype=ret_dtype)
+        _numba_val_get_left_gmt_matrix_into(x, k_list, l_list, m_list, mult_table_vals, intermed)
+        return intermed
+    return get_matrix
 
 
 def val_get_left_gmt_matrix(mt: sparse.COO, x):
@@ -535,6 +1295,10 @@ def val_get_right_gmt_matrix(mt: sparse.COO, x):
 from ._layout import Layout  # noqa: E402
 from ._multivector import MultiVector  # noqa: E402
 from ._mvarray import MVArray  # noqa: E402
+from ._dense_mvarray import DenseMVArray  # noqa: E402, F401
+from ._graded_multivector import GradedMultiVector  # noqa: E402, F401
+from . import _numba_types  # noqa: E402, F401
+from ._jit_expr import jit_expr, FusedExpression  # noqa: E402, F401
 
 
 def array(obj):
@@ -718,20 +1482,24 @@ def elements(dims: int, firstIdx=0) -> List[Tuple[int, ...]]:
     return list(_powerset(range(firstIdx, firstIdx + dims)))
 
 
-def Cl(p=0, q=0, r=0, sig=None, names=None, firstIdx=1, mvClass=MultiVector):
+def Cl(p=0, q=0, r=0, sig=None, names=None, firstIdx=1, mvClass=MultiVector, engine='tables',
+       dtype=np.float64):
     """Returns a Layout and basis blades for the geometric algebra Cl_p,q.
 
     The notation Cl_p,q means that the algebra is p+q dimensional, with
     the first p vectors with positive signature and the final q vectors
     negative.
 
+    `engine` selects how products are computed, and `dtype` the type of the
+    coefficients of new multivectors, see :class:`Layout`.
+
     Cl(p, q=0, names=None, firstIdx=0) --> Layout, {'name': basisElement, ...}
     """
     if sig is None:
         sig = [0]*r + [+1]*p + [-1]*q
     bladeTupList = elements(len(sig), firstIdx)
 
-    layout = Layout(sig, bladeTupList, firstIdx=firstIdx, names=names)
+    layout = Layout(sig, bladeTupList, firstIdx=firstIdx, names=names, engine=engine, dtype=dtype)
     blades = bases(layout, mvClass)
 
     return layout, blades
@@ -750,14 +1518,22 @@ def bases(layout, mvClass=MultiVector, grades: Optional[Container[int]] = None)
         This dictionary includes the scalar
     """
 
+    # with the default dtype, the blades have exact integer coefficients,
+    # which would upcast the coefficients of any other dtype
+    dtype = int if layout.dtype == np.float64 else layout.dtype
+
     dict = {}
     for i in range(layout.gaDims):
         grade = layout.gradeList[i]
         if grades is not None and grade not in grades:
             continue
-        v = np.zeros((layout.gaDims,), dtype=int)
+        v = np.zeros((layout.gaDims,), dtype=dtype)
         v[i] = 1
-        dict[layout.names[i]] = mvClass(layout, v)
+        blade = mvClass(layout, v)
+        # blades are shared, such as the module-level ones of clifford.g3c,
+        # so in-place operators must not modify them
+        blade.value.flags.writeable = False
+        dict[layout.names[i]] = blade
     return dict
 
 
@@ -793,11 +1569,11 @@ def randomMV(
         uniform = np.random.uniform
 
     if grades is None:
-        mv = mvClass(layout, uniform(min, max, (layout.gaDims,)))
+        mv = mvClass(layout, uniform(min, max, (layout.gaDims,)).astype(layout.dtype))
     else:
         if isinstance(grades, int):
             grades = [grades]
-        newValue = np.zeros((layout.gaDims,))
+        newValue = np.zeros((layout.gaDims,), dtype=layout.dtype)
         for i in range(layout.gaDims):
             if layout.gradeList[i] in grades:
                 newValue[i] = uniform(min, max)
@@ -854,6 +1630,52 @@ def eps(newEps=None):
     return _eps
 
 
+def batch_threads(newNumThreads=None):
+    """Get/Set the number of threads used by the batched kernels.
+
+    These are :func:`mult_batch`, :func:`inv_batch`, the ``*_batch`` and
+    ``*_reduce`` methods of :class:`Layout`, the operators of
+    :class:`DenseMVArray`, :meth:`FusedExpression.batch`, and
+    :func:`clifford.tools.g3c.cost_functions.object_set_cost_matrix`.
+    This defaults to all of the threads numba was started with, which is
+    controlled by the ``NUMBA_NUM_THREADS`` environment variable, and cannot
+    be more than that. If parallelism was disabled with the
+    ``NUMBA_DISABLE_PARALLEL`` environment variable, it must be 1.
+
+    batch_threads(newNumThreads)
+    """
+
+    global _batch_threads
+    if newNumThreads is not None:
+        max_threads = numba.config.NUMBA_NUM_THREADS if NUMBA_PARALLEL else 1
+        if not 1 <= newNumThreads <= max_threads:
+            raise ValueError(
+                "number of threads must be between 1 and {}, not {}".format(max_threads, newNumThreads))
+        _batch_threads = int(newNumThreads)
+    return _batch_threads
+
+
+def batch_chunk_size(newChunkSize=None):
+    """Get/Set the number of consecutive multivectors a thread of a batched
+    kernel takes at a time.
+
+    Chunks are handed to the threads in turn, so smaller chunks balance
+    uneven work better, while larger ones have less overhead. Reductions such
+    as :meth:`Layout.sum_reduce` combine the results of each chunk in order,
+    so their rounding depends on the chunk size, but never on the number of
+    threads.
+
+    batch_chunk_size(newChunkSize)
+    """
+
+    global _batch_chunk_size
+    if newChunkSize is not None:
+        if newChunkSize < 1:
+            raise ValueError("chunk size must be at least 1, not {}".format(newChunkSize))
+        _batch_chunk_size = int(newChunkSize)
+    return _batch_chunk_size
+
+
 def print_precision(newVal):
     """Set the epsilon for float comparisons.
 
@@ -941,7 +1763,8 @@ def conformalize(layout, added_sig=[1, -1], **kw):
     added_sig: list-like
         list of +1, -1  denoted the added signatures
     **kw: kwargs
-        passed to Cl() used to generate conformal layout
+        passed to Cl() used to generate conformal layout. The ``engine`` and
+        ``dtype`` default to those of `layout`.
 
     Returns
     ---------
@@ -971,6 +1794,8 @@ def conformalize(layout, added_sig=[1, -1], **kw):
     >>> locals().update(stuff)
     '''
 
+    kw.setdefault('engine', layout.engine)
+    kw.setdefault('dtype', layout.dtype)
     sig_c = list(layout.sig) + added_sig
     layout_c, blades_c = Cl(sig=sig_c, firstIdx=layout.firstIdx, **kw)
     basis_vectors = layout_c.basis_vectors
@@ -985,8 +1810,16 @@ def conformalize(layout, added_sig=[1, -1], **kw):
     layout_c.einf = einf
     layout_c.eo = eo
 
-    E0 = einf ^ eo
-    I_base = layout_c.pseudoScalar*E0
+    # E0 = einf ^ eo = ep ^ en and I_base = I * E0 are both single blades, so
+    # are built directly from their blade tuples. This avoids compiling any
+    # products just to conformalize a layout.
+    ep_tup, en_tup = [
+        layout_c.bladeTupList[int(np.flatnonzero(v.value)[0])] for v in (ep, en)
+    ]
+    E0 = layout_c.MultiVector()
+    E0[ep_tup + en_tup] = 1
+    I_base = layout_c.MultiVector()
+    I_base[layout_c.bladeTupList[-1] + ep_tup + en_tup] = 1
 
     # some convenience functions
     def up(x):
@@ -994,7 +1827,7 @@ def conformalize(layout, added_sig=[1, -1], **kw):
             if x.layout == layout:
                 # vector is in original space, map it into conformal space
                 old_val = x.value
-                new_val = zeros(layout_c.gaDims)
+                new_val = zeros(layout_c.gaDims, dtype=old_val.dtype)
                 new_val[:len(old_val)] = old_val
                 x = layout_c.MultiVector(value=new_val)
         except(AttributeError):
@@ -1023,10 +1856,3 @@ def conformalize(layout, added_sig=[1, -1], **kw):
 
     return layout_c, blades_c, stuff
 
-
-# TODO: fix caching to work
-# generate pre-defined algebras and cache them
-
-# sigs = [(1, 1, 0), (2, 0, 0), (3, 1, 0), (3, 0, 0), (3, 2, 0), (4, 0, 0)]
-# current_module = sys.modules[__name__]
-# caching.build_or_read_cache_and_attach_submods(current_module, sigs=sigs)
@@ -0,0 +1,222 @@
+r"""
+Closed-form exponentials of bivectors and logarithms of rotors
+
+A bivector :math:`B` whose square is a scalar is *simple*, and
+
+.. math::
+
+    e^B = \cosh\sqrt{B^2} + \frac{\sinh\sqrt{B^2}}{\sqrt{B^2}} B
+
+which continues to :math:`\cos` and :math:`\sin` when :math:`B^2 < 0`, and to
+:math:`1 + B` when :math:`B^2 = 0`.
+
+A bivector made of at most two orthogonal planes, which includes every
+bivector of an algebra with up to 5 dimensions, can be split into commuting
+simple parts :math:`B = B_1 + B_2`. Their squares :math:`\lambda_i = B_i^2`
+are the roots of :math:`\lambda^2 - \langle B^2 \rangle_0 \lambda + W^2`,
+where :math:`W = B_1 B_2 = \frac{1}{2}\langle B^2 \rangle_4`, and then
+
+.. math::
+
+    B_1 = \frac{BW - \lambda_1 B}{\lambda_2 - \lambda_1}
+
+which requires the roots to be real. When they are equal the split is not
+unique, but the exponential only depends on :math:`B` and :math:`W`. The
+exponential is the product of the exponentials of the parts, and the
+logarithm of a rotor is found by splitting its bivector part in the same way.
+"""
+import numpy as np
+import numba
+
+import clifford as cf
+
+# Tolerance, relative to the size of the coefficients involved, below which
+# parts of a result are treated as rounding errors
+_rtol = 1e-10
+
+
+@numba.njit(cache=True)
+def _negligible(x, scale):
+    """ Whether all the coefficients of x are rounding errors against scale """
+    return np.all(np.abs(x) <= _rtol * scale)
+
+
+@numba.njit(cache=True)
+def _simple_exp_coefficients(lam):
+    """ The scalar and bivector coefficients of the exponential of a simple bivector """
+    if lam > 0:
+        r = np.sqrt(lam)
+        return np.cosh(r), np.sinh(r) / r
+    elif lam < 0:
+        r = np.sqrt(-lam)
+        return np.cos(r), np.sin(r) / r
+    return 1.0, 1.0
+
+
+@numba.njit(cache=True)
+def _simple_log_coefficient(c, lam):
+    """
+    The factor relating the bivector part of a simple rotor (scaled by an
+    unknown positive factor, with scalar part `c`) to its logarithm, and
+    whether it exists
+    """
+    if lam < 0:
+        r = np.sqrt(-lam)
+        return np.arctan2(r, c) / r, True
+    elif lam > 0:
+        r = np.sqrt(lam)
+        if r >= abs(c):
+            return 0.0, False
+        return np.sign(c) * np.arctanh(r / abs(c)) / r, True
+    elif c == 0:
+        return 0.0, False
+    return 1 / c, True
+
+
+def get_bivector_functions(gmt_func, gradeList):
+    """
+    Get jitted functions for the exponential of a bivector and the logarithm
+    of a rotor in the layout with the given geometric product.
+
+    Both return ``(value, ok)``, where the value is only valid if ``ok``. For
+    the exponential, the input may also have a scalar part, and is otherwise
+    assumed to be a bivector. The logarithm ignores the scale of its input.
+    """
+    grades = np.array(gradeList)
+    scalar_index = gradeList.index(0)
+    mask_2 = (grades == 2).astype(np.float64)
+    mask_4 = (grades == 4).astype(np.float64)
+    mask_odd = (grades % 2).astype(np.float64)
+
+    @numba.njit
+    def split(B):
+        """
+        Split a bivector into commuting simple parts.
+
+        Returns ``(B1, B2, lam1, lam2, W, ok)`` where ``lam_i = B_i**2`` and
+        ``W = B1*B2``. Where the parts have equal squares the split is not
+        unique, and ``B/2`` is returned for both parts.
+        """
+        BB = gmt_func(B, B)
+        s = BB[scalar_index]
+        scale = np.max(np.abs(BB))
+        W = 0.5 * BB * mask_4
+        if _negligible(W, scale):
+            return B, np.zeros_like(B), s, 0.0, np.zeros_like(W), True
+
+        # with more than two planes, BW has a grade 6 part
+        BW = gmt_func(B, W)
+        BW_2 = BW * mask_2
+        BW_scale = np.max(np.abs(BW))
+        if not _negligible(BW - BW_2, BW_scale):
+            return B, B, s, s, W, False
+
+        disc = s*s - 4*gmt_func(W, W)[scalar_index]
+        if abs(disc) <= _rtol * scale*scale:
+            # equal squares need BW == lam*B, which is otherwise implied
+            lam = s / 2
+            return B / 2, B / 2, lam, lam, W, _negligible(BW_2 - lam*B, BW_scale)
+        elif disc < 0:
+            return B, B, s, s, W, False
+
+        root = np.sqrt(disc)
+        lam1 = (s + root) / 2
+        lam2 = (s - root) / 2
+        B1 = (BW_2 - lam1*B) / (lam2 - lam1)
+        return B1, B - B1, lam1, lam2, W, True
+
+    # Both functions work in double precision, but return values of the type
+    # of their input, so that float32 values stay float32.
+
+    @numba.njit
+    def exp_func(value):
+        dtype = value.dtype
+        value = value.astype(np.float64)
+        B1, B2, lam1, lam2, W, ok = split(value * mask_2)
+        c1, g1 = _simple_exp_coefficients(lam1)
+        c2, g2 = _simple_exp_coefficients(lam2)
+
+        # (c1 + g1*B1)*(c2 + g2*B2), using that B1*B2 == W
+        ret = c2*g1*B1 + c1*g2*B2 + g1*g2*W
+        ret[scalar_index] += c1*c2
+        return (np.exp(value[scalar_index]) * ret).astype(dtype), ok
+
+    @numba.njit
+    def log_func(value):
+        dtype = value.dtype
+        value = value.astype(np.float64)
+        c = value[scalar_index]
+        P1, P2, lam1, lam2, W, ok = split(value * mask_2)
+        scale = max(np.max(np.abs(value)), np.max(np.abs(W)))
+        ok = ok and _negligible(value * mask_odd, scale)
+
+        f1, ok1 = _simple_log_coefficient(c, lam1)
+        if np.any(P2 != 0):
+            f2, ok2 = _simple_log_coefficient(c, lam2)
+        else:
+            # a vanishing part leaves only the grade 4 part to describe it
+            f2, ok2 = 0.0, _negligible(value * mask_4, scale)
+
+        # With two elliptic parts, each is only recovered up to the sign of
+        # the scalar part of the other, so the product is out by the sign of
+        # `c`, which a half turn of one part corrects.
+        if lam1 < 0 and lam2 < 0 and c < 0:
+            f1 += np.pi / np.sqrt(-lam1)
+        return (f1*P1 + f2*P2).astype(dtype), ok and ok1 and ok2
+
+    return exp_func, log_func
+
+
+def get_batch_function(func):
+    """
+    Get a jitted function applying one of the functions from
+    :func:`get_bivector_functions` to every row of a 2d array, split between
+    workers as described by :func:`clifford._batch_schedule`
+    """
+    @numba.njit(parallel=cf.NUMBA_PARALLEL, nogil=True)
+    def batch_func(values, n_workers, chunk_size):
+        n = values.shape[0]
+        out = np.empty_like(values)
+        ok = np.empty(n, dtype=np.bool_)
+        for worker in numba.prange(n_workers):
+            for start in range(worker * chunk_size, n, n_workers * chunk_size):
+                for i in range(start, min(n, start + chunk_size)):
+                    value, value_ok = func(values[i])
+                    out[i, :] = value
+                    ok[i] = value_ok
+        return out, ok
+    return batch_func
+
+
+def _apply(layout, name, value):
+    value = np.asarray(value)
+    dtype = np.float32 if value.dtype == np.float32 else np.float64
+    value = np.ascontiguousarray(value, dtype=dtype)
+    funcs = layout._bivector_funcs
+    if value.ndim == 1:
+        return funcs[name](value)
+    value_2d = value.reshape(-1, layout.gaDims)
+    out, ok = funcs[name + '_batch'](value_2d, *cf._batch_schedule(len(value_2d)))
+    return out.reshape(value.shape), ok.reshape(value.shape[:-1])
+
+
+def exp_value(layout, value):
+    """
+    The exponential of bivectors with an optional scalar part, given as an
+    array of coefficients of shape ``(..., gaDims)``.
+
+    Returns ``(exp_value, ok)``. Where ``ok`` is False, the bivector cannot be
+    split into two commuting simple parts, and the result is invalid.
+    """
+    return _apply(layout, 'exp', value)
+
+
+def log_value(layout, value):
+    """
+    The logarithm of rotors, given as an array of coefficients of shape
+    ``(..., gaDims)``.
+
+    Returns ``(log_value, ok)``. Where ``ok`` is False, the rotor has no real
+    logarithm, or it cannot be found in closed form, and the result is invalid.
+    """
+    return _apply(layout, 'log', value)
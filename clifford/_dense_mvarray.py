@@ -0,0 +1,406 @@
+import numbers
+
+import numpy as np
+
+import clifford as cf
+from clifford.io import write_ga_file, read_ga_file
+from . import _bivector
+from ._multivector import MultiVector
+from ._mvarray import MVArray
+
+
+class DenseMVArray(object):
+    '''
+    An array of multivectors stored as a single contiguous coefficient buffer
+
+    Unlike :class:`MVArray`, which is an object array of individual
+    :class:`MultiVector` instances, this stores the coefficients of every
+    multivector in one ``(..., gaDims)`` array, and implements all of its
+    operators with vectorised kernels.
+
+    Parameters
+    -------------
+    layout: instance of :class:`clifford.Layout`
+        the layout of the algebra
+
+    value : array_like (..., layout.gaDims)
+        the coefficients of the base blades for each multivector
+
+    Notes
+    ------
+    Indexing with an integer returns a :class:`MultiVector`, while any other
+    index returns a :class:`DenseMVArray` sharing memory with this one.
+    Operators broadcast in the same way as numpy arrays, treating the last
+    axis as the multivector coefficients. A :class:`MultiVector` operand is
+    broadcast against every element.
+    '''
+
+    # prevent numpy from trying to treat us as an array of scalars, so that
+    # `np.float64(2) * arr` is forwarded to `arr.__rmul__`
+    __array_ufunc__ = None
+
+    def __init__(self, layout, value):
+        self.layout = layout
+        self.value = np.asarray(value)
+        if self.value.shape[-1:] != (layout.gaDims,):
+            raise ValueError(
+                "value must have a last dimension of length %s" %
+                layout.gaDims)
+
+    @classmethod
+    def from_mvarray(cls, mv_array, layout=None):
+        '''
+        Construct from an :class:`MVArray` or a sequence of multivectors
+
+        `layout` defaults to that of the first multivector, so must be given
+        if the sequence is empty.
+        '''
+        if len(mv_array) == 0:
+            if layout is None:
+                raise ValueError('The layout of an empty array must be given')
+            return cls(layout, np.zeros((0, layout.gaDims), dtype=layout.dtype))
+        if layout is None:
+            layout = mv_array[0].layout
+        return cls(layout, np.array([mv.value for mv in mv_array]))
+
+    @classmethod
+    def open(cls, layout, filename):
+        '''
+        Open a ga file as a read-only array backed by the file itself
+
+        The coefficients are memory mapped rather than read into memory, so
+        many processes can share a large file. See :meth:`clifford.io.GAFile.memmap`
+        for which files this is possible for.
+        '''
+        data_array, metric, basis_names, support = read_ga_file(filename, mmap=True)
+        if not np.allclose(np.diagonal(metric), layout.sig):
+            raise ValueError('The signature of the ga file does not match this layout')
+        return cls(layout, data_array)
+
+    def to_mvarray(self) -> MVArray:
+        '''
+        Convert to an :class:`MVArray` of individual multivectors
+        '''
+        return MVArray.from_value_array(self.layout, self.value)
+
+    def _newMVArray(self, value):
+        return self.__class__(self.layout, value)
+
+    # array-like behaviour
+
+    @property
+    def shape(self):
+        return self.value.shape[:-1]
+
+    @property
+    def ndim(self):
+        return self.value.ndim - 1
+
+    @property
+    def dtype(self):
+        return self.value.dtype
+
+    def __len__(self):
+        return len(self.value)
+
+    def __getitem__(self, key):
+        value = self.value[key]
+        if value.shape[-1:] != (self.layout.gaDims,):
+            raise IndexError("cannot index into the coefficients of a DenseMVArray")
+        if value.ndim == 1:
+            return MultiVector(self.layout, value)
+        return self._newMVArray(value)
+
+    def __setitem__(self, key, value):
+        if isinstance(value, (MultiVector, DenseMVArray)):
+            self._checkLayout(value)
+            value = value.value
+        self.value[key] = value
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return "DenseMVArray(%r, value=%r)" % (self.layout, self.value)
+
+    def copy(self) -> 'DenseMVArray':
+        return self._newMVArray(self.value.copy())
+
+    def astype(self, *args, **kwargs) -> 'DenseMVArray':
+        """
+        Change the underlying scalar type of the coefficients
+
+        See `np.ndarray.astype` for argument descriptions.
+        """
+        return self._newMVArray(self.value.astype(*args, **kwargs))
+
+    # binary operators
+
+    def _checkLayout(self, other):
+        if other.layout is not self.layout and other.layout != self.layout:
+            raise ValueError(
+                "cannot operate on MultiVectors with different Layouts")
+
+    def _otherValue(self, other):
+        """ Get the coefficients of a multivector operand, or None """
+        if isinstance(other, (MultiVector, DenseMVArray)):
+            self._checkLayout(other)
+            return other.value
+        return None
+
+    def _scalarValue(self, other):
+        """ Convert a scalar or array of scalars to broadcast against `value` """
+        if isinstance(other, numbers.Number):
+            return other
+        other = np.asarray(other)
+        if other.dtype == object:
+            return None
+        return other[..., np.newaxis]
+
+    def _product(self, batch_func, other, reflected=False):
+        other_value = self._otherValue(other)
+        if other_value is not None:
+            if reflected:
+                return self._newMVArray(batch_func(other_value, self.value))
+            return self._newMVArray(batch_func(self.value, other_value))
+        return NotImplemented
+
+    def __mul__(self, other) -> 'DenseMVArray':
+        """ Geometric product, broadcasting over the array """
+        res = self._product(self.layout.gmt_batch, other)
+        if res is NotImplemented:
+            scale = self._scalarValue(other)
+            if scale is not None:
+                return self._newMVArray(self.value * scale)
+        return res
+
+    def __rmul__(self, other) -> 'DenseMVArray':
+        res = self._product(self.layout.gmt_batch, other, reflected=True)
+        if res is NotImplemented:
+            scale = self._scalarValue(other)
+            if scale is not None:
+                return self._newMVArray(scale * self.value)
+        return res
+
+    def __xor__(self, other) -> 'DenseMVArray':
+        """ Outer product, broadcasting over the array """
+        res = self._product(self.layout.omt_batch, other)
+        if res is NotImplemented:
+            scale = self._scalarValue(other)
+            if scale is not None:
+                return self._newMVArray(self.value * scale)
+        return res
+
+    def __rxor__(self, other) -> 'DenseMVArray':
+        res = self._product(self.layout.omt_batch, other, reflected=True)
+        if res is NotImplemented:
+            scale = self._scalarValue(other)
+            if scale is not None:
+                return self._newMVArray(scale * self.value)
+        return res
+
+    def __or__(self, other) -> 'DenseMVArray':
+        """ Inner product, broadcasting over the array """
+        res = self._product(self.layout.imt_batch, other)
+        if res is NotImplemented:
+            scale = self._scalarValue(other)
+            if scale is not None:
+                # l * M = M * l = 0 for scalar l
+                return self._newMVArray(np.zeros_like(self.value * scale))
+        return res
+
+    def __ror__(self, other) -> 'DenseMVArray':
+        res = self._product(self.layout.imt_batch, other, reflected=True)
+        if res is NotImplemented:
+            scale = self._scalarValue(other)
+            if scale is not None:
+                return self._newMVArray(np.zeros_like(scale * self.value))
+        return res
+
+    def _coerce(self, other):
+        """ Promote a scalar to a scalar MultiVector """
+        if isinstance(other, numbers.Number):
+            newOther = MultiVector(self.layout, dtype=np.result_type(other))
+            newOther[()] = other
+            return newOther
+        return other
+
+    def lc(self, other) -> 'DenseMVArray':
+        """ Left-contraction, broadcasting over the array """
+        return self._product(self.layout.lcmt_batch, self._coerce(other))
+
+    __lshift__ = lc
+
+    def __rlshift__(self, other) -> 'DenseMVArray':
+        return self._product(self.layout.lcmt_batch, self._coerce(other), reflected=True)
+
+    def _addValue(self, other):
+        """ Get coefficients to add, promoting scalars to the scalar blade """
+        other_value = self._otherValue(other)
+        if other_value is not None:
+            return other_value
+        scale = self._scalarValue(other)
+        if scale is None:
+            return None
+        other_value = np.zeros(
+            np.shape(scale)[:-1] + (self.layout.gaDims,),
+            dtype=np.result_type(scale, self.value.dtype)
+        )
+        scalar_index = self.layout.gradeList.index(0)
+        other_value[..., scalar_index:scalar_index + 1] = scale
+        return other_value
+
+    def __add__(self, other) -> 'DenseMVArray':
+        other_value = self._addValue(other)
+        if other_value is None:
+            return NotImplemented
+        return self._newMVArray(self.value + other_value)
+
+    __radd__ = __add__
+
+    def __sub__(self, other) -> 'DenseMVArray':
+        other_value = self._addValue(other)
+        if other_value is None:
+            return NotImplemented
+        return self._newMVArray(self.value - other_value)
+
+    def __rsub__(self, other) -> 'DenseMVArray':
+        other_value = self._addValue(other)
+        if other_value is None:
+            return NotImplemented
+        return self._newMVArray(other_value - self.value)
+
+    def __truediv__(self, other) -> 'DenseMVArray':
+        """ Division by scalars, arrays of scalars, or multivectors """
+        other_value = self._otherValue(other)
+        if other_value is not None:
+            return self._newMVArray(self.layout.gmt_batch(self.value, self.layout.inv_batch(other_value)))
+        scale = self._scalarValue(other)
+        if scale is None:
+            return NotImplemented
+        return self._newMVArray(self.value / scale)
+
+    def __rtruediv__(self, other) -> 'DenseMVArray':
+        other_value = self._otherValue(other)
+        if other_value is not None:
+            return self._newMVArray(self.layout.gmt_batch(other_value, self.layout.inv_batch(self.value)))
+        scale = self._scalarValue(other)
+        if scale is None:
+            return NotImplemented
+        return self._newMVArray(scale * self.layout.inv_batch(self.value))
+
+    # unary operators
+
+    def __neg__(self) -> 'DenseMVArray':
+        return self._newMVArray(-self.value)
+
+    def __pos__(self) -> 'DenseMVArray':
+        return self._newMVArray(self.value.copy())
+
+    def adjoint(self) -> 'DenseMVArray':
+        r""" Reversion of every element, :math:`\tilde M` """
+        return self._newMVArray(self.layout.adjoint_batch(self.value))
+
+    __invert__ = adjoint
+
+    def gradeInvol(self) -> 'DenseMVArray':
+        """ Grade involution of every element, see :meth:`MultiVector.gradeInvol` """
+        return self._newMVArray(self.layout.gradeInvol_batch(self.value))
+
+    def conjugate(self) -> 'DenseMVArray':
+        """ Clifford conjugate of every element, see :meth:`MultiVector.conjugate` """
+        return self._newMVArray(self.layout.conjugate_batch(self.value))
+
+    def __call__(self, grade, *grades) -> 'DenseMVArray':
+        """
+        Project every element onto one or more grades
+
+        Examples
+        --------
+        >>> arr(1)
+        >>> arr(0, 2)
+        """
+        return self._newMVArray(self.layout.grade_projection_batch(self.value, (grade,) + grades))
+
+    def mag2(self) -> np.ndarray:
+        """ Magnitude squared of every element, :math:`{|M|}^2` """
+        return self.layout.mag2_batch(self.value)
+
+    def __abs__(self) -> np.ndarray:
+        return self.layout.abs_batch(self.value)
+
+    def normal(self) -> 'DenseMVArray':
+        r""" Normalise every element, :math:`\frac{M}{|M|}` up to a sign """
+        return self._newMVArray(self.layout.normal_batch(self.value))
+
+    def inv(self) -> 'DenseMVArray':
+        r"""
+        The inverse of every element, :math:`M^{-1}`
+
+        See :meth:`Layout.inv_batch` for details.
+        """
+        return self._newMVArray(self.layout.inv_batch(self.value))
+
+    def exp(self) -> 'DenseMVArray':
+        """
+        The exponential of every element
+
+        Bivectors are computed in closed form all at once, falling back to
+        :meth:`MultiVector.exp` for any elements where this is not possible.
+        """
+        value, ok = _bivector.exp_value(self.layout, self.value)
+        # the same test as general_exp, so that elements are treated alike
+        other_grades = ~(self.layout.grade_mask(0) | self.layout.grade_mask(2))
+        ok &= np.all(np.abs(self.value[..., other_grades]) < cf._eps, axis=-1)
+        for idx in zip(*np.nonzero(~ok)):
+            value[idx] = MultiVector(self.layout, self.value[idx]).exp().value
+        return self._newMVArray(value)
+
+    def log(self) -> 'DenseMVArray':
+        """
+        The bivector logarithm of every element
+
+        See :meth:`MultiVector.log` for details.
+        """
+        value, ok = _bivector.log_value(self.layout, self.value)
+        if not np.all(ok):
+            raise ValueError("cannot compute the logarithm of every element")
+        return self._newMVArray(value)
+
+    def dual(self) -> 'DenseMVArray':
+        r""" The dual of every element against the pseudoscalar """
+        indices, signs = self.layout._dual_permutation
+        return self._newMVArray(self.value[..., indices] * signs)
+
+    # reductions
+
+    def sum(self) -> MultiVector:
+        '''
+        sum elements of a 1-D array
+
+        See :meth:`Layout.sum_reduce` for details.
+        '''
+        return MultiVector(self.layout, self.layout.sum_reduce(self.value))
+
+    def gp(self) -> MultiVector:
+        '''
+        geometric product of all elements of a 1-D array, in order, like
+        `self[0]*self[1]*....self[n]`
+
+        See :meth:`Layout.gmt_reduce` for details.
+        '''
+        return MultiVector(self.layout, self.layout.gmt_reduce(self.value))
+
+    def save(self, filename, compression=True, transpose=False,
+             sparse=None, support=None, compression_opts=1):
+        """
+        Saves the array to a ga file
+
+        See :func:`clifford.io.write_ga_file` for a description of the
+        arguments.
+        """
+        write_ga_file(filename, self.value.reshape(-1, self.layout.gaDims),
+                      self.layout.metric, self.layout.basis_names,
+                      compression=compression, transpose=transpose,
+                      sparse=sparse, support=support, compression_opts=compression_opts)
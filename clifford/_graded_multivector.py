@@ -0,0 +1,209 @@
+import numbers
+from typing import Iterable, Optional
+
+import numpy as np
+
+from ._multivector import MultiVector
+
+
+class GradedMultiVector(object):
+    '''
+    A multivector which only stores the coefficients of the grades it contains
+
+    A vector in ``Cl(8)`` has 8 nonzero coefficients out of 256. Storing
+    only the blocks of the grades present, and multiplying with kernels which
+    only visit the entries of the multiplication table between those grades,
+    makes both memory and work scale with the grades actually used rather
+    than with ``layout.gaDims``. The kernels are compiled for each pair of
+    grade sets the first time they are multiplied, and cached on the layout.
+
+    Parameters
+    -------------
+    layout: instance of :class:`clifford.Layout`
+        the layout of the algebra
+
+    grades : iterable of int
+        the grades to store coefficients for
+
+    value : array_like, optional
+        the coefficients of the blades of those grades, in the order they
+        appear in the layout. Defaults to zero.
+
+    Notes
+    ------
+    Operators accept other :class:`GradedMultiVector`\\ s, :class:`MultiVector`\\ s
+    (which are converted with :meth:`from_multivector`), and scalars. The
+    grades of a result are those its multiplication table can produce, so a
+    product of vectors stores grades 0 and 2 even if one of them is zero.
+    '''
+
+    __array_ufunc__ = None
+
+    def __init__(self, layout, grades: Iterable[int], value=None, *, dtype: np.dtype = None):
+        self.layout = layout
+        self.grades = tuple(sorted(set(int(g) for g in grades)))
+        n = len(self._indices)
+        if value is None:
+            self.value = np.zeros(n, dtype=np.float64 if dtype is None else dtype)
+        else:
+            self.value = np.asarray(value, dtype=dtype)
+            if self.value.shape != (n,):
+                raise ValueError(
+                    "value must have shape ({},) to store grades {}".format(n, self.grades))
+
+    @property
+    def _indices(self):
+        """ The indices in the layout of the stored blades """
+        return self.layout._grade_indices(self.grades)
+
+    @classmethod
+    def from_multivector(cls, mv: MultiVector, grades: Optional[Iterable[int]] = None) -> 'GradedMultiVector':
+        '''
+        Construct from a :class:`MultiVector`
+
+        If `grades` is not given, the grades with nonzero coefficients are
+        stored. Otherwise, any other grades are discarded.
+        '''
+        if grades is None:
+            grades = np.asarray(mv.layout.gradeList)[np.nonzero(mv.value)[0]]
+        ret = cls(mv.layout, grades, dtype=mv.value.dtype)
+        ret.value[:] = mv.value[ret._indices]
+        return ret
+
+    def to_multivector(self) -> MultiVector:
+        '''
+        Convert to a dense :class:`MultiVector`
+        '''
+        mv = MultiVector(self.layout, dtype=self.value.dtype)
+        mv.value[self._indices] = self.value
+        return mv
+
+    def _newGMV(self, grades, value) -> 'GradedMultiVector':
+        return self.__class__(self.layout, grades, value)
+
+    def __repr__(self):
+        return "GradedMultiVector(%r, grades=%r, value=%r)" % (self.layout, self.grades, self.value)
+
+    def __str__(self):
+        return str(self.to_multivector())
+
+    def __eq__(self, other):
+        other = self._checkOther(other)
+        if other is NotImplemented:
+            return NotImplemented
+        return self.to_multivector() == other.to_multivector()
+
+    def __ne__(self, other):
+        ret = self.__eq__(other)
+        if ret is NotImplemented:
+            return ret
+        return not ret
+
+    # binary operators
+
+    def _checkOther(self, other):
+        """ Convert an operand to a :class:`GradedMultiVector`, or return NotImplemented """
+        if isinstance(other, numbers.Number):
+            ret = self.__class__(self.layout, (0,), dtype=np.result_type(other))
+            ret.value[:] = other
+            return ret
+        if isinstance(other, MultiVector):
+            other = self.from_multivector(other)
+        if not isinstance(other, GradedMultiVector):
+            return NotImplemented
+        if other.layout is not self.layout and other.layout != self.layout:
+            raise ValueError("cannot operate on MultiVectors with different Layouts")
+        return other
+
+    def _product(self, name, other, reflected=False):
+        other = self._checkOther(other)
+        if other is NotImplemented:
+            return other
+        a, b = (other, self) if reflected else (self, other)
+        func, grades = self.layout._graded_mult_function(name, a.grades, b.grades)
+        if func is None:
+            return self._newGMV(grades, np.zeros(0, dtype=np.result_type(a.value, b.value)))
+        return self._newGMV(grades, func(a.value, b.value))
+
+    def __mul__(self, other) -> 'GradedMultiVector':
+        """ Geometric product, :math:`MN` """
+        return self._product('gmt', other)
+
+    def __rmul__(self, other) -> 'GradedMultiVector':
+        return self._product('gmt', other, reflected=True)
+
+    def __xor__(self, other) -> 'GradedMultiVector':
+        r""" Outer product, :math:`M \wedge N` """
+        return self._product('omt', other)
+
+    def __rxor__(self, other) -> 'GradedMultiVector':
+        return self._product('omt', other, reflected=True)
+
+    def __or__(self, other) -> 'GradedMultiVector':
+        r""" Inner product, :math:`M \cdot N` """
+        return self._product('imt', other)
+
+    def __ror__(self, other) -> 'GradedMultiVector':
+        return self._product('imt', other, reflected=True)
+
+    def lc(self, other) -> 'GradedMultiVector':
+        r""" Left-contraction, :math:`M \rfloor N` """
+        return self._product('lcmt', other)
+
+    __lshift__ = lc
+
+    def __rlshift__(self, other) -> 'GradedMultiVector':
+        return self._product('lcmt', other, reflected=True)
+
+    def _sum(self, other, sign):
+        other = self._checkOther(other)
+        if other is NotImplemented:
+            return other
+        if other.grades == self.grades:
+            return self._newGMV(self.grades, self.value + sign * other.value)
+        ret = self.__class__(
+            self.layout, self.grades + other.grades,
+            dtype=np.result_type(self.value, other.value)
+        )
+        ret.value[np.searchsorted(ret._indices, self._indices)] += self.value
+        ret.value[np.searchsorted(ret._indices, other._indices)] += sign * other.value
+        return ret
+
+    def __add__(self, other) -> 'GradedMultiVector':
+        """ Addition, :math:`M + N` """
+        return self._sum(other, 1)
+
+    __radd__ = __add__
+
+    def __sub__(self, other) -> 'GradedMultiVector':
+        """ Subtraction, :math:`M - N` """
+        return self._sum(other, -1)
+
+    def __rsub__(self, other) -> 'GradedMultiVector':
+        return (-self)._sum(other, 1)
+
+    def __truediv__(self, other) -> 'GradedMultiVector':
+        """ Division by a scalar """
+        if not isinstance(other, numbers.Number):
+            return NotImplemented
+        return self._newGMV(self.grades, self.value / other)
+
+    # unary operators
+
+    def __neg__(self) -> 'GradedMultiVector':
+        return self._newGMV(self.grades, -self.value)
+
+    def __pos__(self) -> 'GradedMultiVector':
+        return self._newGMV(self.grades, self.value.copy())
+
+    def __invert__(self) -> 'GradedMultiVector':
+        r""" Reversion, :math:`\tilde M` """
+        return self._newGMV(self.grades, self.value * self.layout._reversion_signs[self._indices])
+
+    adjoint = __invert__
+
+    def __call__(self, grade, *grades) -> 'GradedMultiVector':
+        """ Project onto one or more grades, which drops the others entirely """
+        grades = set((grade,) + grades)
+        kept = np.isin(np.asarray(self.layout.gradeList)[self._indices], list(grades))
+        return self._newGMV(grades & set(self.grades), self.value[kept])
@@ -0,0 +1,606 @@
+"""
+Compile a function of multivectors into a single fused kernel
+
+See :func:`jit_expr`.
+"""
+import fractions
+import functools
+import inspect
+import numbers
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+from . import caching, _as_2d_view, _batch_operand_2d, _batch_schedule
+from ._multivector import MultiVector
+
+
+def _normalize_number(value):
+    """ Convert a numpy or python number to a python int if it is integral, or a float """
+    if float(value).is_integer():
+        return int(value)
+    return float(value)
+
+
+def _format_number(value) -> str:
+    s = repr(value)
+    return '(' + s + ')' if value < 0 else s
+
+
+class _Graph(object):
+    """
+    A DAG of scalar operations, in which structurally identical nodes are
+    merged as they are created.
+
+    Nodes are referred to by their index in :attr:`nodes`, and only refer to
+    nodes with a smaller index. Zero is represented by ``None`` rather than a
+    node, so that it can be skipped in sums and products.
+
+    The node kinds are:
+
+    * ``('input', arg, index)``: coefficient `index` of argument `arg`
+    * ``('const', value)``
+    * ``('mul', x, y)``, with ``x <= y``
+    * ``('sum', ((coef, x), ...), const)``, sorted by ``x``
+    * ``('div', x, y)``, ``('sqrt', x)``, and ``('abs', x)``
+    """
+    def __init__(self):
+        self.nodes = []
+        self._index = {}
+        # whether any operation could make an integer input non-integral
+        self.inexact = False
+        # the dtypes of any constant multivectors
+        self.const_dtypes = set()
+
+    def _node(self, key) -> int:
+        try:
+            return self._index[key]
+        except KeyError:
+            self.nodes.append(key)
+            ret = self._index[key] = len(self.nodes) - 1
+            return ret
+
+    def _number(self, value):
+        value = _normalize_number(value)
+        if isinstance(value, float):
+            self.inexact = True
+        return value
+
+    def _const_value(self, x):
+        node = self.nodes[x]
+        return node[1] if node[0] == 'const' else None
+
+    def _split_scale(self, x):
+        """ Write `x` as ``coef * node`` """
+        node = self.nodes[x]
+        if node[0] == 'sum' and len(node[1]) == 1 and node[2] == 0:
+            return node[1][0]
+        return 1, x
+
+    def input(self, arg: int, index: int) -> int:
+        return self._node(('input', arg, index))
+
+    def const(self, value) -> Optional[int]:
+        if value == 0:
+            return None
+        return self._node(('const', self._number(value)))
+
+    def lincomb(self, terms, const=0) -> Optional[int]:
+        """ The node for ``const + sum(coef * x for coef, x in terms)`` """
+        coefs = {}
+        for coef, x in terms:
+            if x is None or coef == 0:
+                continue
+            value = self._const_value(x)
+            if value is not None:
+                const += coef * value
+                continue
+            inner_coef, x = self._split_scale(x)
+            coefs[x] = coefs.get(x, 0) + coef * inner_coef
+
+        # terms which cancel exactly are dropped
+        terms = tuple(
+            (self._number(coef), x)
+            for x, coef in sorted(coefs.items()) if coef != 0
+        )
+        if not terms:
+            return self.const(const)
+        if len(terms) == 1 and const == 0 and terms[0][0] == 1:
+            return terms[0][1]
+        return self._node(('sum', terms, self._number(const)))
+
+    def mul(self, x, y) -> Optional[int]:
+        if x is None or y is None:
+            return None
+        x_value = self._const_value(x)
+        y_value = self._const_value(y)
+        if x_value is not None and y_value is not None:
+            return self.const(x_value * y_value)
+        elif x_value is not None:
+            return self.lincomb([(x_value, y)])
+        elif y_value is not None:
+            return self.lincomb([(y_value, x)])
+
+        # pull out constant factors, so that ``(2*a)*b`` and ``a*b`` share a node
+        x_coef, x = self._split_scale(x)
+        y_coef, y = self._split_scale(y)
+        return self.lincomb([(x_coef * y_coef, self._node(('mul', min(x, y), max(x, y))))])
+
+    def div(self, x, y) -> Optional[int]:
+        if y is None:
+            raise ZeroDivisionError("division by a multivector which is always zero")
+        if x is None:
+            return None
+        self.inexact = True
+        y_value = self._const_value(y)
+        if y_value is not None:
+            return self.lincomb([(1 / y_value, x)])
+        return self._node(('div', x, y))
+
+    def sqrt(self, x) -> Optional[int]:
+        if x is None:
+            return None
+        self.inexact = True
+        value = self._const_value(x)
+        if value is not None:
+            return self.const(np.sqrt(value))
+        return self._node(('sqrt', x))
+
+    def abs(self, x) -> Optional[int]:
+        if x is None:
+            return None
+        value = self._const_value(x)
+        if value is not None:
+            return self.const(abs(value))
+        return self._node(('abs', x))
+
+    # a prime to evaluate nodes modulo, see `drop_zeros`
+    _prime = 2**61 - 1
+
+    def _modular(self, value) -> int:
+        f = fractions.Fraction(value)
+        return f.numerator * pow(f.denominator, self._prime - 2, self._prime) % self._prime
+
+    def _evaluate_modular(self, rng) -> Sequence[Optional[int]]:
+        """
+        Evaluate every node modulo `_prime`, with random values for the
+        inputs. The results of sqrt and abs are also given random values, as
+        they cannot be computed in a finite field. Nodes depending on a
+        division by zero are None.
+        """
+        p = self._prime
+        values = []
+        for node in self.nodes:
+            kind = node[0]
+            if kind in ('input', 'sqrt', 'abs'):
+                value = int(rng.randint(p))
+            elif kind == 'const':
+                value = self._modular(node[1])
+            elif kind == 'mul':
+                x, y = values[node[1]], values[node[2]]
+                value = None if x is None or y is None else x * y % p
+            elif kind == 'div':
+                x, y = values[node[1]], values[node[2]]
+                value = None if x is None or not y else x * pow(y, p - 2, p) % p
+            else:
+                _, terms, const = node
+                value = self._modular(const)
+                for coef, y in terms:
+                    if values[y] is None:
+                        value = None
+                        break
+                    value += self._modular(coef) * values[y]
+                else:
+                    value %= p
+            values.append(value)
+        return values
+
+    def drop_zeros(self, outputs, trials: int = 2):
+        """
+        Replace the nodes in `outputs` which are identically zero by None.
+
+        Cancellations such as the grade 3 part of ``R*X*~R`` are only visible
+        once every product is expanded, which would make the expression far
+        larger. Instead, each node is evaluated at random points in a finite
+        field: a polynomial which is not identically zero is very unlikely to
+        vanish at all of them (the Schwartz-Zippel lemma). Treating sqrt and
+        abs as independent unknowns can only cause zeros to be missed, not
+        invented.
+        """
+        rng = np.random.RandomState(0)
+        zero = set(x for x in outputs if x is not None)
+        for i in range(trials):
+            values = self._evaluate_modular(rng)
+            zero = set(x for x in zero if values[x] == 0)
+        return [None if x in zero else x for x in outputs]
+
+    def live(self, outputs) -> Sequence[int]:
+        """ The nodes needed to compute `outputs`, in order """
+        live = set(x for x in outputs if x is not None)
+        for x in range(len(self.nodes) - 1, -1, -1):
+            if x not in live:
+                continue
+            node = self.nodes[x]
+            if node[0] == 'sum':
+                live.update(y for c, y in node[1])
+            elif node[0] in ('mul', 'div'):
+                live.update(node[1:])
+            elif node[0] in ('sqrt', 'abs'):
+                live.add(node[1])
+        return sorted(live)
+
+    def ref(self, x) -> str:
+        """ A python expression for the value of a node """
+        value = self._const_value(x)
+        if value is not None:
+            return _format_number(value)
+        return 't{}'.format(x)
+
+    def expr(self, x) -> str:
+        """ A python expression computing a node from its operands """
+        node = self.nodes[x]
+        kind = node[0]
+        if kind == 'input':
+            return 'a{}[{}]'.format(node[1], node[2])
+        elif kind == 'const':
+            return _format_number(node[1])
+        elif kind == 'mul':
+            return '{} * {}'.format(self.ref(node[1]), self.ref(node[2]))
+        elif kind == 'div':
+            return '{} / {}'.format(self.ref(node[1]), self.ref(node[2]))
+        elif kind == 'sqrt':
+            return 'np.sqrt({})'.format(self.ref(node[1]))
+        elif kind == 'abs':
+            return 'abs({})'.format(self.ref(node[1]))
+
+        _, terms, const = node
+        s = ''
+        for coef, y in terms:
+            s += ' - ' if coef < 0 else ' + '
+            if abs(coef) != 1:
+                s += repr(abs(coef)) + '*'
+            s += self.ref(y)
+        if const != 0:
+            s += ' - ' if const < 0 else ' + '
+            s += repr(abs(const))
+        # tidy up the sign of the first term
+        return s[3:] if s.startswith(' + ') else '-' + s[3:]
+
+
+class _SymbolicMultiVector(object):
+    """
+    A multivector whose coefficients are nodes of a :class:`_Graph`, used
+    to trace the functions passed to :func:`jit_expr`.
+    """
+
+    __array_ufunc__ = None
+
+    def __init__(self, graph: _Graph, layout, coeffs):
+        self.graph = graph
+        self.layout = layout
+        self.coeffs = coeffs
+
+    def _new(self, coeffs) -> '_SymbolicMultiVector':
+        return self.__class__(self.graph, self.layout, coeffs)
+
+    def _checkOther(self, other):
+        """ Convert an operand to a :class:`_SymbolicMultiVector`, or return NotImplemented """
+        if isinstance(other, _SymbolicMultiVector):
+            if other.graph is not self.graph:
+                raise ValueError("cannot combine multivectors traced by different functions")
+        elif isinstance(other, MultiVector):
+            self.graph.const_dtypes.add(other.value.dtype)
+            other = self.__class__(self.graph, other.layout, [self.graph.const(v) for v in other.value])
+        elif isinstance(other, numbers.Number):
+            coeffs = [None] * self.layout.gaDims
+            coeffs[self.layout.gradeList.index(0)] = self.graph.const(other)
+            return self._new(coeffs)
+        else:
+            return NotImplemented
+        if other.layout is not self.layout and other.layout != self.layout:
+            raise ValueError("cannot operate on MultiVectors with different Layouts")
+        return other
+
+    def _grades(self):
+        return tuple(sorted(set(
+            grade for grade, x in zip(self.layout.gradeList, self.coeffs) if x is not None
+        )))
+
+    def _product(self, name, other, reflected=False):
+        other = self._checkOther(other)
+        if other is NotImplemented:
+            return other
+        a, b = (other, self) if reflected else (self, other)
+        terms = [[] for x in a.coeffs]
+        if any(x is not None for x in a.coeffs) and any(y is not None for y in b.coeffs):
+            k_list, l_list, m_list, mult_table_vals = self.layout._grade_kernels(
+                'table', name, a._grades(), b._grades())
+            for k, l, m, v in zip(k_list, l_list, m_list, mult_table_vals):
+                x = a.coeffs[k]
+                y = b.coeffs[m]
+                if x is not None and y is not None:
+                    terms[l].append((v, self.graph.mul(x, y)))
+        return self._new([self.graph.lincomb(t) for t in terms])
+
+    def __mul__(self, other) -> '_SymbolicMultiVector':
+        return self._product('gmt', other)
+
+    def __rmul__(self, other) -> '_SymbolicMultiVector':
+        return self._product('gmt', other, reflected=True)
+
+    def __xor__(self, other) -> '_SymbolicMultiVector':
+        return self._product('omt', other)
+
+    def __rxor__(self, other) -> '_SymbolicMultiVector':
+        return self._product('omt', other, reflected=True)
+
+    def __or__(self, other) -> '_SymbolicMultiVector':
+        return self._product('imt', other)
+
+    def __ror__(self, other) -> '_SymbolicMultiVector':
+        return self._product('imt', other, reflected=True)
+
+    def lc(self, other) -> '_SymbolicMultiVector':
+        return self._product('lcmt', other)
+
+    __lshift__ = lc
+
+    def __rlshift__(self, other) -> '_SymbolicMultiVector':
+        return self._product('lcmt', other, reflected=True)
+
+    def _sum(self, other, sign, reflected=False):
+        other = self._checkOther(other)
+        if other is NotImplemented:
+            return other
+        self_sign = -1 if reflected else 1
+        return self._new([
+            self.graph.lincomb([(self_sign, x), (self_sign * sign, y)])
+            for x, y in zip(self.coeffs, other.coeffs)
+        ])
+
+    def __add__(self, other) -> '_SymbolicMultiVector':
+        return self._sum(other, 1)
+
+    __radd__ = __add__
+
+    def __sub__(self, other) -> '_SymbolicMultiVector':
+        return self._sum(other, -1)
+
+    def __rsub__(self, other) -> '_SymbolicMultiVector':
+        return self._sum(other, -1, reflected=True)
+
+    def __truediv__(self, other) -> '_SymbolicMultiVector':
+        """ Division by a scalar, or a multivector with only a scalar part """
+        other = self._checkOther(other)
+        if other is NotImplemented:
+            return other
+        scalar_index = self.layout.gradeList.index(0)
+        if any(y is not None for i, y in enumerate(other.coeffs) if i != scalar_index):
+            raise TypeError("jit_expr can only divide by multivectors with only a scalar part")
+        divisor = other.coeffs[scalar_index]
+        return self._new([self.graph.div(x, divisor) for x in self.coeffs])
+
+    def __neg__(self) -> '_SymbolicMultiVector':
+        return self._new([self.graph.lincomb([(-1, x)]) for x in self.coeffs])
+
+    def __pos__(self) -> '_SymbolicMultiVector':
+        return self
+
+    def __invert__(self) -> '_SymbolicMultiVector':
+        return self._new([
+            self.graph.lincomb([((-1)**(grade*(grade - 1)//2), x)])
+            for grade, x in zip(self.layout.gradeList, self.coeffs)
+        ])
+
+    adjoint = __invert__
+
+    def __call__(self, grade, *grades) -> '_SymbolicMultiVector':
+        """ Project onto one or more grades """
+        grades = (grade,) + grades
+        if not all(isinstance(g, numbers.Integral) for g in grades):
+            raise TypeError("jit_expr only supports projection onto grades")
+        return self._new([
+            x if g in grades else None
+            for g, x in zip(self.layout.gradeList, self.coeffs)
+        ])
+
+    def mag2(self) -> '_SymbolicMultiVector':
+        return ((~self) * self)(0)
+
+    def __abs__(self) -> '_SymbolicMultiVector':
+        mag2 = self.mag2()
+        return mag2._new([self.graph.sqrt(self.graph.abs(x)) for x in mag2.coeffs])
+
+    def normal(self) -> '_SymbolicMultiVector':
+        return self / abs(self)
+
+
+class FusedExpression(object):
+    """
+    A function of multivectors compiled into a single kernel, as created by
+    :func:`jit_expr`.
+
+    Calling it with :class:`MultiVector`\\ s returns a :class:`MultiVector`,
+    while :meth:`batch` applies it to arrays of coefficients.
+
+    Attributes
+    ----------
+    layout : Layout
+        The layout of the arguments and result.
+    grades : tuple
+        The grades each argument is assumed to contain, or None for all.
+    source : str
+        The python source of the generated kernels, for debugging.
+    """
+    def __init__(self, func, layout, grades: Optional[Sequence[Optional[Iterable[int]]]] = None):
+        functools.update_wrapper(self, func)
+        self.layout = layout
+        n_args = len(inspect.signature(func).parameters)
+        if grades is None:
+            grades = (None,) * n_args
+        elif len(grades) != n_args:
+            raise ValueError("grades must have an entry for each of the {} arguments".format(n_args))
+        self.grades = tuple(g if g is None else frozenset(g) for g in grades)
+
+        self._graph = graph = _Graph()
+        args = [
+            _SymbolicMultiVector(graph, layout, [
+                graph.input(i, j) if g is None or grade in g else None
+                for j, grade in enumerate(layout.gradeList)
+            ])
+            for i, g in enumerate(self.grades)
+        ]
+        ret = _SymbolicMultiVector(graph, layout, [None] * layout.gaDims)._checkOther(func(*args))
+        if ret is NotImplemented:
+            raise TypeError("functions passed to jit_expr must return a multivector")
+        self._outputs = graph.drop_zeros(ret.coeffs)
+
+        module = caching.load_generated_module(self._generate_source, name='jit_expr')
+        self.source = self._generate_source(False)
+        self._into = module.fused_into
+        self._batch = module.fused_batch
+
+    def _generate_source(self, cache: bool) -> str:
+        graph = self._graph
+        args = ''.join('a{}, '.format(i) for i in range(len(self.grades)))
+        s = (
+            'import numpy as np\n'
+            'import numba\n'
+            'from numba import njit\n\n'
+            'from clifford import NUMBA_PARALLEL\n\n\n'
+        )
+        s += '@njit(nogil=True, cache={})\n'.format(cache)
+        s += 'def fused_into({}out):\n'.format(args)
+        for x in graph.live(self._outputs):
+            if graph.nodes[x][0] != 'const':
+                s += '    t{} = {}\n'.format(x, graph.expr(x))
+        for l, x in enumerate(self._outputs):
+            if x is not None:
+                s += '    out[{}] = {}\n'.format(l, graph.ref(x))
+        s += '    return out\n\n\n'
+
+        s += '@njit(parallel=NUMBA_PARALLEL, nogil=True, cache={})\n'.format(cache)
+        s += 'def fused_batch({}n_workers, chunk_size, out):\n'.format(args)
+        s += '    n = out.shape[0]\n'
+        s += '    for worker in numba.prange(n_workers):\n'
+        s += '        for start in range(worker * chunk_size, n, n_workers * chunk_size):\n'
+        s += '            for i in range(start, min(n, start + chunk_size)):\n'
+        # not every output is written by fused_into
+        s += '                for j in range(out.shape[1]):\n'
+        s += '                    out[i, j] = 0\n'
+        s += '                fused_into({}out[i])\n'.format(
+            ''.join('a{}[i], '.format(i) for i in range(len(self.grades))))
+        return s
+
+    def _result_dtype(self, dtypes) -> np.dtype:
+        dtype = np.result_type(*dtypes, *self._graph.const_dtypes)
+        if self._graph.inexact:
+            # the smallest float type, which promotes integers without
+            # widening any other floats
+            dtype = np.result_type(dtype, np.float16)
+        return dtype
+
+    def __call__(self, *args) -> MultiVector:
+        if len(args) != len(self.grades):
+            raise TypeError("{} takes {} arguments but {} were given".format(
+                self.__name__, len(self.grades), len(args)))
+        for arg in args:
+            if not isinstance(arg, MultiVector):
+                raise TypeError("arguments must be MultiVectors, not {}".format(type(arg).__name__))
+            if arg.layout is not self.layout and arg.layout != self.layout:
+                raise ValueError("cannot operate on MultiVectors with different Layouts")
+        values = [arg.value for arg in args]
+        out = np.zeros(self.layout.gaDims, dtype=self._result_dtype([v.dtype for v in values]))
+        self._into(*values, out)
+        return MultiVector._from_value(self.layout, out)
+
+    def batch(self, *args, out=None, dtype=None) -> np.ndarray:
+        """
+        Apply the expression to broadcastable stacks of multivectors
+
+        Parameters
+        ----------
+        *args : array_like (..., n_dims)
+            The coefficients of each argument. The leading dimensions are
+            broadcast against each other.
+        out : ndarray (..., n_dims), optional
+            An array to write the result into. It must have the broadcast shape.
+        dtype : data-type, optional
+            If given, the arguments are cast to this type first, as for
+            :func:`clifford.mult_batch`.
+
+        Returns
+        -------
+        out : ndarray (..., n_dims)
+        """
+        dims = self.layout.gaDims
+        if len(args) != len(self.grades):
+            raise TypeError("{} takes {} arguments but {} were given".format(
+                self.__name__, len(self.grades), len(args)))
+        args = [np.asarray(arg, dtype=dtype) for arg in args]
+        if any(arg.shape[-1:] != (dims,) for arg in args):
+            raise ValueError("operands must have a last dimension of length {}".format(dims))
+
+        shape = np.broadcast(*[arg[..., 0] for arg in args]).shape + (dims,) if args else (dims,)
+        if out is None:
+            out = np.empty(shape, dtype=self._result_dtype([arg.dtype for arg in args]))
+        elif out.shape != shape:
+            raise ValueError("out has shape {}, expected {}".format(out.shape, shape))
+        out_2d = _as_2d_view(out, dims)
+        self._batch(
+            *[_batch_operand_2d(arg, out) for arg in args],
+            *_batch_schedule(len(out_2d)), out_2d
+        )
+        return out
+
+
+def jit_expr(layout, grades: Optional[Sequence[Optional[Iterable[int]]]] = None):
+    """
+    Decorator compiling a function of multivectors into a single fused kernel
+
+    Evaluating an expression like ``R*X*~R`` normally creates a temporary
+    :class:`MultiVector` for each operator, and computes a full product for
+    each. Instead, the decorated function is called once with symbolic
+    multivectors, recording the scalar operations each coefficient of the
+    result needs. Coefficients which are always zero are skipped, repeated
+    subexpressions are computed once, and only the work needed for the
+    nonzero coefficients of the result is kept. This is then compiled into
+    one numba kernel.
+
+    Parameters
+    ----------
+    layout : Layout
+        The layout of the arguments.
+    grades : sequence, optional
+        For each argument, either None or the grades it contains. The
+        coefficients of any other grades are assumed to be zero, and ignored.
+
+    Returns
+    -------
+    Callable[[Callable], FusedExpression]
+
+    Notes
+    -----
+    The function may use the products ``*``, ``^``, ``|``, and ``<<``, as well
+    as ``+``, ``-``, ``~``, grade projection ``M(grade)``, :meth:`~MultiVector.mag2`,
+    ``abs(M)``, :meth:`~MultiVector.normal`, and division by scalars. It may
+    also refer to constant :class:`MultiVector`\\ s and numbers. It must not
+    branch on the values of its arguments, as these are not known when it is
+    traced.
+
+    Examples
+    --------
+    >>> from clifford.g3c import layout, einf
+    >>> @jit_expr(layout, grades=[[0, 2, 4], [1]])
+    ... def apply_rotor(R, X):
+    ...     return R * X * ~R
+    >>> @jit_expr(layout, grades=[[1], [1]])
+    ... def line(A, B):
+    ...     return (A ^ B ^ einf).normal()
+
+    ``apply_rotor(R, X)`` returns a :class:`MultiVector`, while
+    ``apply_rotor.batch(Rs, Xs)`` applies it to arrays of coefficients.
+    """
+    def decorator(func):
+        return FusedExpression(func, layout, grades)
+    return decorator
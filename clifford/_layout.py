@@ -1,4 +1,5 @@
 import re
+import functools
 from functools import reduce
 from typing import List
 
@@ -13,7 +14,29 @@ from . import (
     get_adjoint_function,
     construct_tables,
     get_mult_function,
+    _get_mult_function,
+    _numba_mult_into,
+    _numba_grade_mask,
+    filter_mult_table,
+    mult_batch,
+    inv_batch,
+    _unary_batch,
+    _reduce_batch,
+    _numba_sum_reduce,
+    get_mult_reduce_function,
+    _numba_scale_batch,
+    _numba_mag2_batch,
+    _numba_normal_batch,
     get_leftLaInv,
+    get_bitmap_mult_function,
+    bitmap_mult_batch,
+    bitmap_inv_batch,
+    bitmap_mult_table,
+    get_bitmap_leftLaInv,
+    _BITMAP_GMT,
+    _BITMAP_IMT,
+    _BITMAP_OMT,
+    _BITMAP_LCMT,
     generate_blade_tup_map,
     generate_bitmap_to_linear_index_map,
     val_get_left_gmt_matrix,
@@ -21,6 +44,9 @@ from . import (
 )
 
 from .io import read_ga_file
+from . import caching
+from . import code_gen
+from . import _bivector
 
 
 # The blade finding regex for parsing strings of mvs
@@ -30,6 +56,61 @@ _blade_pattern = re.compile(r"""
 """, re.VERBOSE)
 
 
+class _cached_property(object):
+    """
+    A property that is computed on first access, and then stored on the
+    instance, where it can also be overwritten.
+    """
+    def __init__(self, getter):
+        self.getter = getter
+        self.__name__ = getter.__name__
+        self.__doc__ = getter.__doc__
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.__name__] = self.getter(obj)
+        return value
+
+
+def _table_property(name, doc):
+    def getter(self):
+        return self._tables[name]
+    getter.__name__ = name
+    getter.__doc__ = doc
+    return _cached_property(getter)
+
+
+_bitmap_products = dict(
+    gmt=_BITMAP_GMT,
+    imt=_BITMAP_IMT,
+    omt=_BITMAP_OMT,
+    lcmt=_BITMAP_LCMT,
+)
+
+
+def _product_func_property(name, doc):
+    def getter(self):
+        if self.engine == 'bitmap':
+            return get_bitmap_mult_function(
+                _bitmap_products[name],
+                self.linear_map_to_bitmap, self.bitmap_to_linear_map, self.sig
+            )
+        if self.engine == 'unrolled':
+            return self._unrolled_mult_function(getattr(self, name))
+        if self._kernels is not None:
+            return getattr(self._kernels, name + '_func')
+        return get_mult_function(getattr(self, name), self.gradeList)
+    getter.__name__ = name + '_func'
+    getter.__doc__ = doc
+    return _cached_property(getter)
+
+
+def _grade_key(grades):
+    """ Normalize an iterable of grades into a hashable cache key """
+    return tuple(sorted(set(int(g) for g in grades)))
+
+
 class Layout(object):
     """ Layout stores information regarding the geometric algebra itself and the
     internal representation of multivectors.
@@ -74,6 +155,35 @@ class Layout(object):
         Example:
           names = ['', 's0', 's1', 'i']  # 2-D
 
+    engine : str
+        How products are computed. One of:
+
+        * ``'tables'`` (default): precompute sparse multiplication tables.
+          This is fastest, but the tables need memory proportional to the
+          number of nonzero entries, which for the geometric product is
+          ``4**dims``.
+        * ``'bitmap'``: compute the product of each pair of blades on the fly
+          from their bitmap representations. This uses no extra memory, and
+          skips zero coefficients, which makes it a good choice for algebras
+          with 10 or more dimensions, especially with grade-sparse operands.
+          The ``gmt``, ``imt``, ``omt``, and ``lcmt`` tables are still
+          available, but are only built if accessed.
+        * ``'unrolled'``: generate source code for each product with every
+          term of the multiplication table written out, as done by
+          :mod:`clifford.code_gen`. This avoids looping over the table at
+          runtime, so is several times faster for small algebras such as
+          CGA, but takes longer to compile the first time. The generated
+          code is stored in the :mod:`clifford.caching` directory, so that
+          numba can cache it too.
+
+    dtype : data-type
+        The type of the coefficients of multivectors created by this layout,
+        such as by :meth:`MultiVector`, :meth:`randomMV`, and :attr:`scalar`.
+        ``np.float32`` halves the memory needed by large arrays of
+        multivectors, and the products of float32 multivectors stay float32.
+        With the default of ``np.float64``, the basis blades have integer
+        coefficients, otherwise they have coefficients of this type too.
+
 
     Attributes
     ----------
@@ -111,12 +221,24 @@ class Layout(object):
 
     [1] The multiplication tables are NumPy arrays of rank 3 with indices like
         the tensor g_ijk discussed above.
+
+    The multiplication tables and the compiled product functions are only
+    built the first time they are accessed, so that constructing a layout is
+    cheap and unused products are never compiled.
     """
 
-    def __init__(self, sig, bladeTupList, firstIdx=0, names=None):
+    _engines = ('tables', 'bitmap', 'unrolled')
+
+    def __init__(self, sig, bladeTupList, firstIdx=0, names=None, engine='tables', dtype=np.float64):
         self.dims = len(sig)
         self.sig = np.array(sig).astype(int)
         self.firstIdx = firstIdx
+        self.dtype = np.dtype(dtype)
+
+        if engine not in self._engines:
+            raise ValueError(
+                "engine must be one of {}, not {!r}".format(self._engines, engine))
+        self.engine = engine
 
         self.bladeTupList = list(map(tuple, bladeTupList))
         self._checkList()
@@ -151,23 +273,37 @@ class Layout(object):
                 "names list of length %i needs to be of length %i" %
                 (len(names), self.gaDims))
 
-        self._genTables()
-        self.adjoint_func = get_adjoint_function(self.gradeList)
-        self.right_complement_func = self.gen_right_complement_func()
-        self.dual_func = self.gen_dual_func()
-        self.vee_func = self.gen_vee_func()
+        self._genMaps()
 
     def __hash__(self):
         """ hashs the signature of the layout """
         return hash(tuple(self.sig))
 
+    @_cached_property
+    def right_complement_func(self):
+        """ Compiled right complement, see :meth:`gen_right_complement_func` """
+        return self.gen_right_complement_func()
+
+    @_cached_property
+    def dual_func(self):
+        """ Compiled dual, see :meth:`gen_dual_func` """
+        return self.gen_dual_func()
+
+    @_cached_property
+    def vee_func(self):
+        """ Compiled vee product, see :meth:`gen_vee_func` """
+        return self.gen_vee_func()
+
     def gen_dual_func(self):
         """ Generates the dual function for the pseudoscalar """
         if 0 in self.sig:
             # We are degenerate, use the right complement
             return self.right_complement_func
         else:
-            Iinv = self.pseudoScalar.inv().value
+            # for an orthonormal basis this is +/-1 times the pseudoscalar, so
+            # is stored exactly as integers, which do not upcast float32 values.
+            # The inverse is rounded first, as casting would truncate 0.999...
+            Iinv = np.rint(self.pseudoScalar.inv().value).astype(np.int8)
             gmt_func = self.gmt_func
             @numba.njit
             def dual_func(Xval):
@@ -191,7 +327,7 @@ class Layout(object):
 
     def dict_to_multivector(self, dict_in):
         """ Takes a dictionary of coefficient values and converts it into a MultiVector object """
-        constructed_values = np.zeros(self.gaDims)
+        constructed_values = np.zeros(self.gaDims, dtype=self.dtype)
         for k in list(dict_in.keys()):
             constructed_values[int(k)] = dict_in[k]
         return self._newMV(constructed_values)
@@ -253,26 +389,24 @@ class Layout(object):
         "Ensure validity of arguments."
 
         # check for uniqueness
-        for blade in self.bladeTupList:
-            if self.bladeTupList.count(blade) != 1:
-                raise ValueError("blades not unique")
+        if len(set(self.bladeTupList)) != len(self.bladeTupList):
+            raise ValueError("blades not unique")
 
         # check for right dimensionality
         if len(self.bladeTupList) != 2**self.dims:
             raise ValueError("incorrect number of blades")
 
         # check for valid ranges of indices
-        valid = list(range(self.firstIdx, self.firstIdx + self.dims))
+        valid = set(range(self.firstIdx, self.firstIdx + self.dims))
         try:
             for blade in self.bladeTupList:
-                for idx in blade:
-                    if (idx not in valid) or (list(blade).count(idx) != 1):
-                        raise ValueError()
+                if not valid.issuperset(blade) or len(set(blade)) != len(blade):
+                    raise ValueError()
         except (ValueError, TypeError):
             raise ValueError("invalid bladeTupList; must be a list of tuples")
 
-    def _genTables(self):
-        "Generate the multiplication tables."
+    def _genMaps(self):
+        "Generate the maps between blade tuples, bitmaps, and linear indices."
 
         self.bladeTupMap = generate_blade_tup_map(self.bladeTupList)
         self.bitmap_to_linear_map = generate_bitmap_to_linear_index_map(self.bladeTupList, self.firstIdx)
@@ -280,52 +414,476 @@ class Layout(object):
         for bitmap, linear in enumerate(self.bitmap_to_linear_map):
             self.linear_map_to_bitmap[linear] = int(bitmap)
 
-        self.gmt, imt_prod_mask, omt_prod_mask, lcmt_prod_mask = construct_tables(
-            np.array(self.gradeList),
-            self.linear_map_to_bitmap,
-            self.bitmap_to_linear_map,
-            self.sig
+    @_cached_property
+    def _cache_key(self):
+        return caching.layout_cache_key(self.sig, self.bladeTupList, self.firstIdx)
+
+    @_cached_property
+    def _tables(self):
+        "The multiplication tables, loaded from the cache or generated."
+        tables = caching.load_layout_tables(self._cache_key)
+        if tables is None:
+            gmt, imt_prod_mask, omt_prod_mask, lcmt_prod_mask = construct_tables(
+                np.array(self.gradeList),
+                self.linear_map_to_bitmap,
+                self.bitmap_to_linear_map,
+                self.sig
+            )
+            tables = dict(
+                gmt=gmt,
+                imt=sparse.where(imt_prod_mask, gmt, gmt.dtype.type(0)),
+                omt=sparse.where(omt_prod_mask, gmt, gmt.dtype.type(0)),
+                lcmt=sparse.where(lcmt_prod_mask, gmt, gmt.dtype.type(0)),
+                imt_prod_mask=imt_prod_mask,
+                omt_prod_mask=omt_prod_mask,
+                lcmt_prod_mask=lcmt_prod_mask,
+            )
+            caching.save_layout_tables(self._cache_key, self.gradeList, tables)
+        return tables
+
+    @_cached_property
+    def _kernels(self):
+        "The disk-cacheable module of product functions, or None."
+        kernels = caching.load_layout_kernels(self._cache_key)
+        if kernels is None and caching.get_cache_dir() is not None:
+            # the module is written alongside the tables
+            self._tables
+            kernels = caching.load_layout_kernels(self._cache_key)
+            if kernels is None and caching.save_layout_tables(self._cache_key, self.gradeList, self._tables):
+                # the entry was damaged, and has been removed
+                kernels = caching.load_layout_kernels(self._cache_key)
+        return kernels
+
+    gmt = _table_property('gmt', "multiplication table for the geometric product")
+    imt = _table_property('imt', "multiplication table for the inner product")
+    omt = _table_property('omt', "multiplication table for the outer product")
+    lcmt = _table_property('lcmt', "multiplication table for the left-contraction")
+
+    # these are probably not useful, but someone might want them
+    imt_prod_mask = _table_property('imt_prod_mask', "mask of the nonzero entries of `imt`")
+    omt_prod_mask = _table_property('omt_prod_mask', "mask of the nonzero entries of `omt`")
+    lcmt_prod_mask = _table_property('lcmt_prod_mask', "mask of the nonzero entries of `lcmt`")
+
+    # the functions that perform the various products, using the
+    # disk-cacheable versions if they are available
+    gmt_func = _product_func_property('gmt', "Compiled geometric product of two coefficient arrays")
+    imt_func = _product_func_property('imt', "Compiled inner product of two coefficient arrays")
+    omt_func = _product_func_property('omt', "Compiled outer product of two coefficient arrays")
+    lcmt_func = _product_func_property('lcmt', "Compiled left-contraction of two coefficient arrays")
+
+    @_cached_property
+    def inv_func(self):
+        "Compiled left-inverse of a coefficient array"
+        if self.engine == 'bitmap':
+            return get_bitmap_leftLaInv(
+                self.linear_map_to_bitmap, self.bitmap_to_linear_map, self.sig, self.gradeList
+            )
+        if self._kernels is not None:
+            return self._kernels.inv_func
+        return get_leftLaInv(self.gmt, self.gradeList)
+
+    @_cached_property
+    def adjoint_func(self):
+        "Compiled reversion of a coefficient array"
+        if self._kernels is not None:
+            return self._kernels.adjoint_func
+        return get_adjoint_function(self.gradeList)
+
+    @_cached_property
+    def _bivector_funcs(self):
+        "Compiled closed-form exponential and logarithm, see `clifford._bivector`"
+        exp_func, log_func = _bivector.get_bivector_functions(self.gmt_func, self.gradeList)
+        return dict(
+            exp=exp_func,
+            log=log_func,
+            exp_batch=_bivector.get_batch_function(exp_func),
+            log_batch=_bivector.get_batch_function(log_func),
         )
-        self.omt = sparse.where(omt_prod_mask, self.gmt, self.gmt.dtype.type(0))
-        self.imt = sparse.where(imt_prod_mask, self.gmt, self.gmt.dtype.type(0))
-        self.lcmt = sparse.where(lcmt_prod_mask, self.gmt, self.gmt.dtype.type(0))
-
-        # This generates the functions that will perform the various products
-        self.gmt_func = get_mult_function(self.gmt, self.gradeList)
-        self.imt_func = get_mult_function(self.imt, self.gradeList)
-        self.omt_func = get_mult_function(self.omt, self.gradeList)
-        self.lcmt_func = get_mult_function(self.lcmt, self.gradeList)
-        self.inv_func = get_leftLaInv(self.gmt, self.gradeList)
-
-        # these are probably not useful, but someone might want them
-        self.imt_prod_mask = imt_prod_mask
-        self.omt_prod_mask = omt_prod_mask
-        self.lcmt_prod_mask = lcmt_prod_mask
 
-    def gmt_func_generator(self, grades_a=None, grades_b=None, filter_mask=None):
-        return get_mult_function(
-            self.gmt, self.gradeList,
-            grades_a=grades_a, grades_b=grades_b, filter_mask=filter_mask
+    def _unrolled_mult_function(self, mt):
+        """ Generate, compile, and cache an unrolled function for `mt` """
+        module = caching.load_generated_module(
+            lambda cache: code_gen.generate_unrolled_module({'mult_func': mt}, cache=cache),
+            name='unrolled'
         )
+        return module.mult_func
+
+    def _func_generator(self, name, grades_a, grades_b, filter_mask):
+        if filter_mask is None:
+            if grades_a is None or grades_b is None:
+                return getattr(self, name + '_func')
+            return self._grade_kernels('func', name, _grade_key(grades_a), _grade_key(grades_b))
+        mt = filter_mult_table(getattr(self, name), self.gradeList, filter_mask=filter_mask)
+        if self.engine == 'unrolled':
+            return self._unrolled_mult_function(mt)
+        return _get_mult_function(mt)
+
+    def gmt_func_generator(self, grades_a=None, grades_b=None, filter_mask=None):
+        return self._func_generator('gmt', grades_a, grades_b, filter_mask)
 
     def imt_func_generator(self, grades_a=None, grades_b=None, filter_mask=None):
-        return get_mult_function(
-            self.gmt, self.gradeList,
-            grades_a=grades_a, grades_b=grades_b, filter_mask=filter_mask
-        )
+        return self._func_generator('imt', grades_a, grades_b, filter_mask)
 
     def omt_func_generator(self, grades_a=None, grades_b=None, filter_mask=None):
-        return get_mult_function(
-            self.gmt, self.gradeList,
-            grades_a=grades_a, grades_b=grades_b, filter_mask=filter_mask
-        )
+        return self._func_generator('omt', grades_a, grades_b, filter_mask)
 
     def lcmt_func_generator(self, grades_a=None, grades_b=None, filter_mask=None):
-        return get_mult_function(
-            self.gmt, self.gradeList,
-            grades_a=grades_a, grades_b=grades_b, filter_mask=filter_mask
+        return self._func_generator('lcmt', grades_a, grades_b, filter_mask)
+
+    def _mult_batch(self, name, a, b, out, dtype):
+        if self.engine == 'bitmap':
+            return bitmap_mult_batch(
+                _bitmap_products[name],
+                self.linear_map_to_bitmap, self.bitmap_to_linear_map, self.sig,
+                a, b, out=out, dtype=dtype
+            )
+        return mult_batch(getattr(self, name), a, b, out=out, dtype=dtype)
+
+    def gmt_batch(self, a, b, out=None, dtype=None):
+        """
+        Geometric product of broadcastable ``(..., gaDims)`` coefficient arrays
+
+        See `clifford.mult_batch` for details.
+        """
+        return self._mult_batch('gmt', a, b, out, dtype)
+
+    def imt_batch(self, a, b, out=None, dtype=None):
+        """
+        Inner product of broadcastable ``(..., gaDims)`` coefficient arrays
+
+        See `clifford.mult_batch` for details.
+        """
+        return self._mult_batch('imt', a, b, out, dtype)
+
+    def omt_batch(self, a, b, out=None, dtype=None):
+        """
+        Outer product of broadcastable ``(..., gaDims)`` coefficient arrays
+
+        See `clifford.mult_batch` for details.
+        """
+        return self._mult_batch('omt', a, b, out, dtype)
+
+    def lcmt_batch(self, a, b, out=None, dtype=None):
+        """
+        Left-contraction of broadcastable ``(..., gaDims)`` coefficient arrays
+
+        See `clifford.mult_batch` for details.
+        """
+        return self._mult_batch('lcmt', a, b, out, dtype)
+
+    @_cached_property
+    def _grade_indices_cache(self):
+        return {}
+
+    def _grade_indices(self, grades):
+        """ The indices of the blades with the given grades, as a sorted tuple """
+        try:
+            return self._grade_indices_cache[grades]
+        except KeyError:
+            pass
+        ret = np.flatnonzero(np.isin(self.gradeList, grades))
+        self._grade_indices_cache[grades] = ret
+        return ret
+
+    #: The number of grade-specialised kernels each layout keeps, see
+    #: :meth:`grade_kernel_cache_info`. Changes only affect layouts which have
+    #: not yet built a kernel.
+    grade_kernel_cache_size = 256
+
+    @_cached_property
+    def grade_dispatch(self):
+        """
+        Whether the products of :class:`MultiVector`\\ s first find the grades
+        of their operands, and use a kernel restricted to those grades.
+
+        This costs a few microseconds per product, so by default is only
+        enabled for algebras with at least 64 blades which do not use the
+        bitmap engine, which already skips zero coefficients. It can be
+        overridden on each layout.
+        """
+        return self.engine != 'bitmap' and self.gaDims >= 64
+
+    @_cached_property
+    def _grade_array(self):
+        return np.array(self.gradeList)
+
+    @_cached_property
+    def _mask_grades(self):
+        return {}
+
+    @_cached_property
+    def _grade_kernels(self):
+        return functools.lru_cache(maxsize=self.grade_kernel_cache_size)(self._make_grade_kernel)
+
+    def grade_kernel_cache_info(self):
+        """
+        Statistics about the cache of grade-specialised product kernels, as a
+        named tuple of ``(hits, misses, maxsize, currsize)``.
+
+        These kernels are used by :class:`MultiVector` products when
+        :attr:`grade_dispatch` is enabled, by :class:`GradedMultiVector`, and
+        by the ``*_func_generator`` methods when given grades.
+        """
+        return self._grade_kernels.cache_info()
+
+    def grade_kernel_cache_clear(self):
+        """ Discard all the cached grade-specialised product kernels """
+        self._grade_kernels.cache_clear()
+
+    def _filtered_table(self, name, grades_a, grades_b):
+        """ The entries of the table `name` with operands of the given grades """
+        if self.engine == 'bitmap':
+            return bitmap_mult_table(
+                _bitmap_products[name],
+                self.linear_map_to_bitmap, self.bitmap_to_linear_map, self.sig, self.gradeList,
+                grades_a, grades_b
+            )
+        return filter_mult_table(getattr(self, name), self.gradeList, grades_a=grades_a, grades_b=grades_b)
+
+    def _make_grade_kernel(self, kind, name, grades_a, grades_b):
+        """
+        Build a kernel for the product `name` restricted to operands with the
+        sorted tuples of grades `grades_a` and `grades_b`. Use the cached
+        version, `_grade_kernels`, instead.
+
+        The `kind` of kernel is one of:
+
+        * ``'table'``: the arrays ``(k_list, l_list, m_list, mult_table_vals)``
+          of the filtered table, for ``_numba_mult_into``. This needs no
+          compilation.
+        * ``'func'``: a compiled function of two coefficient arrays.
+        * ``'graded'``: see :meth:`_graded_mult_function`.
+        """
+        mt = self._filtered_table(name, grades_a, grades_b)
+        if kind == 'table':
+            k_list, l_list, m_list = mt.coords
+            return k_list, l_list, m_list, mt.data
+        elif kind == 'func':
+            if self.engine == 'unrolled':
+                return self._unrolled_mult_function(mt)
+            return _get_mult_function(mt)
+
+        k_list, l_list, m_list = mt.coords
+        grades = tuple(sorted(set(self._grade_array[l_list].tolist())))
+
+        # renumber the blades to index into the stored coefficients
+        positions = []
+        for grades_i in (grades_a, grades, grades_b):
+            pos = np.full(self.gaDims, -1)
+            indices = self._grade_indices(grades_i)
+            pos[indices] = np.arange(len(indices))
+            positions.append(pos)
+        pos_a, pos_l, pos_b = positions
+        mt = sparse.COO(
+            coords=np.stack([pos_a[k_list], pos_l[l_list], pos_b[m_list]]),
+            data=mt.data,
+            shape=(len(self._grade_indices(grades_a)), len(self._grade_indices(grades)),
+                   len(self._grade_indices(grades_b)))
         )
 
+        if mt.nnz == 0:
+            func = None
+        elif self.engine == 'unrolled':
+            func = self._unrolled_mult_function(mt)
+        else:
+            func = _get_mult_function(mt)
+        return func, grades
+
+    def _graded_mult_function(self, name, grades_a, grades_b):
+        """
+        Get a product between grade-sparse multivectors with the given
+        grades, see `clifford.GradedMultiVector`.
+
+        The product acts on the coefficients of only those grades, and only
+        visits the entries of the multiplication table between them.
+
+        Returns ``(func, grades)``, where `grades` are the grades of the
+        result. `func` is None if the product is always zero.
+        """
+        return self._grade_kernels('graded', name, grades_a, grades_b)
+
+    def _grades_of_mask(self, mask):
+        try:
+            return self._mask_grades[mask]
+        except KeyError:
+            pass
+        ret = self._mask_grades[mask] = tuple(g for g in range(self.dims + 1) if mask >> g & 1)
+        return ret
+
+    def _product(self, name, a, b, out=None):
+        """
+        The product `name` of the coefficient arrays `a` and `b`, using a
+        kernel for the grades they contain if :attr:`grade_dispatch` is set.
+
+        If `out` is given, the result is written into it, and unlike for the
+        product functions themselves, it may be one of the inputs.
+        """
+        if out is not None and (np.may_share_memory(out, a) or np.may_share_memory(out, b)):
+            out[...] = self._product(name, a, b)
+            return out
+        if not self.grade_dispatch:
+            func = getattr(self, name + '_func')
+            if out is None:
+                return func(a, b)
+            return func(a, b, out)
+        grades = self._grade_array
+        k_list, l_list, m_list, mult_table_vals = self._grade_kernels(
+            'table', name,
+            self._grades_of_mask(_numba_grade_mask(a, grades)),
+            self._grades_of_mask(_numba_grade_mask(b, grades))
+        )
+        if out is None:
+            out = np.zeros(self.gaDims, dtype=np.result_type(a.dtype, b.dtype, mult_table_vals.dtype))
+        else:
+            out[...] = 0
+        _numba_mult_into(a, b, k_list, l_list, m_list, mult_table_vals, out)
+        return out
+
+    def inv_batch(self, a, out=None, dtype=None):
+        """
+        Inverse of a ``(..., gaDims)`` array of coefficients
+
+        See `clifford.inv_batch` for details.
+        """
+        if self.engine == 'bitmap':
+            return bitmap_inv_batch(
+                self.linear_map_to_bitmap, self.bitmap_to_linear_map, self.sig, self.gradeList,
+                a, out=out, dtype=dtype
+            )
+        return inv_batch(self.gmt, self.gradeList, a, out=out, dtype=dtype)
+
+    # Coefficient-wise operations. The tables here are shared by the methods
+    # of `MultiVector` and the batched methods below.
+
+    @_cached_property
+    def _grade_projection_masks(self):
+        return {}
+
+    def _grade_projection_mask(self, grades):
+        """ A boolean array selecting the blades of the given grades """
+        # validated before the cache lookup, as `1.0` hashes the same as `1`
+        for grade in grades:
+            if grade not in self.gradeList:
+                raise ValueError("algebra does not have grade %s" % grade)
+            if not np.issubdtype(type(grade), np.integer):
+                raise ValueError("grade must be an integer")
+        grades = tuple(int(grade) for grade in grades)
+        try:
+            return self._grade_projection_masks[grades]
+        except KeyError:
+            pass
+        ret = self._grade_projection_masks[grades] = np.isin(self._grade_array, grades)
+        return ret
+
+    @_cached_property
+    def _reversion_signs(self):
+        grades = self._grade_array
+        return np.power(-1, grades*(grades - 1)//2).astype(np.int8)
+
+    @_cached_property
+    def _grade_involution_signs(self):
+        return np.power(-1, self._grade_array).astype(np.int8)
+
+    @_cached_property
+    def _conjugation_signs(self):
+        return self._reversion_signs * self._grade_involution_signs
+
+    @_cached_property
+    def _dual_permutation(self):
+        """
+        The dual as a signed permutation of the coefficients, ``(indices,
+        signs)`` such that the dual of ``X`` is ``X[indices] * signs``
+        """
+        # the dual of each blade is +/- another blade
+        matrix = np.array([self.dual_func(row) for row in np.eye(self.gaDims)])
+        indices = np.argmax(np.abs(matrix), axis=0)
+        signs = matrix[indices, np.arange(self.gaDims)].astype(np.int8)
+        return indices, signs
+
+    @_cached_property
+    def _mag2_weights(self):
+        """ The scalar ``~e*e`` for each blade ``e``, which is the product of its signature """
+        sig = self.sig.astype(np.int8)
+        return np.array([
+            np.prod(sig[np.array(blade, dtype=int) - self.firstIdx])
+            for blade in self.bladeTupList
+        ], dtype=np.int8)
+
+    def grade_projection_batch(self, a, grades, out=None, dtype=None):
+        """
+        Project a ``(..., gaDims)`` array of coefficients onto one or more grades
+
+        This is the batched counterpart of ``M(grade)``. `grades` may be a
+        single grade or a tuple of grades.
+        """
+        if not isinstance(grades, tuple):
+            grades = (grades,)
+        return _unary_batch(_numba_scale_batch, self._grade_projection_mask(grades), a, self.gaDims, out, dtype=dtype)
+
+    def adjoint_batch(self, a, out=None, dtype=None):
+        """ Reversion of a ``(..., gaDims)`` array of coefficients, see :meth:`MultiVector.adjoint` """
+        return _unary_batch(_numba_scale_batch, self._reversion_signs, a, self.gaDims, out, dtype=dtype)
+
+    def gradeInvol_batch(self, a, out=None, dtype=None):
+        """ Grade involution of a ``(..., gaDims)`` array of coefficients, see :meth:`MultiVector.gradeInvol` """
+        return _unary_batch(_numba_scale_batch, self._grade_involution_signs, a, self.gaDims, out, dtype=dtype)
+
+    def conjugate_batch(self, a, out=None, dtype=None):
+        """ Clifford conjugate of a ``(..., gaDims)`` array of coefficients, see :meth:`MultiVector.conjugate` """
+        return _unary_batch(_numba_scale_batch, self._conjugation_signs, a, self.gaDims, out, dtype=dtype)
+
+    def mag2_batch(self, a, out=None, dtype=None):
+        """
+        Magnitude squared of a ``(..., gaDims)`` array of coefficients, see
+        :meth:`MultiVector.mag2`.
+
+        Returns an array of shape ``(...)``.
+        """
+        return _unary_batch(_numba_mag2_batch, self._mag2_weights, a, self.gaDims, out, scalar=True, dtype=dtype)
+
+    def abs_batch(self, a, out=None, dtype=None):
+        """
+        Magnitude of a ``(..., gaDims)`` array of coefficients, see
+        :meth:`MultiVector.__abs__`.
+
+        Returns an array of shape ``(...)``.
+        """
+        out = _unary_batch(_numba_mag2_batch, self._mag2_weights, a, self.gaDims, out,
+                           scalar=True, inexact=True, dtype=dtype)
+        return np.sqrt(np.abs(out, out=out), out=out)
+
+    def normal_batch(self, a, out=None, dtype=None):
+        """ Normalise a ``(..., gaDims)`` array of coefficients, see :meth:`MultiVector.normal` """
+        return _unary_batch(_numba_normal_batch, self._mag2_weights, a, self.gaDims, out, inexact=True, dtype=dtype)
+
+    # Reductions over the first axis of an ``(n, gaDims)`` array. These are
+    # computed in parallel chunks of `clifford.batch_chunk_size` rows, which
+    # are then combined in order, so the result depends on the chunk size but
+    # not on the number of threads.
+
+    @_cached_property
+    def _gmt_reduce_func(self):
+        return get_mult_reduce_function(self.gmt_func)
+
+    def sum_reduce(self, a):
+        """
+        Sum of an ``(n, gaDims)`` array of coefficients
+
+        Returns an array of shape ``(gaDims,)``.
+        """
+        return _reduce_batch(_numba_sum_reduce, a, self.gaDims, np.int8)
+
+    def gmt_reduce(self, a):
+        """
+        Geometric product of the rows of an ``(n, gaDims)`` array of
+        coefficients, in order, ``a[0] * a[1] * ... * a[n-1]``
+
+        Returns an array of shape ``(gaDims,)``, which is the scalar 1 if
+        ``n == 0``.
+        """
+        return _reduce_batch(self._gmt_reduce_func, a, self.gaDims, np.int8,
+                             scalar_index=self.gradeList.index(0))
+
     def get_grade_projection_matrix(self, grade):
         """
         Returns the matrix M_g that performs grade projection via left multiplication
@@ -340,7 +898,7 @@ class Layout(object):
         """
         dims = self.gaDims
         bl = self.blades_list
-        signlist = np.zeros(self.gaDims)
+        signlist = np.zeros(self.gaDims, dtype=np.int8)
         for n in range(len(bl)):
             i = bl[n]
             j = bl[dims-1-n]
@@ -349,7 +907,7 @@ class Layout(object):
 
         @numba.njit
         def right_comp_func(Xval):
-            Yval = np.zeros(dims)
+            Yval = np.zeros_like(Xval)
             for i, s in enumerate(signlist):
                 Yval[i] = Xval[dims-1-i]*s
             return Yval
@@ -369,6 +927,58 @@ class Layout(object):
         """
         return val_get_right_gmt_matrix(self.gmt, x.value)
 
+    def get_versor_matrix(self, V):
+        """
+        This produces the matrix M that applies the versor V by the sandwich
+        product, eg. M@x.value == (V*x*~V).value
+
+        Conjugation by a versor is an outermorphism, so only the images of
+        the basis vectors are computed with geometric products. The images of
+        the other blades are the outer products of those, which makes `M`
+        block-diagonal by grade.
+
+        Once built, `M` applies `V` to a whole array of coefficients at once,
+        with ``values @ M.T``.
+
+        Raises a ValueError if ``V*~V`` is not a nonzero scalar.
+        """
+        Vrev = ~V
+        VVrev = V * Vrev
+        s = VVrev[()]
+        # rounding errors grow with the coefficients of V, so the tolerance
+        # must too, as well as with the machine epsilon of their type
+        eps = np.finfo(np.result_type(V.value.dtype, np.float16)).eps
+        tol = max(1e-10, 1e3 * eps) * np.max(np.abs(V.value))**2
+        if abs(s) <= tol or np.max(np.abs(VVrev.value - s * self.scalar.value)) > tol:
+            raise ValueError("V is not an invertible versor")
+
+        # the images of the basis blades, keyed by bitmap as in the product
+        # tables, so that the order of the indices in `bladeTupList` does not
+        # matter. These are normalized to remove the factor of s introduced by
+        # each sandwich. The vector images are projected to grade 1 to discard
+        # rounding errors, so that the result is exactly block-diagonal.
+        grade_1 = self.grade_mask(1)
+        images = {0: self.scalar.value}
+        for i in range(self.dims):
+            e = np.zeros(self.gaDims, dtype=np.int8)
+            e[self.bitmap_to_linear_map[1 << i]] = 1
+            images[1 << i] = self.gmt_func(self.gmt_func(V.value, e), Vrev.value) / s * grade_1
+
+        def image(bitmap):
+            try:
+                return images[bitmap]
+            except KeyError:
+                pass
+            # the wedge of the lowest basis vector with the rest
+            lowest = bitmap & -bitmap
+            ret = images[bitmap] = self.omt_func(images[lowest], image(bitmap ^ lowest))
+            return ret
+
+        M = np.zeros((self.gaDims, self.gaDims), dtype=images[1].dtype)
+        for j, bitmap in enumerate(self.linear_map_to_bitmap):
+            M[:, j] = s * image(int(bitmap))
+        return M
+
     def MultiVector(self, *args, **kw):
         '''
         create a multivector in this layout
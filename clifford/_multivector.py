@@ -36,14 +36,25 @@ class MultiVector(object):
     * ``M[N]`` : blade projection
     """
 
-    def __init__(self, layout, value=None, string=None, *, dtype: np.dtype = np.float64) -> None:
-        """Constructor."""
+    # Multivectors are created for the result of every operation, so we keep
+    # them as small and quick to construct as possible
+    __slots__ = ('layout', 'value')
+
+    __array_priority__ = 100
+
+    def __init__(self, layout, value=None, string=None, *, dtype: np.dtype = None) -> None:
+        """Constructor.
+
+        If neither `value` nor `string` are given, the multivector is zero,
+        with coefficients of type `dtype`, which defaults to ``layout.dtype``.
+        """
 
         self.layout = layout
-        self.__array_priority__ = 100
 
         if value is None:
             if string is None:
+                if dtype is None:
+                    dtype = layout.dtype
                 self.value = np.zeros((self.layout.gaDims,), dtype=dtype)
             else:
                 self.value = layout.parse_multivector(string).value
@@ -64,29 +75,54 @@ class MultiVector(object):
 
         _checkOther(other, coerce=True) --> newOther, isMultiVector
         """
-        if isinstance(other, numbers.Number):
+        # checked first, as it is the common case, and checking against the
+        # `numbers.Number` ABC is comparatively slow
+        if isinstance(other, MultiVector):
+            # comparing layouts is only needed if they are not the same object
+            if other.layout is not self.layout and other.layout != self.layout:
+                raise ValueError(
+                    "cannot operate on MultiVectors with different Layouts")
+            else:
+                return other, True
+
+        elif isinstance(other, numbers.Number):
             if coerce:
                 # numeric scalar
-                newOther = self._newMV(dtype=np.result_type(other))
+                # the scalar is not allowed to upcast our coefficients, such as
+                # a python float added to float32 coefficients
+                newOther = self._newMV(dtype=np.result_type(self.value.dtype, other))
                 newOther[()] = other
                 return newOther, True
             else:
                 return other, False
-
-        elif isinstance(other, MultiVector):
-            if other.layout != self.layout:
-                raise ValueError(
-                    "cannot operate on MultiVectors with different Layouts")
-            else:
-                return other, True
         else:
             return other, False
 
+    @classmethod
+    def _from_value(cls, layout, value: np.ndarray) -> 'MultiVector':
+        """
+        Construct a MultiVector which takes ownership of `value`, without
+        copying or checking it.
+
+        `value` must be an array of shape ``(layout.gaDims,)`` which is not
+        used elsewhere, such as the freshly allocated result of a product.
+        """
+        self = cls.__new__(cls)
+        self.layout = layout
+        self.value = value
+        return self
+
     def _newMV(self, newValue=None, *, dtype: np.dtype = None) -> 'MultiVector':
         """Returns a new MultiVector (or derived class instance).
+
+        This takes ownership of `newValue` if it is an array, which must not
+        be used elsewhere.
         """
-        if newValue is None and dtype is None:
-            raise TypeError("Must specify either a type or value")
+        if dtype is None:
+            if newValue is None:
+                raise TypeError("Must specify either a type or value")
+            if type(newValue) is np.ndarray:
+                return self._from_value(self.layout, newValue)
 
         return self.__class__(self.layout, newValue, dtype=dtype)
 
@@ -96,6 +132,22 @@ class MultiVector(object):
     def exp(self) -> 'MultiVector':
         return general_exp(self)
 
+    def log(self) -> 'MultiVector':
+        r"""
+        The bivector logarithm of a rotor, such that ``R.log().exp() == R``
+
+        This is computed in closed form, and works in any algebra for rotors
+        whose bivector part is the sum of at most two commuting simple
+        bivectors. The scale of the rotor is ignored.
+
+        Raises a ValueError if the rotor has no real logarithm, or if it
+        cannot be computed in this way.
+        """
+        value, ok = cf._bivector.log_value(self.layout, self.value)
+        if not ok:
+            raise ValueError("cannot compute the logarithm of this multivector")
+        return self._newMV(value)
+
     def vee(self, other) -> 'MultiVector':
         """
         The vee product aka. the meet... To be optimised still
@@ -114,8 +166,10 @@ class MultiVector(object):
         other, mv = self._checkOther(other, coerce=False)
 
         if mv:
-            newValue = self.layout.gmt_func(self.value, other.value)
+            newValue = self.layout._product('gmt', self.value, other.value)
         else:
+            if isinstance(other, (cf.DenseMVArray, cf.GradedMultiVector, cf._jit_expr._SymbolicMultiVector)):
+                return NotImplemented
             if isinstance(other, np.ndarray):
                 obj = self.__array__()
                 return obj*other
@@ -130,8 +184,10 @@ class MultiVector(object):
         other, mv = self._checkOther(other, coerce=False)
 
         if mv:
-            newValue = self.layout.gmt_func(other.value, self.value)
+            newValue = self.layout._product('gmt', other.value, self.value)
         else:
+            if isinstance(other, (cf.DenseMVArray, cf.GradedMultiVector, cf._jit_expr._SymbolicMultiVector)):
+                return NotImplemented
             if isinstance(other, np.ndarray):
                 obj = self.__array__()
                 return other*obj
@@ -145,8 +201,10 @@ class MultiVector(object):
         other, mv = self._checkOther(other, coerce=False)
 
         if mv:
-            newValue = self.layout.omt_func(self.value, other.value)
+            newValue = self.layout._product('omt', self.value, other.value)
         else:
+            if isinstance(other, (cf.DenseMVArray, cf.GradedMultiVector, cf._jit_expr._SymbolicMultiVector)):
+                return NotImplemented
             if isinstance(other, np.ndarray):
                 obj = self.__array__()
                 return obj^other
@@ -160,8 +218,10 @@ class MultiVector(object):
         other, mv = self._checkOther(other, coerce=False)
 
         if mv:
-            newValue = self.layout.omt_func(other.value, self.value)
+            newValue = self.layout._product('omt', other.value, self.value)
         else:
+            if isinstance(other, (cf.DenseMVArray, cf.GradedMultiVector, cf._jit_expr._SymbolicMultiVector)):
+                return NotImplemented
             if isinstance(other, np.ndarray):
                 obj = self.__array__()
                 return other^obj
@@ -175,8 +235,10 @@ class MultiVector(object):
         other, mv = self._checkOther(other)
 
         if mv:
-            newValue = self.layout.imt_func(self.value, other.value)
+            newValue = self.layout._product('imt', self.value, other.value)
         else:
+            if isinstance(other, (cf.DenseMVArray, cf.GradedMultiVector, cf._jit_expr._SymbolicMultiVector)):
+                return NotImplemented
             if isinstance(other, np.ndarray):
                 obj = self.__array__()
                 return obj|other
@@ -195,6 +257,8 @@ class MultiVector(object):
 
         other, mv = self._checkOther(other)
         if not mv:
+            if isinstance(other, (cf.DenseMVArray, cf.GradedMultiVector, cf._jit_expr._SymbolicMultiVector)):
+                return NotImplemented
             if isinstance(other, np.ndarray):
                 obj = self.__array__()
                 return obj + other
@@ -212,6 +276,8 @@ class MultiVector(object):
 
         other, mv = self._checkOther(other)
         if not mv:
+            if isinstance(other, (cf.DenseMVArray, cf.GradedMultiVector, cf._jit_expr._SymbolicMultiVector)):
+                return NotImplemented
             if isinstance(other, np.ndarray):
                 obj = self.__array__()
                 return obj - other
@@ -227,6 +293,8 @@ class MultiVector(object):
 
         other, mv = self._checkOther(other)
         if not mv:
+            if isinstance(other, (cf.DenseMVArray, cf.GradedMultiVector, cf._jit_expr._SymbolicMultiVector)):
+                return NotImplemented
             if isinstance(other, np.ndarray):
                 obj = self.__array__()
                 return other - obj
@@ -245,6 +313,8 @@ class MultiVector(object):
         if mv:
             return self * other.inv()
         else:
+            if isinstance(other, (cf.DenseMVArray, cf.GradedMultiVector, cf._jit_expr._SymbolicMultiVector)):
+                return NotImplemented
             if isinstance(other, np.ndarray):
                 obj = self.__array__()
                 return obj/other
@@ -297,8 +367,104 @@ class MultiVector(object):
         """
         The ``<<`` operator is the left contraction
         """
+        if isinstance(other, (cf.DenseMVArray, cf.GradedMultiVector, cf._jit_expr._SymbolicMultiVector)):
+            return NotImplemented
         return self.lc(other)
 
+    # in-place
+    #
+    # These write into the coefficients of the left operand, rather than
+    # allocating a new MultiVector. If the result would not fit in its dtype,
+    # the coefficients are read-only (as for the shared blades returned by
+    # `bases`), or the other operand is not a scalar or MultiVector, they
+    # return NotImplemented, and python falls back on the out-of-place
+    # operators.
+
+    def _inplace_operand(self, other, coerce=False):
+        """
+        Check the right operand of an in-place operator, returning
+        ``(other, isMultiVector)``, or None if the operation cannot be done
+        in place.
+        """
+        if not self.value.flags.writeable:
+            return None
+        other, mv = self._checkOther(other, coerce=coerce)
+        if mv:
+            other_dtype = other.value.dtype
+        elif isinstance(other, numbers.Number):
+            other_dtype = other
+        else:
+            return None
+        if np.result_type(self.value.dtype, other_dtype) != self.value.dtype:
+            return None
+        return other, mv
+
+    def _iproduct(self, name, other, scalar_op):
+        checked = self._inplace_operand(other)
+        if checked is None:
+            return NotImplemented
+        other, mv = checked
+        if mv:
+            self.layout._product(name, self.value, other.value, out=self.value)
+        else:
+            scalar_op(self.value, other, out=self.value)
+        return self
+
+    def __iadd__(self, other) -> 'MultiVector':
+        """In-place addition, ``M += N``"""
+        checked = self._inplace_operand(other)
+        if checked is None:
+            return NotImplemented
+        other, mv = checked
+        if mv:
+            self.value += other.value
+        else:
+            self[()] += other
+        return self
+
+    def __isub__(self, other) -> 'MultiVector':
+        """In-place subtraction, ``M -= N``"""
+        checked = self._inplace_operand(other)
+        if checked is None:
+            return NotImplemented
+        other, mv = checked
+        if mv:
+            self.value -= other.value
+        else:
+            self[()] -= other
+        return self
+
+    def __imul__(self, other) -> 'MultiVector':
+        """In-place geometric product, ``M *= N``, which computes :math:`MN` """
+        return self._iproduct('gmt', other, np.multiply)
+
+    def __ixor__(self, other) -> 'MultiVector':
+        r"""In-place outer product, ``M ^= N``, which computes :math:`M \wedge N` """
+        return self._iproduct('omt', other, np.multiply)
+
+    def __ior__(self, other) -> 'MultiVector':
+        r"""In-place inner product, ``M |= N``, which computes :math:`M \cdot N` """
+        # l * M = M * l = 0 for scalar l
+        return self._iproduct('imt', other, lambda value, other, out: out.fill(0))
+
+    def __ilshift__(self, other) -> 'MultiVector':
+        r"""In-place left contraction, ``M <<= N``, which computes :math:`M \rfloor N` """
+        checked = self._inplace_operand(other, coerce=True)
+        if checked is None:
+            return NotImplemented
+        other, mv = checked
+        self.layout._product('lcmt', self.value, other.value, out=self.value)
+        return self
+
+    def __itruediv__(self, other) -> 'MultiVector':
+        """In-place division, ``M /= N``, which computes :math:`M N^{-1}` """
+        if not np.issubdtype(self.value.dtype, np.inexact):
+            # true division never produces integers
+            return NotImplemented
+        if isinstance(other, MultiVector):
+            return self.__imul__(other.inv())
+        return self._iproduct('gmt', other, np.true_divide)
+
     # unary
 
     def __neg__(self) -> 'MultiVector':
@@ -323,8 +489,9 @@ class MultiVector(object):
 
         Note in mixed signature spaces this may be negative
         """
-        mv_val = self.layout.gmt_func(self.layout.adjoint_func(self.value), self.value)
-        return mv_val[0]
+        # numba returns a python scalar, which would lose the precision of
+        # our coefficients
+        return self.value.dtype.type(cf._numba_mag2(self.value, self.layout._mag2_weights))
 
     def __abs__(self) -> numbers.Number:
         """Magnitude (modulus), :math::`|M|`
@@ -441,20 +608,9 @@ class MultiVector(object):
         """
         if isinstance(other, MultiVector):
             return other.project(self)
-        else:
-            # we are making a grade projection
-            grade = other
 
-        if len(others) != 0:
-            return sum([self.__call__(k) for k in (other,)+others])
-
-        if grade not in self.layout.gradeList:
-            raise ValueError("algebra does not have grade %s" % grade)
-
-        if not np.issubdtype(type(grade), np.integer):
-            raise ValueError("grade must be an integer")
-
-        mask = np.equal(grade, self.layout.gradeList)
+        # we are making a grade projection
+        mask = self.layout._grade_projection_mask((other,) + others)
 
         newValue = np.multiply(mask, self.value)
 
@@ -573,7 +729,7 @@ class MultiVector(object):
 
         other, mv = self._checkOther(other, coerce=True)
 
-        newValue = self.layout.lcmt_func(self.value, other.value)
+        newValue = self.layout._product('lcmt', self.value, other.value)
 
         return self._newMV(newValue)
 
@@ -669,7 +825,7 @@ class MultiVector(object):
         :math:`\frac{M}{|M|}` up to a sign
         """
 
-        return self / np.sqrt(abs(self.mag2()))
+        return self._newMV(self.value / np.sqrt(abs(self.mag2())))
 
     def leftLaInv(self) -> 'MultiVector':
         """Return left-inverse using a computational linear algebra method
@@ -687,19 +843,27 @@ class MultiVector(object):
 
         Madjoint = ~self
         MadjointM = (Madjoint * self)
-
-        if MadjointM.isScalar() and abs(MadjointM[()]) > cf._eps:
+        s = MadjointM[()]
+
+        # single precision rounding errors are far larger than the usual
+        # tolerance, which is kept for double precision. These grow with the
+        # square of the coefficients.
+        scale = max(1, np.max(np.abs(self.value))**2)
+        eps = max(cf._eps, 1e3 * np.finfo(np.result_type(MadjointM.value.dtype, np.float32)).eps * scale)
+        if abs(s) > eps and np.all(np.abs((MadjointM - s).value) < eps):
             # inverse exists
-            return Madjoint / MadjointM[()]
+            return Madjoint / s
         else:
             raise ValueError("no inverse exists for this multivector")
 
     def inv(self) -> 'MultiVector':
-        if (self*~self).isScalar():
-            it = self.normalInv()
-        else:
-            it = self.leftLaInv()
-        return it
+        r"""The inverse, :math:`M^{-1}`.
+
+        This is :math:`\tilde M / (M \tilde M)` if :math:`M \tilde M` is a
+        scalar, and is otherwise found in the same way as :meth:`leftLaInv`.
+        See :meth:`Layout.inv_batch`.
+        """
+        return self._newMV(self.layout.inv_batch(self.value))
 
     leftInv = leftLaInv
     rightInv = leftLaInv
@@ -739,9 +903,7 @@ class MultiVector(object):
                   {(-1)^i \left<M\right>_i}
         """
 
-        signs = np.power(-1, self.layout.gradeList)
-
-        newValue = signs * self.value
+        newValue = self.layout._grade_involution_signs * self.value
 
         return self._newMV(newValue)
 
@@ -751,9 +913,9 @@ class MultiVector(object):
         Even part of this multivector
 
         defined as
-        ``M + M.gradInvol()``
+        ``(M + M.gradInvol()) / 2``
         '''
-        return .5*(self + self.gradeInvol())
+        return self._newMV(self.value * (self.layout._grade_involution_signs == 1))
 
     @property
     def odd(self) -> 'MultiVector':
@@ -761,16 +923,16 @@ class MultiVector(object):
         Odd part of this mulitvector
 
         defined as
-        ``M +- M.gradInvol()``
+        ``(M - M.gradInvol()) / 2``
         '''
-        return .5*(self - self.gradeInvol())
+        return self._newMV(self.value * (self.layout._grade_involution_signs == -1))
 
     def conjugate(self) -> 'MultiVector':
         """The Clifford conjugate (reversion and grade involution).
 
         :math:`M^*` = ``(~M).gradeInvol()``
         """
-        return (~self).gradeInvol()
+        return self._newMV(self.layout._conjugation_signs * self.value)
 
     # Subspace operations
     def project(self, other) -> 'MultiVector':
@@ -827,7 +989,7 @@ class MultiVector(object):
 
         for i in range(self.layout.gaDims):
             if self.layout.gradeList[i] == 1:
-                v = np.zeros((self.layout.gaDims,), dtype=float)
+                v = np.zeros((self.layout.gaDims,), dtype=self.layout.dtype)
                 v[i] = 1.
                 wholeBasis.append(self._newMV(v))
 
@@ -950,4 +1112,5 @@ class MultiVector(object):
 
         See `np.ndarray.astype` for argument descriptions.
         """
-        return self._newMV(self.value.astype(*args, **kwargs))
+        # with `copy=False` this may not be a new array, so must be copied
+        return self.__class__(self.layout, self.value.astype(*args, **kwargs))
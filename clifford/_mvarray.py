@@ -40,9 +40,12 @@ class MVArray(np.ndarray):
         return MVArray(v_new_mv(value_array))
 
     def save(self, filename, compression=True, transpose=False,
-             sparse=False, support=False, compression_opts=1):
+             sparse=None, support=None, compression_opts=1):
         """
         Saves the array to a ga file
+
+        See :func:`clifford.io.write_ga_file` for a description of the
+        arguments.
         """
         write_ga_file(filename, self.value, self[0].layout.metric, self[0].layout.basis_names,
                       compression=compression, transpose=transpose,
@@ -52,7 +55,8 @@ class MVArray(np.ndarray):
         '''
         sum elements of this MVArray
         '''
-        out = self[0]
+        # a copy, which can then be updated in place
+        out = +self[0]
         for k in self[1:]:
             out += k
         return out
@@ -62,7 +66,8 @@ class MVArray(np.ndarray):
         geometric product of all elements of this MVArray  (like reduce)
         like `self[0]*self[1]*....self[n]`
         '''
-        out = self[0]
+        # a copy, which can then be updated in place
+        out = +self[0]
         for k in self[1:]:
             out *= k
         return out
@@ -0,0 +1,357 @@
+"""
+Numba support for :class:`~clifford.Layout` and :class:`~clifford.MultiVector`
+
+Registering these as numba types lets jitted functions take, create, and
+return multivectors, and use their operators directly::
+
+    @numba.njit
+    def apply(R, x):
+        return R * x * ~R
+
+Each layout is its own numba type, so that the product functions of the
+layout are known at compile time. Multivectors are stored as a layout and
+a coefficient array, in the same way as in python, and can be unpacked
+with ``mv.layout`` and ``mv.value``.
+
+Within jitted code, the following are supported:
+
+* ``MultiVector(layout, value)`` and ``layout.MultiVector(value)``
+* ``A * B``, ``A ^ B``, ``A | B``, ``A << B``, ``A + B``, and ``A - B``
+  between multivectors of the same layout, or a multivector and a scalar
+* ``A / s`` for a scalar ``s``
+* ``~A``, ``-A``, and ``+A``
+* ``A(grade)``, projecting onto a single grade
+"""
+import itertools
+import operator
+import weakref
+
+import numpy as np
+import numba
+from numba import types
+from numba.extending import (
+    NativeValue, box, unbox, typeof_impl, type_callable, models, register_model,
+    make_attribute_wrapper, lower_builtin, overload, overload_method,
+)
+from numba.targets.imputils import lower_constant, impl_ret_borrowed
+from numba import cgutils
+
+from ._layout import Layout
+from ._multivector import MultiVector
+
+
+# A unique key for each live layout. Keys are never reused, unlike the ids of
+# layouts which have been garbage collected, and entries are removed along
+# with their layout.
+_layout_keys = {}  # id(layout) -> (weakref to layout, key)
+_next_layout_key = itertools.count()
+
+
+def _layout_key(layout: Layout) -> int:
+    try:
+        ref, key = _layout_keys[id(layout)]
+    except KeyError:
+        pass
+    else:
+        if ref() is layout:
+            return key
+    key = next(_next_layout_key)
+    layout_id = id(layout)
+    ref = weakref.ref(layout, lambda ref: _layout_keys.pop(layout_id, None))
+    _layout_keys[layout_id] = ref, key
+    return key
+
+
+class LayoutType(types.Dummy):
+    """
+    The numba type of a specific :class:`~clifford.Layout`
+
+    This is keyed on the identity of the layout rather than equality, as
+    equal layouts may still use different engines for their products.
+    Only a weak reference to the layout is held, so that typing a layout
+    does not keep it alive.
+    """
+    def __init__(self, layout):
+        self._layout_ref = weakref.ref(layout)
+        self._layout_key = _layout_key(layout)
+        super().__init__("LayoutType({!r})".format(layout))
+
+    @property
+    def obj(self) -> Layout:
+        layout = self._layout_ref()
+        if layout is None:
+            raise ReferenceError("The layout of {} no longer exists".format(self))
+        return layout
+
+    @property
+    def key(self):
+        return self._layout_key
+
+
+class MultiVectorType(types.Type):
+    """ The numba type of a :class:`~clifford.MultiVector` with a given layout and coefficient array type """
+    def __init__(self, layout_type: LayoutType, value_type: types.Array):
+        self.layout_type = layout_type
+        self.value_type = value_type
+        super().__init__("MultiVectorType({}, {})".format(layout_type, value_type))
+
+    @property
+    def key(self):
+        return self.layout_type, self.value_type
+
+    @property
+    def layout(self) -> Layout:
+        return self.layout_type.obj
+
+
+@typeof_impl.register(Layout)
+def _typeof_Layout(val, c):
+    return LayoutType(val)
+
+
+@typeof_impl.register(MultiVector)
+def _typeof_MultiVector(val, c):
+    return MultiVectorType(LayoutType(val.layout), numba.typeof(val.value, c))
+
+
+register_model(LayoutType)(models.OpaqueModel)
+
+
+@register_model(MultiVectorType)
+class _MultiVectorModel(models.StructModel):
+    def __init__(self, dmm, fe_type):
+        members = [
+            ('layout', fe_type.layout_type),
+            ('value', fe_type.value_type),
+        ]
+        super().__init__(dmm, fe_type, members)
+
+
+make_attribute_wrapper(MultiVectorType, 'layout', 'layout')
+make_attribute_wrapper(MultiVectorType, 'value', 'value')
+
+
+# boxing and unboxing
+
+@unbox(LayoutType)
+def _unbox_Layout(typ, obj, c):
+    return NativeValue(c.context.get_dummy_value())
+
+
+@box(LayoutType)
+def _box_Layout(typ, val, c):
+    # a value of this type only exists while the layout does, as it was
+    # either passed in or is referred to by the jitted function
+    obj = c.context.add_dynamic_addr(c.builder, id(typ.obj), info=typ.name)
+    c.pyapi.incref(obj)
+    return obj
+
+
+@lower_constant(LayoutType)
+def _lower_constant_Layout(context, builder, typ, pyval):
+    return context.get_dummy_value()
+
+
+@unbox(MultiVectorType)
+def _unbox_MultiVector(typ, obj, c):
+    value_obj = c.pyapi.object_getattr_string(obj, 'value')
+    value = c.unbox(typ.value_type, value_obj)
+    c.pyapi.decref(value_obj)
+    mv = cgutils.create_struct_proxy(typ)(c.context, c.builder)
+    mv.layout = c.context.get_dummy_value()
+    mv.value = value.value
+    return NativeValue(mv._getvalue(), is_error=value.is_error)
+
+
+@box(MultiVectorType)
+def _box_MultiVector(typ, val, c):
+    mv = cgutils.create_struct_proxy(typ)(c.context, c.builder, value=val)
+    layout_obj = c.box(typ.layout_type, mv.layout)
+    value_obj = c.box(typ.value_type, mv.value)
+    # the value may be shared with other arrays inside the jitted code, so is
+    # copied by the constructor, as it would be in python
+    func_obj = c.pyapi.unserialize(c.pyapi.serialize_object(MultiVector))
+    res = c.pyapi.call_function_objargs(func_obj, (layout_obj, value_obj))
+    c.pyapi.decref(func_obj)
+    c.pyapi.decref(layout_obj)
+    c.pyapi.decref(value_obj)
+    return res
+
+
+@lower_constant(MultiVectorType)
+def _lower_constant_MultiVector(context, builder, typ, pyval):
+    mv = cgutils.create_struct_proxy(typ)(context, builder)
+    mv.layout = context.get_dummy_value()
+    mv.value = context.get_constant_generic(builder, typ.value_type, pyval.value)
+    return mv._getvalue()
+
+
+# construction
+
+@type_callable(MultiVector)
+def _type_MultiVector(context):
+    def typer(layout, value):
+        if isinstance(layout, LayoutType) and isinstance(value, types.Array) and value.ndim == 1:
+            return MultiVectorType(layout, value)
+    return typer
+
+
+@lower_builtin(MultiVector, LayoutType, types.Array)
+def _impl_MultiVector(context, builder, sig, args):
+    typ = sig.return_type
+    layout, value = args
+    mv = cgutils.create_struct_proxy(typ)(context, builder)
+    mv.layout = layout
+    mv.value = value
+    return impl_ret_borrowed(context, builder, typ, mv._getvalue())
+
+
+@overload_method(LayoutType, 'MultiVector')
+def _Layout_MultiVector(self, value):
+    def impl(self, value):
+        return MultiVector(self, value)
+    return impl
+
+
+# operators
+
+def _same_layout(a, b):
+    return (
+        isinstance(a, MultiVectorType) and isinstance(b, MultiVectorType) and
+        a.layout_type == b.layout_type
+    )
+
+
+def _product_overload(op, name, scalar_impl):
+    """
+    Overload `op` to compute the product `name`, and use `scalar_impl` when
+    one of the operands is a scalar.
+    """
+    @overload(op)
+    def ol(a, b):
+        if _same_layout(a, b):
+            func = getattr(a.layout, name + '_func')
+
+            def impl(a, b):
+                return MultiVector(a.layout, func(a.value, b.value))
+            return impl
+        elif isinstance(a, MultiVectorType) and isinstance(b, types.Number):
+            def impl(a, b):
+                return scalar_impl(a, b)
+            return impl
+        elif isinstance(a, types.Number) and isinstance(b, MultiVectorType):
+            def impl(a, b):
+                return scalar_impl(b, a)
+            return impl
+
+
+@numba.njit
+def _scalar_mul(a, b):
+    return MultiVector(a.layout, a.value * b)
+
+
+@numba.njit
+def _scalar_imt(a, b):
+    # l * M = M * l = 0 for scalar l
+    return MultiVector(a.layout, np.zeros_like(a.value * b))
+
+
+_product_overload(operator.mul, 'gmt', _scalar_mul)
+_product_overload(operator.xor, 'omt', _scalar_mul)
+_product_overload(operator.or_, 'imt', _scalar_imt)
+
+
+@overload(operator.lshift)
+def _ol_lshift(a, b):
+    if _same_layout(a, b):
+        lcmt_func = a.layout.lcmt_func
+
+        def impl(a, b):
+            return MultiVector(a.layout, lcmt_func(a.value, b.value))
+        return impl
+
+
+def _sum_overload(op):
+    @overload(op)
+    def ol(a, b):
+        if _same_layout(a, b):
+            def impl(a, b):
+                return MultiVector(a.layout, op(a.value, b.value))
+            return impl
+        elif isinstance(a, MultiVectorType) and isinstance(b, types.Number):
+            scalar_index = a.layout.gradeList.index(0)
+
+            def impl(a, b):
+                # a promoted copy
+                value = a.value + 0 * b
+                value[scalar_index] = op(value[scalar_index], b)
+                return MultiVector(a.layout, value)
+            return impl
+        elif isinstance(a, types.Number) and isinstance(b, MultiVectorType):
+            scalar_index = b.layout.gradeList.index(0)
+
+            def impl(a, b):
+                value = op(0 * a, b.value)
+                value[scalar_index] += a
+                return MultiVector(b.layout, value)
+            return impl
+
+
+_sum_overload(operator.add)
+_sum_overload(operator.sub)
+
+
+@overload(operator.truediv)
+def _ol_truediv(a, b):
+    if isinstance(a, MultiVectorType) and isinstance(b, types.Number):
+        def impl(a, b):
+            return MultiVector(a.layout, a.value / b)
+        return impl
+
+
+@overload(operator.invert)
+def _ol_invert(a):
+    if isinstance(a, MultiVectorType):
+        adjoint_func = a.layout.adjoint_func
+
+        def impl(a):
+            return MultiVector(a.layout, adjoint_func(a.value))
+        return impl
+
+
+@overload(operator.neg)
+def _ol_neg(a):
+    if isinstance(a, MultiVectorType):
+        def impl(a):
+            return MultiVector(a.layout, -a.value)
+        return impl
+
+
+@overload(operator.pos)
+def _ol_pos(a):
+    if isinstance(a, MultiVectorType):
+        def impl(a):
+            return MultiVector(a.layout, a.value.copy())
+        return impl
+
+
+# grade projection, ``mv(grade)``. Numba types the call through the
+# `__call__` method, but lowers it by looking up the type being called.
+
+@overload_method(MultiVectorType, '__call__')
+def _MultiVector_call(self, grade):
+    if isinstance(grade, types.Integer):
+        grades = np.array(self.layout.gradeList)
+
+        def impl(self, grade):
+            return MultiVector(self.layout, self.value * (grades == grade))
+        return impl
+
+
+@lower_builtin(MultiVectorType, MultiVectorType, types.Integer)
+def _impl_MultiVector_call(context, builder, sig, args):
+    mv_type, grade_type = sig.args
+    call = context.typing_context.resolve_getattr(mv_type, '__call__')
+    call_sig = call.get_call_type(context.typing_context, (grade_type,), {})
+    impl = context.get_function(call, call_sig)
+    return impl(builder, args)
@@ -1,112 +1,358 @@
 """
-caching  
+.. currentmodule:: clifford.caching
 
-generates and caches algebras to a temp dir using pickle
-"""
+========================================
+caching (:mod:`clifford.caching`)
+========================================
+
+Persistent on-disk cache for the multiplication tables and compiled product
+functions of a :class:`~clifford.Layout`.
+
+Building the tables and compiling the products of a layout takes a
+noticeable amount of time, which is repeated by every process. Instead,
+the first process to construct a layout stores its tables as a ``.npz`` file
+in a directory named after a hash of the layout signature, blades, and
+clifford version. Alongside the tables, a small python module defining the
+product functions is written, which numba is then able to cache compiled
+machine code for.
+
+The cache lives in ``$XDG_CACHE_HOME/clifford`` (or ``~/.cache/clifford``)
+by default. This can be changed with the ``CLIFFORD_CACHE_DIR`` environment
+variable or :func:`set_cache_dir`. Setting the environment variable to an
+empty string disables the cache.
+
+.. autosummary::
+    :toctree: generated/
 
-# delayed import to solve circularity
-# from . import Cl
+    get_cache_dir
+    set_cache_dir
+    clear_cache
+    layout_cache_key
+    load_generated_module
+"""
 
-import pickle
+import functools
+import hashlib
+import importlib.util
+import inspect
 import os
-from os.path import join
-from types import ModuleType
+import shutil
+import sys
 import tempfile
+import types
+import zipfile
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import sparse
+
+from ._version import __version__
 
-def get_temp_dir():
-    return join(tempfile.gettempdir(),'clifford/')
-
-def clear_cache():
-    tmp_dir = get_temp_dir()
-    filelist = [ f for f in os.listdir(tmp_dir) ]
-    for f in filelist:
-        os.remove(os.path.join(tmp_dir, f))
-    
-def generate_all_layout_combos(p_max=3, q_max=3, r_max=0,**kw):
-    from . import Cl # delayed import 
-    layouts = {}
-
-    for p in range(p_max+1):
-        for q in range(q_max+1):
-            for r in range(r_max+1):
-                if p+q<=1:
-                    continue
-
-                key = 'g%i%i%i'%(p,q,r)
-                layouts[key],blades = Cl(p=p, q=q, **kw)
-    return layouts 
-    
-def sigs_2_layouts(sigs):
-    from . import Cl # delayed import 
-    layouts ={}
-    for p,q,r in sigs:
-        layouts['g%i%i%i'%(p,q,r)] = Cl(p=p,q=q)[0]
-    return layouts
-    
-def write_layouts(layouts, tmp_dir=None):
-    if tmp_dir is None:
-        tmp_dir = get_temp_dir()
-    
+
+def _default_cache_dir() -> Optional[str]:
     try:
-        os.mkdir(tmp_dir)
-    except(FileExistsError):
+        cache_dir = os.environ['CLIFFORD_CACHE_DIR']
+    except KeyError:
         pass
-    
-    for key in layouts:
-        with open(join(tmp_dir, key+'.p'),'wb') as f:
-            pickle.dump(layouts[key],f)
-            print('caching %s'%key)
-            
-def read_layouts(tmp_dir=None):            
-    if tmp_dir is None:
-        tmp_dir = get_temp_dir()
-    
-    layouts = {}
-    for fname in os.listdir(tmp_dir):
-        
-        with open(join(tmp_dir, fname),'rb') as f:
-            key = os.path.splitext(fname)[0]
-            layouts[key] = pickle.load(f)
-           
-    return layouts 
-
-def generate_layout_submodules(layouts):
-    #TODO: putting the whole cache into memory is dumb. need dynamic loading.
-    submods = {}
-    for key in layouts:
-        # create layout submodule
-        this_layout = layouts[key]
-        mod = ModuleType(key)
-        mod.__dict__.update({'layout':this_layout,
-                            'blades':this_layout.blades})
-        mod.__dict__.update(this_layout.blades)
-        submods[key]=mod
-    return submods
-    
-def build_or_read_cache_and_attach_submods(clif_mod,sigs=None):
-    tmp_dir = get_temp_dir()
-    cache_exists=False
+    else:
+        # an empty string disables the cache
+        return cache_dir or None
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'clifford')
+
+
+_cache_dir = _default_cache_dir()
+
+
+def get_cache_dir() -> Optional[str]:
+    """ Get the directory used for the cache, or None if caching is disabled """
+    return _cache_dir
+
+
+def set_cache_dir(cache_dir: Optional[str]) -> None:
+    """ Set the directory used for the cache, or disable caching with None """
+    global _cache_dir
+    _cache_dir = cache_dir
+
+
+def clear_cache() -> None:
+    """ Remove all cached layouts """
+    if _cache_dir is not None and os.path.isdir(_cache_dir):
+        shutil.rmtree(_cache_dir)
+
+
+# The source of the module written for each layout. Every function is at
+# module scope rather than a closure, which allows numba to cache them.
+_KERNEL_MODULE_HEADER = '''"""
+Product functions for a single layout, generated by clifford.caching
+"""
+import os
+
+import numpy as np
+import numba
+
+from clifford import (
+    _eps,
+    _get_mult_function_result_type,
+    _out_is_omitted,
+    _numba_mult_runtime_sparse_into,
+    _numba_val_get_left_gmt_matrix,
+)
+
+with np.load(os.path.join(os.path.dirname(__file__), 'tables.npz')) as _f:
+    _tables = dict(_f)
+
+dims = int(_tables['dims'])
+grades = _tables['grades']
+adjoint_signs = np.power(-1, grades*(grades-1)//2).astype(np.int8)
+scalar_index = list(grades).index(0)
+
+
+@numba.njit(cache=True)
+def adjoint_func(value):
+    return adjoint_signs * value  # elementwise multiplication
+
+
+@numba.njit(cache=True)
+def inv_func(value):
+    intermed = _numba_val_get_left_gmt_matrix(value, gmt_k_list, gmt_l_list, gmt_m_list, gmt_data, dims)
+    if abs(np.linalg.det(intermed)) < _eps:
+        raise ValueError("multivector has no left-inverse")
+    identity = np.zeros(dims, dtype=intermed.dtype)
+    identity[scalar_index] = 1
+    sol = np.linalg.solve(intermed, identity)
+    return sol
+'''
+
+_KERNEL_PRODUCT_TEMPLATE = '''
+
+# numba can only cache functions referencing contiguous global arrays
+{name}_k_list, {name}_l_list, {name}_m_list = np.ascontiguousarray(_tables['{name}_coords'])
+{name}_data = _tables['{name}_data']
+
+
+@numba.generated_jit(nopython=True, cache=True)
+def {name}_func(value, other_value, out=None):
+    # this casting will be done at jit-time
+    ret_dtype = _get_mult_function_result_type(value, other_value, {name}_data.dtype)
+    mult_table_vals_t = {name}_data.astype(ret_dtype)
+
+    if _out_is_omitted(out):
+        def mult_inner(value, other_value, out=None):
+            output = np.zeros(dims, dtype=ret_dtype)
+            _numba_mult_runtime_sparse_into(
+                value, other_value, {name}_k_list, {name}_l_list, {name}_m_list, mult_table_vals_t, output)
+            return output
+    else:
+        def mult_inner(value, other_value, out=None):
+            out[:] = 0
+            _numba_mult_runtime_sparse_into(
+                value, other_value, {name}_k_list, {name}_l_list, {name}_m_list, mult_table_vals_t, out)
+            return out
+    return mult_inner
+'''
+
+_KERNEL_PRODUCTS = ('gmt', 'imt', 'omt', 'lcmt')
+
+_KERNEL_MODULE_SOURCE = _KERNEL_MODULE_HEADER + ''.join(
+    _KERNEL_PRODUCT_TEMPLATE.format(name=name) for name in _KERNEL_PRODUCTS
+)
+
+
+# The private helpers of clifford used by the generated module, including
+# those they call in turn. numba only checks the file it is caching functions
+# for, so changes to these must change the cache key.
+_KERNEL_HELPERS = (
+    '_get_mult_function_result_type',
+    '_get_matrix_result_type',
+    '_out_is_omitted',
+    '_numba_mult_runtime_sparse_into',
+    '_numba_val_get_left_gmt_matrix',
+    '_numba_val_get_left_gmt_matrix_into',
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _kernel_helpers_source() -> str:
+    # imported here, as this module is imported by clifford itself
+    import clifford
+    parts = [repr(clifford._eps)]
+    for name in _KERNEL_HELPERS:
+        func = getattr(clifford, name)
+        func = getattr(func, 'py_func', func)
+        try:
+            parts.append(inspect.getsource(func))
+        except (OSError, TypeError):
+            # the source is not available, so fall back on the bytecode
+            parts.append(func.__code__.co_code.hex())
+    return '\n'.join(parts)
+
+
+def layout_cache_key(sig, bladeTupList, firstIdx) -> str:
+    """
+    Get the content-addressed key under which a layout is cached.
+
+    This changes whenever the clifford version, the generated code, or the
+    helpers of clifford it uses do.
+    """
+    h = hashlib.sha1()
+    h.update(repr((
+        [int(s) for s in sig],
+        [tuple(int(i) for i in b) for b in bladeTupList],
+        int(firstIdx),
+        __version__,
+    )).encode())
+    h.update(_KERNEL_MODULE_SOURCE.encode())
+    h.update(_kernel_helpers_source().encode())
+    return h.hexdigest()
+
+
+def _atomic_write(path, write):
+    """ Write a file via a temporary file, so readers never see it half-done """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
     try:
-        if len(os.listdir(tmp_dir))>0:
-            cache_exists=True # cache exists
-        else:
-            pass # cache dir is empty
-    except(FileNotFoundError):
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _remove_entry(key: str) -> None:
+    """ Remove a damaged cache entry, so that it is built again """
+    shutil.rmtree(os.path.join(_cache_dir, key), ignore_errors=True)
+
+
+def load_layout_tables(key: str) -> Optional[Dict[str, sparse.COO]]:
+    """
+    Load the tables stored by :func:`save_layout_tables`, or None if there
+    are none. A damaged entry is removed, so that it can be written again.
+    """
+    if _cache_dir is None:
+        return None
+    path = os.path.join(_cache_dir, key, 'tables.npz')
+    try:
+        with np.load(path) as f:
+            dims = int(f['dims'])
+            return {
+                name[:-len('_coords')]: sparse.COO(
+                    coords=f[name], data=f[name[:-len('_coords')] + '_data'],
+                    shape=(dims, dims, dims)
+                )
+                for name in f.files
+                if name.endswith('_coords')
+            }
+    except FileNotFoundError:
+        return None
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        _remove_entry(key)
+        return None
+
+
+def save_layout_tables(key: str, grades, tables: Dict[str, sparse.COO]) -> bool:
+    """
+    Store the multiplication tables of a layout, along with the module
+    defining its product functions.
+
+    Returns False if the cache is disabled or could not be written to.
+    """
+    if _cache_dir is None:
+        return False
+    key_dir = os.path.join(_cache_dir, key)
+    arrays = dict(dims=len(grades), grades=np.asarray(grades))
+    for name, table in tables.items():
+        arrays[name + '_coords'] = table.coords
+        arrays[name + '_data'] = table.data
+    try:
+        os.makedirs(key_dir, exist_ok=True)
+        _atomic_write(os.path.join(key_dir, 'tables.npz'), lambda f: np.savez(f, **arrays))
+        _atomic_write(os.path.join(key_dir, 'kernels.py'), lambda f: f.write(_KERNEL_MODULE_SOURCE.encode()))
+    except OSError:
+        return False
+    return True
+
+
+def load_layout_kernels(key: str):
+    """
+    Import the module of product functions written by
+    :func:`save_layout_tables`, or return None if there is none.
+
+    A damaged entry is removed, so that it can be written again.
+    """
+    if _cache_dir is None:
+        return None
+    module_name = '_clifford_layout_kernels_' + key
+    try:
+        return sys.modules[module_name]
+    except KeyError:
+        pass
+    path = os.path.join(_cache_dir, key, 'kernels.py')
+    if not os.path.exists(path):
+        return None
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile, SyntaxError, ImportError):
+        _remove_entry(key)
+        return None
+    sys.modules[module_name] = module
+    return module
+
+
+def _generated_module_name(source: str, name: str) -> str:
+    h = hashlib.sha1()
+    h.update(__version__.encode())
+    h.update(source.encode())
+    return '_clifford_{}_{}'.format(name, h.hexdigest())
+
+
+def load_generated_module(generate_source: Callable[[bool], str], name: str = 'generated') -> types.ModuleType:
+    """
+    Import a module from generated source code.
+
+    If the cache is enabled, the source is written to a file named after its
+    hash, so that numba is able to cache any functions it defines. Otherwise,
+    the module is only created in memory.
+
+    Parameters
+    ----------
+    generate_source : Callable[[bool], str]
+        Called with whether the source will be written to a file, and so
+        whether its functions can be cached by numba, and returns the source.
+    name : str
+        A name to include in the module name, to help with debugging.
+    """
+    if _cache_dir is not None:
+        source = generate_source(True)
+        module_name = _generated_module_name(source, name)
         try:
-            os.mkdir(tmp_dir)
-        except(FileExistsError):
+            return sys.modules[module_name]
+        except KeyError:
+            pass
+        gen_dir = os.path.join(_cache_dir, 'generated')
+        path = os.path.join(gen_dir, module_name + '.py')
+        try:
+            if not os.path.exists(path):
+                os.makedirs(gen_dir, exist_ok=True)
+                _atomic_write(path, lambda f: f.write(source.encode()))
+        except OSError:
             pass
-    
-    if cache_exists is False:
-        if sigs is None:
-            layouts = generate_all_layout_combos() 
         else:
-            layouts = sigs_2_layouts(sigs)
-        write_layouts(layouts)
-
-    # submods should be attached as requested, or all at once. 
-    layouts = read_layouts()
-    submods = generate_layout_submodules(layouts)
+            spec = importlib.util.spec_from_file_location(module_name, path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            sys.modules[module_name] = module
+            return module
 
-    # attach all algebra instances to clifford ,
-    clif_mod.__dict__.update(submods)
+    source = generate_source(False)
+    module_name = _generated_module_name(source, name)
+    try:
+        return sys.modules[module_name]
+    except KeyError:
+        pass
+    module = types.ModuleType(module_name)
+    exec(compile(source, '<{}>'.format(module_name), 'exec'), module.__dict__)
+    sys.modules[module_name] = module
+    return module
@@ -48,6 +48,100 @@ def generate_mult_function_batch_compile(mt, product_name, cuda=False):
     return total_string
 
 
+def generate_mult_function_unrolled(mt, product_name, cache=False):
+    """
+    Takes a given product and generates the code for a single CPU function
+    ``product_name(value, other_value, output)`` that evaluates it.
+
+    Unlike :func:`generate_mult_function_batch_compile`, every output is
+    computed in the one function, as numba compiles this much faster than
+    a separate function per output.
+    """
+    k_list, l_list, m_list = mt.coords
+    mult_table_vals = mt.data
+    n_dims = mt.shape[1]
+
+    terms = [[] for l in range(n_dims)]
+    for k, l, m, mtv in zip(k_list, l_list, m_list, mult_table_vals):
+        term = 'a' + str(k) + '*b' + str(m)
+        # most coefficients are +1 or -1, which we fold into the sum
+        if mtv == 1:
+            terms[l].append(' + ' + term)
+        elif mtv == -1:
+            terms[l].append(' - ' + term)
+        else:
+            terms[l].append(' + ' + str(mtv) + '*' + term)
+
+    if cache:
+        f_string = '@njit(cache=True)\n'
+    else:
+        f_string = '@njit\n'
+    f_string += 'def ' + product_name + '(value, other_value, output):\n'
+    # load every coefficient once, rather than once per term. The table need
+    # not be square, as for the tables restricted to a few grades.
+    for i in range(mt.shape[0]):
+        f_string += '    a{i} = value[{i}]\n'.format(i=i)
+    for i in range(mt.shape[2]):
+        f_string += '    b{i} = other_value[{i}]\n'.format(i=i)
+    for l, l_terms in enumerate(terms):
+        if l_terms:
+            expr = ''.join(l_terms)
+            # tidy up the sign of the first term
+            expr = expr[3:] if expr.startswith(' + ') else '-' + expr[3:]
+            f_string += '    output[' + str(l) + '] = ' + expr + '\n'
+    return f_string
+
+
+_UNROLLED_PRODUCT_TEMPLATE = '''
+@numba.generated_jit(nopython=True, cache={cache})
+def {product_name}(value, other_value, out=None):
+    # this casting will be done at jit-time
+    ret_dtype = _get_mult_function_result_type(value, other_value, np.dtype(np.{dtype}))
+
+    if _out_is_omitted(out):
+        def mult_inner(value, other_value, out=None):
+            output = np.zeros({n_dims}, dtype=ret_dtype)
+            {product_name}_into(value, other_value, output)
+            return output
+    else:
+        def mult_inner(value, other_value, out=None):
+            # not every output is written if the table has empty rows
+            out[:] = 0
+            {product_name}_into(value, other_value, out)
+            return out
+    return mult_inner
+'''
+
+
+def generate_unrolled_module(mts, cache=False):
+    """
+    Generates the source of a module of unrolled CPU product functions
+
+    Parameters
+    ----------
+    mts : Dict[str, sparse.COO]
+        The multiplication tables, keyed by the name of the function that
+        should implement each one. Each function takes two coefficient arrays
+        and returns their product, like those from
+        :func:`clifford.get_mult_function`.
+    cache : bool
+        Whether numba should cache the compiled functions. This requires the
+        source to be imported from a file.
+    """
+    total_string = (
+        'import numpy as np\n'
+        'import numba\n'
+        'from numba import njit\n\n'
+        'from clifford import _get_mult_function_result_type, _out_is_omitted\n\n\n'
+    )
+    for product_name, mt in mts.items():
+        total_string += generate_mult_function_unrolled(mt, product_name + '_into', cache=cache) + '\n\n'
+        total_string += _UNROLLED_PRODUCT_TEMPLATE.format(
+            product_name=product_name, n_dims=mt.shape[1], dtype=mt.dtype.name, cache=cache
+        ) + '\n\n'
+    return total_string
+
+
 def write_mult_function_batch_compile(mt, product_name, file_obj, cuda=False):
     """
     Takes a given product and generates the code for a function that evaluates it, saves this to file
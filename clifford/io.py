@@ -1,43 +1,140 @@
+"""
+.. currentmodule:: clifford.io
+
+========================================
+io (:mod:`clifford.io`)
+========================================
+
+Reading and writing arrays of multivector coefficients, along with the
+metric and basis names of their algebra.
+
+``.ga`` files are HDF5 files. Since format version 0.0.2, the coefficients
+are stored in a chunked dataset which can grow, so that :class:`GAFileWriter`
+can append to them one frame at a time, and :class:`GAFile` can read any
+slice of them without loading the rest. Files of version 0.0.1 can still be
+read.
+
+Sparse files store only the coefficients of a fixed set of blades, called the
+support, which is saved once in the file. For arrays of objects of a single
+grade, such as lines in CGA, this makes files several times smaller.
+:func:`write_ga_file` chooses this automatically.
+
+Uncompressed files which are not sparse can be memory mapped, so that many
+processes can share one copy of a large file, see :meth:`GAFile.memmap`.
+
+``.json`` files store the same information as json, so that they can be read
+in web browsers. Since format version 0.0.2, the coefficients are stored as
+little-endian binary, either base64 encoded within the json or in a separate
+file, which is far faster to read and write than json lists of numbers.
+
+The coefficients of ``.ga`` files can be compressed with gzip, lzf, or, if
+:mod:`hdf5plugin` is installed, blosc, optionally after shuffling the bytes
+of the coefficients, which can make floating point data more compressible.
+Files compressed with gzip are compressed and decompressed in many threads
+at once, one chunk per thread.
+
+.. autosummary::
+    :toctree: generated/
+
+    write_ga_file
+    read_ga_file
+    iter_ga_file
+    GAFileWriter
+    GAFile
+    write_json_file
+    read_json_file
+"""
+import base64
+import json
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 import h5py
 import numpy as np
-import json
+
+try:
+    import hdf5plugin
+    hdf5plugin_available = True
+except ImportError:
+    hdf5plugin_available = False
+
+
+_JSON_ENCODINGS = ('base64', 'buffer', 'list')
 
 
 def write_json_file(file_name, mv_array, metric, basis_names, compression=True,
-                    transpose=False, sparse=False, support=None, compression_opts=1):
+                    transpose=False, sparse=False, support=None, compression_opts=1,
+                    encoding='base64'):
     """
-    Writes a json ga file of format version 0.0.1
+    Writes a json ga file
+
+    The metric, basis names and layout of the coefficients are always stored
+    as json, so can be read by any json parser. The coefficients themselves
+    are stored according to `encoding`:
+
+    ``'base64'``
+        format version 0.0.2, as base64 encoded little-endian binary within
+        the json
+    ``'buffer'``
+        format version 0.0.2, as raw little-endian binary in a side-car file
+        named ``file_name + '.bin'``, which is referred to by the json
+    ``'list'``
+        format version 0.0.1, as nested json lists of numbers, which is far
+        larger and slower to read and write
+
+    In format version 0.0.2, sparse files store only the coefficients of the
+    blades in `support`, as in :func:`write_ga_file`. If `sparse` is True but
+    `support` is not given, the support is the blades which are nonzero in
+    any frame. `compression` and `compression_opts` are ignored.
     """
+    if encoding not in _JSON_ENCODINGS:
+        raise ValueError("encoding must be one of {}, not {!r}".format(_JSON_ENCODINGS, encoding))
+    mv_array = np.asarray(mv_array)
     data_dict = {}
 
     # Record the version number
-    data_dict['version'] = '0.0.1'
+    data_dict['version'] = '0.0.1' if encoding == 'list' else '0.0.2'
 
     # First lets deal with the multivector coefficient data itself
     dset_data = {}
-    if transpose:
-        dset_data['data'] = mv_array.T.tolist()
-        dset_data['transpose'] = True
-    else:
-        dset_data['data'] = mv_array.tolist()
-        dset_data['transpose'] = False
-
     if sparse:
         dset_data['sparse'] = True
-        if support is not None:
-            dset_data['support'] = support.tolist()
-        else:
-            raise ValueError('You must specify the support of the multivectors '
-                             'if you explicitly specify sparse storage')
+        if support is None:
+            if encoding == 'list':
+                raise ValueError('You must specify the support of the multivectors '
+                                 'if you explicitly specify sparse storage')
+            support = np.flatnonzero(np.any(mv_array != 0, axis=0))
+        dset_data['support'] = np.asarray(support).tolist()
+        if encoding != 'list':
+            mv_array = mv_array[:, dset_data['support']]
     else:
         dset_data['sparse'] = False
         dset_data['support'] = []
 
+    dset_data['transpose'] = bool(transpose)
+    if transpose:
+        mv_array = mv_array.T
+
+    if encoding == 'list':
+        dset_data['data'] = mv_array.tolist()
+    else:
+        mv_array = np.ascontiguousarray(mv_array, dtype=mv_array.dtype.newbyteorder('<'))
+        dset_data['dtype'] = mv_array.dtype.str
+        dset_data['shape'] = list(mv_array.shape)
+        dset_data['encoding'] = encoding
+        if encoding == 'base64':
+            dset_data['data'] = base64.b64encode(mv_array.data).decode('ascii')
+        else:
+            buffer_name = file_name + '.bin'
+            # stored relative to the json file, so that the pair can be moved
+            dset_data['data'] = os.path.basename(buffer_name)
+            mv_array.tofile(buffer_name)
+
     data_dict['dataset'] = dset_data
 
     # Now save the metric
-    data_dict["metric"] = metric.tolist()
+    data_dict["metric"] = np.asarray(metric).tolist()
 
     # Now the basis names
     data_dict["basis_names"] = [str(s) for s in basis_names]
@@ -48,89 +145,637 @@ def write_json_file(file_name, mv_array, metric, basis_names, compression=True,
 
 def read_json_file(file_name):
     """
-    Reads a json ga file of format version 0.0.1
+    Reads a json ga file of format version 0.0.1 or 0.0.2
+
+    See :func:`read_ga_file` for a description of the return values.
     """
     with open(file_name, "r") as fp:
         f = json.load(fp)
-        assert f['version'] == '0.0.1'
-        data = f['dataset']
-        transpose = data['transpose']
+    metric = np.array(f['metric'])
+    basis_names = np.array(f['basis_names'][:])
+    data = f['dataset']
+    sparse = data['sparse']
+    if sparse:
+        support = data['support']
+    else:
+        support = None
+
+    if f['version'] == '0.0.1':
+        data_array = np.array(data['data'])
+        if data['transpose']:
+            data_array = data_array.T
+        return data_array, metric, basis_names, support
+    elif f['version'] != '0.0.2':
+        raise ValueError('Unknown json ga file format version {}'.format(f['version']))
+
+    dtype = np.dtype(data['dtype'])
+    if data['encoding'] == 'base64':
+        # a bytearray, so that the result is writeable
+        buffer = bytearray(base64.b64decode(data['data']))
+        data_array = np.frombuffer(buffer, dtype=dtype)
+    elif data['encoding'] == 'buffer':
+        buffer_name = os.path.join(os.path.dirname(file_name), data['data'])
+        data_array = np.fromfile(buffer_name, dtype=dtype)
+    else:
+        raise ValueError('Unknown json ga file encoding {}'.format(data['encoding']))
+    data_array = data_array.reshape(data['shape'])
+    if data['transpose']:
+        data_array = data_array.T
+    if sparse:
+        stored = data_array
+        data_array = np.zeros((len(stored), 2**len(metric)), dtype=dtype)
+        data_array[:, support] = stored
+    return data_array, metric, basis_names, support
+
+
+_GA_FILE_VERSIONS = ('0.0.1', '0.0.2')
+
+# the size of a chunk of coefficients chosen by default, which is in the
+# range recommended by the HDF5 documentation
+_DEFAULT_CHUNK_BYTES = 256 * 1024
+
+
+def _default_chunk_rows(n_dims, dtype):
+    return max(1, _DEFAULT_CHUNK_BYTES // (n_dims * np.dtype(dtype).itemsize))
+
+
+def _support_mask(support, n_dims):
+    """ Validate the support of a sparse file, and convert it to a mask over the blades """
+    if support is None:
+        raise ValueError('You must specify the support of the multivectors '
+                         'if you explicitly specify sparse storage')
+    support = np.unique(np.asarray(support, dtype=np.uint64))
+    if len(support) == 0 or support[-1] >= n_dims:
+        raise ValueError('The support must contain blade indices below {}'.format(n_dims))
+    mask = np.zeros(n_dims, dtype=bool)
+    mask[support] = True
+    return mask
+
+
+def _write_ga_metadata(f, dset_data, transpose, support_mask, metric, basis_names):
+    """ Write everything but the coefficients to a new ga file """
+    # Record the version number
+    f.attrs['version'] = '0.0.2'
+
+    dset_data.attrs['transpose'] = transpose
+    if support_mask is not None:
+        dset_data.attrs['sparse'] = True
+        dset_support = f.create_dataset("support", data=np.flatnonzero(support_mask).astype(np.uint64))
+    else:
+        dset_data.attrs['sparse'] = False
+        dset_support = f.create_dataset("support", data=np.array([], dtype=np.uint64))
+
+    # Now save the metric
+    dset_metric = f.create_dataset("metric", data=metric)
+
+    # Now the basis names
+    dset_basis_names = f.create_dataset("basis_names", data=basis_names)
+
+
+# the compressors of blosc, which are used as ``compression='blosc:<name>'``
+_BLOSC_COMPRESSORS = ('blosclz', 'lz4', 'lz4hc', 'snappy', 'zlib', 'zstd')
+
+
+def _compression_kwargs(compression, compression_opts, shuffle):
+    """ The arguments of :meth:`h5py.Group.create_dataset` which select a compressor """
+    if not compression:
+        return {}
+    if not isinstance(compression, str) or compression == 'gzip':
+        return dict(compression='gzip', compression_opts=compression_opts, shuffle=shuffle)
+    if compression == 'lzf':
+        return dict(compression='lzf', shuffle=shuffle)
+    if compression.partition(':')[0] == 'blosc':
+        cname = compression.partition(':')[2] or 'lz4'
+        if cname not in _BLOSC_COMPRESSORS:
+            raise ValueError('Unknown blosc compressor {!r}, expected one of {}'.format(
+                cname, _BLOSC_COMPRESSORS))
+        if not hdf5plugin_available:
+            raise ImportError('blosc compression requires the hdf5plugin package')
+        # blosc shuffles the bytes itself, faster than the HDF5 filter
+        Blosc = hdf5plugin.Blosc
+        return dict(Blosc(cname=cname, clevel=compression_opts,
+                          shuffle=Blosc.SHUFFLE if shuffle else Blosc.NOSHUFFLE))
+    raise ValueError(
+        "compression must be a bool, 'gzip', 'lzf' or 'blosc[:<compressor>]', "
+        "not {!r}".format(compression))
+
+
+def _n_threads(threads):
+    if threads is None:
+        return os.cpu_count() or 1
+    if threads < 1:
+        raise ValueError('threads must be at least 1, not {}'.format(threads))
+    return threads
+
+
+def _deflate_filters(dset):
+    """
+    Whether the chunks of `dset` are compressed only by deflate, perhaps
+    after the shuffle filter, so that :mod:`zlib` can compress and decompress
+    them outside HDF5, and so in parallel
+
+    Returns ``(level, shuffle)``, or None for any other filters.
+    """
+    if dset.chunks is None:
+        return None
+    plist = dset.id.get_create_plist()
+    filters = [plist.get_filter(i) for i in range(plist.get_nfilters())]
+    codes = tuple(code for code, flags, values, name in filters)
+    if codes == (h5py.h5z.FILTER_DEFLATE,):
+        return filters[-1][2][0], False
+    if codes == (h5py.h5z.FILTER_SHUFFLE, h5py.h5z.FILTER_DEFLATE):
+        return filters[-1][2][0], True
+    return None
+
+
+# reading chunks directly requires HDF5 1.10.2
+_read_direct_chunk_available = hasattr(h5py.h5d.DatasetID, 'read_direct_chunk')
+
+
+def _compress_chunk(chunk, level, shuffle):
+    """ Compress a whole chunk exactly as the HDF5 shuffle and deflate filters would """
+    data = np.ascontiguousarray(chunk).reshape(-1)
+    if shuffle:
+        # all the first bytes of each coefficient, then all the second bytes, ...
+        data = data.view(np.uint8).reshape(-1, data.itemsize).T
+    return zlib.compress(data.tobytes(), level)
+
+
+def _decompress_chunk(buf, dtype, shape, shuffle):
+    """ The inverse of :func:`_compress_chunk` """
+    data = np.frombuffer(zlib.decompress(buf), dtype=np.uint8)
+    if shuffle:
+        data = data.reshape(dtype.itemsize, -1).T.copy()
+    return data.view(dtype).reshape(shape)
+
+
+class GAFileWriter(object):
+    """
+    Writes a ga file of format version 0.0.2 incrementally, as a context
+    manager
+
+    Frames of coefficients are appended to the end of the file with
+    :meth:`append`, so that arrays too large to fit in memory can be written
+    as they are produced. With ``mode='a'``, an existing file of version
+    0.0.2 is appended to instead.
+
+    Parameters
+    ----------
+    file_name : str
+        the file to write to
+    metric : array_like (n, n)
+        the metric of the algebra, of which the coefficients have
+        ``gaDims = 2**n`` entries
+    basis_names : array_like (n,)
+        the names of the basis vectors
+    dtype : numpy.dtype
+        the type of the coefficients
+    compression : bool or str
+        how to compress the coefficients. True is the same as ``'gzip'``.
+        ``'lzf'`` is faster but compresses less. ``'blosc'`` and
+        ``'blosc:<compressor>'``, such as ``'blosc:zstd'``, require
+        :mod:`hdf5plugin`, both to write and to read the file.
+    compression_opts : int
+        the level of gzip or blosc compression, from 0 to 9
+    shuffle : bool
+        whether to shuffle the bytes of the coefficients before compressing
+        them, grouping the exponents of floating point numbers together. This
+        improves compression when the coefficients have similar magnitudes,
+        but is worth measuring on your own data.
+    threads : int
+        the number of threads which compress chunks of gzip compressed files,
+        defaulting to the number of processors. Other compressors are run by
+        HDF5 in a single thread, except blosc, which uses the number of
+        threads in the ``BLOSC_NTHREADS`` environment variable.
+    transpose : bool
+        whether to store the coefficients as a ``(gaDims, n_frames)`` dataset
+    sparse : bool
+        whether to store only the coefficients of the blades in `support`
+    support : array_like of int
+        the indices of the blades to store, which must be given if `sparse`
+        is True. Appending frames with other nonzero coefficients is an
+        error.
+    chunk_rows : int
+        the number of frames in each chunk of the file. Chunks are the units
+        in which the file is compressed and read. Defaults to around 256KiB
+        of coefficients.
+    mode : {'w', 'a'}
+        whether to create a new file, or to append to an existing one, in
+        which case only `file_name`, `metric` and `threads` are used
+
+    Examples
+    --------
+    >>> with GAFileWriter("frames.ga", layout.metric, layout.basis_names) as writer:
+    ...     for frame in frames:
+    ...         writer.append(frame.value)
+    """
+    def __init__(self, file_name, metric, basis_names, dtype=np.float64,
+                 compression=True, compression_opts=1, transpose=False,
+                 sparse=False, support=None, chunk_rows=None, mode='w',
+                 shuffle=False, threads=None):
+        metric = np.asarray(metric)
+        self.n_dims = 2**len(metric)
+        self._threads = _n_threads(threads)
+        if mode == 'a':
+            self._file = h5py.File(file_name, 'r+')
+            try:
+                if self._file.attrs['version'] != '0.0.2':
+                    raise ValueError(
+                        'Can only append to ga files of format version 0.0.2, '
+                        'not {}'.format(self._file.attrs['version']))
+                if not np.array_equal(self._file['metric'][:], metric):
+                    raise ValueError('The metric of the ga file does not match')
+                self._data = self._file['data']
+                if self._data.chunks is None:
+                    raise ValueError(
+                        'Cannot append to a ga file stored contiguously, see write_ga_file')
+                self.transpose = bool(self._data.attrs['transpose'])
+                if self._data.attrs['sparse']:
+                    self._support_mask = np.zeros(self.n_dims, dtype=bool)
+                    self._support_mask[self._file['support'][:]] = True
+                else:
+                    self._support_mask = None
+            except Exception:
+                self._file.close()
+                raise
+            self._deflate = _deflate_filters(self._data)
+            return
+        elif mode != 'w':
+            raise ValueError("mode must be 'w' or 'a', not {!r}".format(mode))
+
+        if sparse:
+            self._support_mask = _support_mask(support, self.n_dims)
+            n_stored = np.count_nonzero(self._support_mask)
+        else:
+            self._support_mask = None
+            n_stored = self.n_dims
+
+        if chunk_rows is None:
+            chunk_rows = _default_chunk_rows(n_stored, dtype)
+        self.transpose = transpose
         if transpose:
-            data_array = np.array(data['data']).T
+            shape, maxshape, chunks = (n_stored, 0), (n_stored, None), (n_stored, chunk_rows)
         else:
-            data_array = np.array(data['data'])
-        sparse = data['sparse']
-        if sparse:
-            support = data['support']
+            shape, maxshape, chunks = (0, n_stored), (None, n_stored), (chunk_rows, n_stored)
+        compression_kwargs = _compression_kwargs(compression, compression_opts, shuffle)
+
+        self._file = f = h5py.File(file_name, "w")
+        self._data = f.create_dataset(
+            "data", shape=shape, maxshape=maxshape, chunks=chunks, dtype=dtype,
+            **compression_kwargs)
+        self._deflate = _deflate_filters(self._data)
+        _write_ga_metadata(f, self._data, transpose, self._support_mask, metric, basis_names)
+
+    def __len__(self):
+        """ The number of frames written so far """
+        return self._data.shape[1 if self.transpose else 0]
+
+    def append(self, value):
+        """
+        Append a ``(n_frames, gaDims)`` array of coefficients, or a single
+        frame of shape ``(gaDims,)``
+        """
+        value = np.asarray(value)
+        if value.ndim == 1:
+            value = value[np.newaxis]
+        if value.ndim != 2 or value.shape[1] != self.n_dims:
+            raise ValueError(
+                "coefficients must have shape (n, {}), not {}".format(self.n_dims, value.shape))
+        if self._support_mask is not None:
+            if np.any(value[:, ~self._support_mask]):
+                raise ValueError("coefficients of blades outside the support of a sparse file must be zero")
+            value = value[:, self._support_mask]
+        start = len(self)
+        stop = start + len(value)
+        axis = 1 if self.transpose else 0
+        self._data.resize(stop, axis=axis)
+
+        # whole chunks are compressed in parallel, and partial ones by HDF5
+        chunk_rows = self._data.chunks[axis]
+        first = -(-start // chunk_rows) * chunk_rows
+        last = stop // chunk_rows * chunk_rows
+        if self._threads > 1 and self._deflate is not None and first < last:
+            self._write_frames(start, value[:first - start])
+            self._write_chunks(first, value[first - start:last - start])
+            self._write_frames(last, value[last - start:])
         else:
-            support = None
-        metric = np.array(f['metric'])
-        basis_names = np.array(f['basis_names'][:])
-    return data_array, metric, basis_names, support
+            self._write_frames(start, value)
 
+    def _write_frames(self, start, value):
+        if len(value) == 0:
+            return
+        if self.transpose:
+            self._data[:, start:start + len(value)] = value.T
+        else:
+            self._data[start:start + len(value)] = value
 
-def write_ga_file(file_name, mv_array, metric, basis_names, compression=True,
-                  transpose=False, sparse=False, support=None, compression_opts=1):
-    """
-    Writes a ga file of format version 0.0.1
+    def _write_chunks(self, start, value):
+        """ Compress and write whole chunks of frames, the first starting at frame `start` """
+        chunk_rows = self._data.chunks[1 if self.transpose else 0]
+        dtype = self._data.dtype
+        level, shuffle = self._deflate
+
+        def compress(i):
+            chunk = np.asarray(value[i:i + chunk_rows], dtype=dtype)
+            return _compress_chunk(chunk.T if self.transpose else chunk, level, shuffle)
+
+        offsets = range(0, len(value), chunk_rows)
+        with ThreadPoolExecutor(self._threads) as pool:
+            for i, buf in zip(offsets, pool.map(compress, offsets)):
+                chunk_offset = (0, start + i) if self.transpose else (start + i, 0)
+                self._data.id.write_direct_chunk(chunk_offset, buf)
+
+    def flush(self):
+        """ Write any buffered frames to disk """
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GAFile(object):
     """
-    with h5py.File(file_name, "w") as f:
-        # Record the version number
-        f.attrs['version'] = '0.0.1'
+    A read-only view of a ga file, which reads coefficients from disk only
+    when they are indexed
 
-        # First lets deal with the multivector coefficient data itself
-        if compression:
-            if transpose:
-                dset_data = f.create_dataset("data", data=mv_array.T, compression="gzip",
-                                             compression_opts=compression_opts)
-                dset_data.attrs['transpose'] = True
+    This can be used as a context manager, which closes the file on exit.
+
+    Indexing with ``f[key]`` selects frames in the same way as indexing the
+    full ``(n_frames, gaDims)`` array of coefficients, and returns a numpy
+    array. Only the chunks of the file containing the selected frames are
+    read. :meth:`iter_blocks` reads the whole file one block at a time.
+
+    Attributes
+    ----------
+    metric : numpy.ndarray
+    basis_names : numpy.ndarray
+    support : numpy.ndarray or None
+        see :func:`read_ga_file`
+    n_dims : int
+        the number of coefficients of each frame, ``gaDims``
+    version : str
+        the format version of the file
+
+    Parameters
+    ----------
+    file_name : str
+    threads : int
+        the number of threads which decompress chunks of gzip compressed
+        files, defaulting to the number of processors
+
+    Examples
+    --------
+    >>> with GAFile("frames.ga") as f:
+    ...     last_frames = f[-10:]
+    ...     total = sum(block.sum(axis=0) for block in f.iter_blocks())
+    """
+    def __init__(self, file_name, threads=None):
+        self._threads = _n_threads(threads)
+        self._file = f = h5py.File(file_name, "r")
+        try:
+            self.version = f.attrs['version']
+            if self.version not in _GA_FILE_VERSIONS:
+                raise ValueError('Unknown ga file format version {}'.format(self.version))
+            self._data = data = f['data']
+            self.transpose = bool(data.attrs['transpose'])
+            self.metric = f['metric'][:]
+            self.basis_names = f['basis_names'][:]
+            if data.attrs['sparse']:
+                self.support = f['support'][:]
+                self.n_dims = 2**len(self.metric)
             else:
-                dset_data = f.create_dataset("data", data=mv_array, compression="gzip",
-                                             compression_opts=compression_opts)
-                dset_data.attrs['transpose'] = False
+                self.support = None
+                self.n_dims = data.shape[0 if self.transpose else 1]
+            self._deflate = _deflate_filters(data)
+        except Exception:
+            f.close()
+            raise
+
+    @property
+    def shape(self):
+        """ The shape of the coefficients, ``(n_frames, gaDims)`` """
+        return (self._data.shape[1 if self.transpose else 0], self.n_dims)
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _read_chunks(self, start, stop):
+        """
+        Read frames `start` to `stop` by decompressing the chunks containing
+        them in parallel, or return None if HDF5 must read them instead
+        """
+        axis = 1 if self.transpose else 0
+        chunk_rows = self._data.chunks[axis]
+        offsets = range(start // chunk_rows * chunk_rows, stop, chunk_rows)
+        bufs = []
+        for i in offsets:
+            try:
+                filter_mask, buf = self._data.id.read_direct_chunk((0, i) if self.transpose else (i, 0))
+            except OSError:
+                # the chunk has not been written
+                return None
+            if filter_mask:
+                # some filters were skipped when this chunk was written
+                return None
+            bufs.append(buf)
+
+        level, shuffle = self._deflate
+        out = np.empty((stop - start, self._data.shape[1 - axis]), dtype=self.dtype)
+
+        def decompress(i, buf):
+            chunk = _decompress_chunk(buf, self.dtype, self._data.chunks, shuffle)
+            if self.transpose:
+                chunk = chunk.T
+            lo, hi = max(i, start), min(i + chunk_rows, stop)
+            out[lo - start:hi - start] = chunk[lo - i:hi - i]
+
+        with ThreadPoolExecutor(self._threads) as pool:
+            # consume the results to raise any exceptions
+            list(pool.map(decompress, offsets, bufs))
+        return out
+
+    def _read_frames(self, key):
+        """ Read the frames selected by `key`, including every blade """
+        stored = None
+        if (isinstance(key, slice) and self._threads > 1 and self._deflate is not None and
+                _read_direct_chunk_available):
+            start, stop, step = key.indices(len(self))
+            if step == 1 and start < stop:
+                stored = self._read_chunks(start, stop)
+        if stored is None:
+            stored = self._data[:, key].T if self.transpose else self._data[key]
+        if self.support is None:
+            return stored
+        value = np.zeros(stored.shape[:-1] + (self.n_dims,), dtype=stored.dtype)
+        value[..., self.support] = stored
+        return value
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            return self._read_frames(key)
+        frames_key, *blades_key = key
+        if len(blades_key) > 1:
+            raise IndexError("too many indices")
+        frames = self._read_frames(frames_key)
+        if blades_key:
+            frames = frames[..., blades_key[0]]
+        return frames
+
+    def __array__(self, dtype=None):
+        return np.asarray(self[:], dtype=dtype)
+
+    def memmap(self):
+        """
+        The ``(n_frames, gaDims)`` coefficients as a read-only
+        :class:`numpy.memmap`, without reading them into memory
+
+        This is only possible for files which are stored contiguously and are
+        not sparse, as written by ``write_ga_file(..., compression=False,
+        sparse=False)``. Many processes mapping the same file share its
+        pages in memory. The result remains valid after the file is closed.
+        """
+        if self.support is not None:
+            raise ValueError('Sparse ga files cannot be memory mapped')
+        if self._data.chunks is not None:
+            raise ValueError('Only ga files stored contiguously can be memory mapped, see write_ga_file')
+        offset = self._data.id.get_offset()
+        shape = self._data.shape
+        if offset is None or 0 in shape:
+            # no space has been allocated in the file
+            value = np.zeros(shape, dtype=self.dtype)
+            value.flags.writeable = False
         else:
-            if transpose:
-                dset_data = f.create_dataset("data", data=mv_array.T)
-                dset_data.attrs['transpose'] = True
-            else:
-                dset_data = f.create_dataset("data", data=mv_array)
-                dset_data.attrs['transpose'] = False
+            value = np.memmap(self._file.filename, mode='r', dtype=self.dtype, shape=shape, offset=offset)
+        return value.T if self.transpose else value
 
-        if sparse:
-            dset_data.attrs['sparse'] = True
-            if support is not None:
-                dset_support = f.create_dataset("support", support)
+    def iter_blocks(self, block_size=None):
+        """
+        Iterate over ``(block_size, gaDims)`` arrays of consecutive frames
+
+        `block_size` defaults to the number of frames in each chunk of the
+        file. The last block may be shorter.
+        """
+        if block_size is None:
+            chunks = self._data.chunks
+            if chunks is None:
+                block_size = _default_chunk_rows(self.n_dims, self.dtype)
             else:
-                raise ValueError('You must specify the support of the multivectors '
-                                 'if you explicitly specify sparse storage')
-        else:
-            dset_data.attrs['sparse'] = False
-            dset_support = f.create_dataset("support", data=np.array([], dtype=np.uint64))
+                block_size = chunks[1 if self.transpose else 0]
+        for start in range(0, len(self), block_size):
+            yield self[start:start + block_size]
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
 
-        # Now save the metric
-        dset_metric = f.create_dataset("metric", data=metric)
+def write_ga_file(file_name, mv_array, metric, basis_names, compression=True,
+                  transpose=False, sparse=None, support=None, compression_opts=1,
+                  chunk_rows=None, shuffle=False, threads=None):
+    """
+    Writes a ga file of format version 0.0.2
 
-        # Now the basis names
-        dset_basis_names = f.create_dataset("basis_names", data=basis_names)
+    More frames can be appended to the file later with ``GAFileWriter(...,
+    mode='a')``. See :class:`GAFileWriter` for a description of the
+    arguments.
 
+    If `sparse` is None, the file is sparse if some blades are zero in every
+    frame, such as when the frames are all of one grade. If `sparse` is True
+    but `support` is not given, the support is the blades which are nonzero
+    in any frame.
 
-def read_ga_file(file_name):
+    If `compression` is False and `chunk_rows` is not given, the coefficients
+    are stored contiguously, so that they can be memory mapped by
+    ``read_ga_file(..., mmap=True)``, but the file cannot be appended to.
+    Since sparse files cannot be memory mapped, such files are only sparse if
+    `sparse` is True.
+    Otherwise `chunk_rows` defaults to that of :class:`GAFileWriter`, or to
+    the number of frames if there are fewer, so that small files are not
+    padded to a whole chunk.
     """
-    Reads a ga file of format version 0.0.1
+    mv_array = np.asarray(mv_array)
+    contiguous = chunk_rows is None and not compression
+    if sparse is None and contiguous:
+        sparse = False
+    if sparse is None or (sparse and support is None):
+        nonzero = np.flatnonzero(np.any(mv_array != 0, axis=0))
+        if sparse is None:
+            sparse = 0 < len(nonzero) < mv_array.shape[-1]
+        if support is None:
+            support = nonzero
+    if contiguous:
+        n_dims = 2**len(metric)
+        support_mask = _support_mask(support, n_dims) if sparse else None
+        if mv_array.shape[1:] != (n_dims,):
+            raise ValueError(
+                "coefficients must have shape (n, {}), not {}".format(n_dims, mv_array.shape))
+        if support_mask is not None:
+            if np.any(mv_array[:, ~support_mask]):
+                raise ValueError("coefficients of blades outside the support of a sparse file must be zero")
+            mv_array = mv_array[:, support_mask]
+        with h5py.File(file_name, "w") as f:
+            dset_data = f.create_dataset("data", data=mv_array.T if transpose else mv_array)
+            _write_ga_metadata(f, dset_data, transpose, support_mask, metric, basis_names)
+        return
+    if chunk_rows is None:
+        n_stored = len(support) if sparse else mv_array.shape[-1]
+        chunk_rows = min(_default_chunk_rows(n_stored, mv_array.dtype), max(1, len(mv_array)))
+    with GAFileWriter(file_name, metric, basis_names, dtype=mv_array.dtype,
+                      compression=compression, compression_opts=compression_opts,
+                      transpose=transpose, sparse=sparse, support=support,
+                      chunk_rows=chunk_rows, shuffle=shuffle, threads=threads) as writer:
+        writer.append(mv_array)
+
+
+def read_ga_file(file_name, mmap=False, threads=None):
     """
-    with h5py.File(file_name, "r") as f:
-        assert f.attrs['version'] == '0.0.1'
-        data = f['data']
-        transpose = data.attrs['transpose']
-        if transpose:
-            data_array = data[:].T
-        else:
-            data_array = data[:]
-        sparse = data.attrs['sparse']
-        if sparse:
-            support = data.attrs['support']
-        else:
-            support = None
-        metric = f['metric'][:]
-        basis_names = f['basis_names'][:]
-    return data_array, metric, basis_names, support
+    Reads a ga file of format version 0.0.1 or 0.0.2
+
+    If `mmap` is True, the coefficients are a read-only :class:`numpy.memmap`
+    of the file rather than a copy in memory, see :meth:`GAFile.memmap`.
+    `threads` is the number of threads which decompress the file, see
+    :class:`GAFile`.
+
+    Returns
+    -------
+    data_array : numpy.ndarray
+        the ``(n_frames, gaDims)`` coefficients
+    metric : numpy.ndarray
+    basis_names : numpy.ndarray
+    support : numpy.ndarray or None
+        the indices of the blades which are stored, if the file is sparse.
+        The coefficients of the other blades are zero.
+
+    See Also
+    --------
+    GAFile, iter_ga_file : to read parts of a file without loading all of it
+    """
+    with GAFile(file_name, threads=threads) as f:
+        data_array = f.memmap() if mmap else f[:]
+        return data_array, f.metric, f.basis_names, f.support
+
+
+def iter_ga_file(file_name, block_size=None, threads=None):
+    """
+    Iterate over ``(block_size, gaDims)`` arrays of consecutive frames in a
+    ga file, without loading the whole file into memory
+
+    See :meth:`GAFile.iter_blocks`.
+    """
+    with GAFile(file_name, threads=threads) as f:
+        yield from f.iter_blocks(block_size)
@@ -0,0 +1,29 @@
+import os
+import shutil
+import tempfile
+
+from clifford import caching
+
+_old_cache_dir = None
+_old_env_cache_dir = None
+_session_cache_dir = None
+
+
+def pytest_configure(config):
+    """ Keep the on-disk layout cache of the test session away from the user's """
+    global _old_cache_dir, _old_env_cache_dir, _session_cache_dir
+    _session_cache_dir = tempfile.mkdtemp(prefix='clifford-test-cache-')
+    _old_cache_dir = caching.get_cache_dir()
+    _old_env_cache_dir = os.environ.get('CLIFFORD_CACHE_DIR')
+    # the environment variable covers any subprocesses the tests start
+    os.environ['CLIFFORD_CACHE_DIR'] = _session_cache_dir
+    caching.set_cache_dir(_session_cache_dir)
+
+
+def pytest_unconfigure(config):
+    caching.set_cache_dir(_old_cache_dir)
+    if _old_env_cache_dir is None:
+        os.environ.pop('CLIFFORD_CACHE_DIR', None)
+    else:
+        os.environ['CLIFFORD_CACHE_DIR'] = _old_env_cache_dir
+    shutil.rmtree(_session_cache_dir, ignore_errors=True)
@@ -1,10 +1,15 @@
 import itertools
+import os
+import subprocess
+import sys
+import textwrap
 import time
 
 import numpy as np
 import pytest
 
-from clifford import Cl, conformalize
+import clifford
+from clifford import Cl, conformalize, caching
 
 
 class TestInitialisation:
@@ -44,3 +49,188 @@ class TestInitialisation:
                 # Check they are the same
                 np.testing.assert_almost_equal(result_sparse, result_dense)
                 print(j+i*len(grades_possibilities), len(grades_possibilities)**2)
+
+    def test_lazy(self):
+        layout, blades = Cl(3)
+        lazy = [
+            'gmt', 'imt', 'omt', 'lcmt', 'gmt_func', 'imt_func', 'omt_func',
+            'lcmt_func', 'inv_func', 'adjoint_func', 'right_complement_func',
+            'dual_func', 'vee_func',
+        ]
+        for name in lazy:
+            assert name not in vars(layout)
+
+        # only the geometric product is built
+        e1, e2 = blades['e1'], blades['e2']
+        assert (e1 * e2).value[layout.bladeTupList.index((1, 2))] == 1
+        assert 'gmt_func' in vars(layout)
+        for name in ['imt_func', 'omt_func', 'lcmt_func', 'inv_func', 'vee_func', 'dual_func']:
+            assert name not in vars(layout)
+
+        # the result is computed only once
+        assert layout.gmt_func is layout.gmt_func
+
+    def test_lazy_override(self):
+        layout, blades = Cl(3)
+
+        def gmt_func(a, b):
+            return np.zeros_like(a)
+        layout.gmt_func = gmt_func
+        assert layout.gmt_func is gmt_func
+        assert (blades['e1'] * blades['e1']) == 0
+
+
+class TestPredefinedImport:
+    # generous, since this is mostly here to catch algebras being built at
+    # import time again, which takes several seconds
+    budget = 2.0
+
+    def _time_import(self, module, cache_dir, check_lazy=True):
+        # includes `import clifford`, as that is part of what users wait for
+        code = textwrap.dedent("""
+            import time
+            start = time.perf_counter()
+            import clifford
+            import {module} as m
+            print(time.perf_counter() - start)
+            if {check_lazy}:
+                for name, value in vars(m).items():
+                    if isinstance(value, clifford.Layout):
+                        for attr in ['gmt', 'gmt_func', 'omt_func', 'imt_func']:
+                            assert attr not in vars(value), (name, attr)
+        """).format(module=module, check_lazy=check_lazy)
+        env = dict(os.environ, CLIFFORD_CACHE_DIR=cache_dir)
+        out = subprocess.check_output(
+            [sys.executable, '-c', code], env=env,
+            cwd=os.path.dirname(os.path.dirname(clifford.__file__))
+        )
+        return float(out)
+
+    @pytest.mark.parametrize('module', [
+        'clifford.g2', 'clifford.g2c', 'clifford.g3', 'clifford.g3_1',
+        'clifford.g3c', 'clifford.g4', 'clifford.gac', 'clifford.pga',
+        'clifford.sta',
+    ])
+    def test_import(self, module):
+        # disable the cache, so that we measure a fresh process
+        assert self._time_import(module, cache_dir='') < self.budget
+
+    def test_import_tools_g3c(self, tmpdir):
+        # The jitted functions of this module refer to the products of g3c as
+        # globals, so it has to build the multiplication tables on import.
+        # What keeps this fast is the on-disk cache of those tables, so we
+        # measure the import once the first process has filled it.
+        module = 'clifford.tools.g3c'
+        self._time_import(module, cache_dir=str(tmpdir), check_lazy=False)
+        assert self._time_import(module, cache_dir=str(tmpdir), check_lazy=False) < self.budget
+
+
+class TestCaching:
+
+    @pytest.fixture
+    def cache_dir(self, tmpdir):
+        old_cache_dir = caching.get_cache_dir()
+        caching.set_cache_dir(str(tmpdir))
+        try:
+            yield str(tmpdir)
+        finally:
+            caching.set_cache_dir(old_cache_dir)
+
+    def test_tables_are_cached(self, cache_dir):
+        layout, blades = Cl(3, 1)
+        layout.gmt
+        key = caching.layout_cache_key(layout.sig, layout.bladeTupList, layout.firstIdx)
+        assert os.path.exists(os.path.join(cache_dir, key, 'tables.npz'))
+        assert os.path.exists(os.path.join(cache_dir, key, 'kernels.py'))
+
+        tables = caching.load_layout_tables(key)
+        for name in ['gmt', 'imt', 'omt', 'lcmt']:
+            np.testing.assert_equal(tables[name].todense(), getattr(layout, name).todense())
+
+        # the second layout picks up the cached kernels
+        layout2, blades2 = Cl(3, 1)
+        assert layout2.gmt_func is layout.gmt_func
+
+    def test_cached_products_match(self, cache_dir):
+        layout, blades = Cl(3, 1)
+        layout.gmt_func
+        caching.set_cache_dir(None)
+        layout_uncached, blades_uncached = Cl(3, 1)
+        assert layout_uncached.gmt_func is not layout.gmt_func
+
+        for i in range(10):
+            a = layout.randomMV().value
+            b = layout.randomMV().value
+            for name in ['gmt_func', 'imt_func', 'omt_func', 'lcmt_func']:
+                np.testing.assert_almost_equal(
+                    getattr(layout, name)(a, b),
+                    getattr(layout_uncached, name)(a, b)
+                )
+            np.testing.assert_almost_equal(layout.adjoint_func(a), layout_uncached.adjoint_func(a))
+            np.testing.assert_almost_equal(layout.inv_func(a), layout_uncached.inv_func(a))
+
+    def test_disabled(self, cache_dir):
+        caching.set_cache_dir(None)
+        layout, blades = Cl(3, 1)
+        layout.gmt_func
+        assert os.listdir(cache_dir) == []
+
+    def test_unrolled_products_are_cached(self, cache_dir):
+        layout, blades = Cl(3, engine='unrolled')
+        layout.gmt_func
+        gen_dir = os.path.join(cache_dir, 'generated')
+        generated = [f for f in os.listdir(gen_dir) if f.endswith('.py')]
+        assert len(generated) == 1
+
+        # a second layout reuses the same module
+        layout2, blades2 = Cl(3, engine='unrolled')
+        assert layout2.gmt_func is layout.gmt_func
+        assert [f for f in os.listdir(gen_dir) if f.endswith('.py')] == generated
+
+    def test_unrolled_disabled(self, cache_dir):
+        caching.set_cache_dir(None)
+        layout, blades = Cl(3, engine='unrolled')
+        e1, e2 = blades['e1'], blades['e2']
+        assert e1 * e2 == blades['e12']
+        assert os.listdir(cache_dir) == []
+
+    def test_clear_cache(self, cache_dir):
+        layout, blades = Cl(3, 1)
+        layout.gmt
+        assert os.listdir(cache_dir) != []
+        caching.clear_cache()
+        assert not os.path.exists(cache_dir)
+
+    @pytest.mark.parametrize('name, damage', [
+        ('tables.npz', lambda data: data[:len(data) // 2]),
+        ('kernels.py', lambda data: data + b'\n)('),
+        ('kernels.py', lambda data: data.replace(b'_out_is_omitted', b'_no_such_helper')),
+    ], ids=['truncated tables', 'syntax error', 'import error'])
+    def test_damaged_entry_is_rebuilt(self, cache_dir, name, damage):
+        layout, blades = Cl(3, 1)
+        layout.gmt
+        path = os.path.join(cache_dir, layout._cache_key, name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(damage(data))
+        # as if from a new process
+        sys.modules.pop('_clifford_layout_kernels_' + layout._cache_key, None)
+
+        layout2, blades2 = Cl(3, 1)
+        np.testing.assert_equal(layout2.gmt.todense(), layout.gmt.todense())
+        assert layout2._kernels is not None
+        with open(path, 'rb') as f:
+            assert f.read() == data
+
+    def test_key_depends_on_helpers(self, monkeypatch):
+        args = ([1, 1], [(), (1,), (2,), (1, 2)], 1)
+        key = caching.layout_cache_key(*args)
+        monkeypatch.setattr(clifford, '_eps', 1e-6)
+        caching._kernel_helpers_source.cache_clear()
+        try:
+            assert caching.layout_cache_key(*args) != key
+        finally:
+            monkeypatch.undo()
+            caching._kernel_helpers_source.cache_clear()
+        assert caching.layout_cache_key(*args) == key
@@ -2,6 +2,7 @@ from functools import reduce
 import operator
 
 import pytest
+import numba
 import numpy as np
 import numpy.testing
 
@@ -445,6 +446,14 @@ class TestBasicAlgebra:
     def algebra(self, request):
         return request.param
 
+    def test_dual_is_exact(self, algebra):
+        layout = algebra[0]
+        # the dual of 1 is the inverse pseudoscalar, with entries of exactly +/-1
+        Iinv = layout.scalar.dual().value
+        np.testing.assert_equal(Iinv, np.rint(layout.pseudoScalar.inv().value))
+        assert np.count_nonzero(Iinv) == 1
+        assert abs(Iinv[-1]) == 1
+
     def test_grade_obj(self, algebra):
         layout = algebra[0]
         for i in range(len(layout.sig)+1):
@@ -468,6 +477,606 @@ class TestBasicAlgebra:
             res2 = layout.MultiVector(value=b_right@a.value)
             np.testing.assert_almost_equal(res.value, res2.value)
 
+    def test_versor_matrix(self, algebra):
+        layout = algebra[0]
+        versors = [layout.randomRotor(), layout.randomV(normed=True)]
+        for V in versors:
+            M = layout.get_versor_matrix(V)
+            xs = [layout.randomMV() for i in range(10)]
+            for x in xs:
+                np.testing.assert_almost_equal(M @ x.value, (V * x * ~V).value)
+            np.testing.assert_almost_equal(
+                np.array([x.value for x in xs]) @ M.T,
+                [(V * x * ~V).value for x in xs]
+            )
+
+            # grades are preserved
+            grades = np.array(layout.gradeList)
+            assert not np.any(M[grades[:, np.newaxis] != grades])
+
+        with pytest.raises(ValueError):
+            layout.get_versor_matrix(1 + layout.randomV())
+
+        # rounding errors in large versors are not mistaken for non-versors
+        V = 1e4 * layout.randomRotor()
+        x = layout.randomMV()
+        np.testing.assert_allclose(layout.get_versor_matrix(V) @ x.value, (V * x * ~V).value, atol=1e-4)
+
+    def test_versor_matrix_blade_order(self):
+        # blades whose indices are not in increasing order
+        layout = clifford.Layout([1, 1, 1], [(), (1,), (2,), (3,), (2, 1), (1, 3), (3, 2), (3, 2, 1)], firstIdx=1)
+        blades = layout.blades
+        V = 2 + blades['e21'] + 0.5*blades['e32']
+        M = layout.get_versor_matrix(V)
+        for name, blade in blades.items():
+            np.testing.assert_almost_equal(M @ blade.value, (V * blade * ~V).value)
+
+    @pytest.mark.parametrize('sig', [(3,), (4,), (3, 0, 1), (4, 1), (1, 3)], ids=str)
+    def test_exp_log(self, sig):
+        from scipy.linalg import expm
+        layout = Cl(*sig)[0]
+        for i in range(20):
+            B = layout.randomMV(grades=[2])
+            R = B.exp()
+            expected = expm(layout.get_left_gmt_matrix(B))[:, 0]
+            np.testing.assert_almost_equal(R.value, expected)
+
+            # the logarithm is only unique up to full turns
+            np.testing.assert_almost_equal(R.log().exp().value, R.value)
+
+        # translators and half turns
+        e1, e2, e3 = layout.basis_vectors_lst[-3:]
+        for B in [(e1 ^ e2) * np.pi / 2, (e1 ^ e2) * np.pi, 2 * (e1 ^ e2) + 3 * (e1 ^ e3)]:
+            np.testing.assert_almost_equal(B.exp().log().exp().value, B.exp().value)
+
+        with pytest.raises(ValueError):
+            layout.randomV().log()
+
+    def test_exp_log_batch(self, algebra):
+        layout = algebra[0]
+        B = clifford.DenseMVArray.from_mvarray(layout.randomMV(10, grades=[2]))
+        R = B.exp()
+        np.testing.assert_almost_equal(R.value, [Bi.exp().value for Bi in B])
+        np.testing.assert_almost_equal(R.log().exp().value, R.value)
+
+        # elements without a closed form fall back to the series
+        mixed = clifford.DenseMVArray.from_mvarray(layout.randomMV(3))
+        np.testing.assert_almost_equal(mixed.exp().value, [m.exp().value for m in mixed])
+
+        # rounding errors in the other grades are ignored by both
+        nearly = B + 1e-14 * layout.randomV()
+        np.testing.assert_equal(nearly.exp().value, [Bi.exp().value for Bi in nearly])
+
+    def test_exp_fallback(self):
+        # three orthogonal planes have no closed form
+        layout, blades = Cl(6)
+        B = blades['e12'] + 2*blades['e34'] + 3*blades['e56']
+        expected = (blades['e12'].exp() * (2*blades['e34']).exp() * (3*blades['e56']).exp())
+        np.testing.assert_almost_equal(B.exp().value, expected.value, 5)
+        with pytest.raises(ValueError):
+            B.exp().log()
+
+    @pytest.mark.parametrize('op, iop', [
+        (operator.add, operator.iadd),
+        (operator.sub, operator.isub),
+        (operator.mul, operator.imul),
+        (operator.xor, operator.ixor),
+        (operator.or_, operator.ior),
+        (operator.lshift, operator.ilshift),
+        (operator.truediv, operator.itruediv),
+    ])
+    def test_inplace_ops(self, algebra, op, iop):
+        layout = algebra[0]
+        a = layout.randomMV()
+        if op is operator.truediv:
+            b = layout.randomRotor()
+        else:
+            b = layout.randomMV()
+        for other in [b, 2.5]:
+            expected = op(a, other).value
+            a_copy = +a
+            value = a_copy.value
+            res = iop(a_copy, other)
+            assert res is a_copy
+            assert res.value is value
+            np.testing.assert_almost_equal(res.value, expected)
+
+        # with itself
+        a_copy = +a
+        np.testing.assert_almost_equal(iop(a_copy, a_copy).value, op(a, a).value)
+
+        # results which need a different dtype are not in place
+        a_int = layout.MultiVector(dtype=int)
+        res = iop(a_int, b)
+        assert res is not a_int
+        assert res.value.dtype == np.float64
+        if op is operator.truediv:
+            res = iop(a_int, 2)
+            assert res is not a_int
+            assert res.value.dtype == np.float64
+
+    @pytest.mark.parametrize('iop', [
+        operator.iadd, operator.isub, operator.imul, operator.ixor,
+        operator.ior, operator.ilshift, operator.itruediv,
+    ])
+    def test_inplace_ops_on_blades(self, algebra, iop):
+        layout, blades = algebra[:2]
+        e1 = blades['e1']
+        expected = +e1
+        for other in [blades['e2'], 2]:
+            x = e1
+            x = iop(x, other)
+            assert x is not e1
+            assert e1 == expected
+            assert layout.blades['e1'] == expected
+
+    def test_mvarray_reductions_do_not_modify(self, algebra):
+        layout = algebra[0]
+        arr = MVArray([layout.randomMV() for i in range(3)])
+        first = +arr[0]
+        arr.sum()
+        arr.gp()
+        assert arr[0] == first
+
+    @pytest.mark.parametrize('prod', ['gmt', 'imt', 'omt', 'lcmt'])
+    def test_product_out(self, algebra, prod):
+        layout = algebra[0]
+        func = getattr(layout, prod + '_func')
+        a = layout.randomMV().value
+        b = layout.randomMV().value
+        out = np.full(layout.gaDims, np.nan)
+        assert func(a, b, out) is out
+        np.testing.assert_almost_equal(out, func(a, b))
+        np.testing.assert_almost_equal(func(a, b, out=np.empty_like(a)), func(a, b))
+
+        # usable from other jitted functions without allocating
+        @numba.njit
+        def chained(a, b, tmp, out):
+            func(a, b, tmp)
+            return func(tmp, b, out)
+        tmp = np.empty_like(a)
+        np.testing.assert_almost_equal(chained(a, b, tmp, out), func(func(a, b), b))
+
+    @pytest.mark.parametrize('prod', ['gmt', 'imt', 'omt', 'lcmt'])
+    def test_batch_products(self, algebra, prod):
+        layout = algebra[0]
+        func = getattr(layout, prod + '_func')
+        batch_func = getattr(layout, prod + '_batch')
+        a = np.array([layout.randomMV().value for i in range(20)])
+        b = np.array([layout.randomMV().value for i in range(20)])
+        expected = np.array([func(ai, bi) for ai, bi in zip(a, b)])
+        np.testing.assert_almost_equal(batch_func(a, b), expected)
+
+        # the output may overlap the operands
+        for out_of in [lambda a, b: a, lambda a, b: b]:
+            a_copy, b_copy = a.copy(), b.copy()
+            out = out_of(a_copy, b_copy)
+            assert batch_func(a_copy, b_copy, out=out) is out
+            np.testing.assert_almost_equal(out, expected)
+        a_copy = a.copy()
+        np.testing.assert_almost_equal(
+            batch_func(a_copy[1:], a_copy[:-1], out=a_copy[:-1]),
+            np.array([func(ai, bi) for ai, bi in zip(a[1:], a[:-1])]))
+
+        # broadcasting against a single multivector
+        expected = np.array([func(ai, b[0]) for ai in a])
+        np.testing.assert_almost_equal(batch_func(a, b[0]), expected)
+        np.testing.assert_almost_equal(
+            batch_func(a.reshape(4, 5, -1), b[0]), expected.reshape(4, 5, -1))
+
+        # writing into an existing buffer
+        out = np.empty_like(a)
+        assert batch_func(a, b[0], out=out) is out
+        np.testing.assert_almost_equal(out, expected)
+
+    def test_batch_products_dtype(self, algebra):
+        layout = algebra[0]
+        a = np.array([layout.randomMV().value for i in range(5)], dtype=np.float32)
+        assert layout.gmt_batch(a, a).dtype == np.float32
+        assert layout.gmt_batch(a, a.astype(np.float64)).dtype == np.float64
+
+    def test_batch_dtype_argument(self, algebra):
+        layout = algebra[0]
+        a = np.array([layout.randomMV().value for i in range(5)])
+        for res in [
+            layout.gmt_batch(a, a, dtype=np.float32),
+            layout.inv_batch(a, dtype=np.float32),
+            layout.adjoint_batch(a, dtype=np.float32),
+            layout.normal_batch(a, dtype=np.float32),
+        ]:
+            assert res.dtype == np.float32
+        np.testing.assert_allclose(
+            layout.gmt_batch(a, a, dtype=np.float32), layout.gmt_batch(a, a), rtol=1e-5, atol=1e-5)
+
+    def test_inv_batch(self, algebra):
+        layout = algebra[0]
+        a = np.array([layout.randomMV().value for i in range(20)])
+        expected = np.array([layout.inv_func(ai) for ai in a])
+        np.testing.assert_almost_equal(layout.inv_batch(a), expected)
+        np.testing.assert_almost_equal(layout.inv_batch(a.reshape(4, 5, -1)), expected.reshape(4, 5, -1))
+        np.testing.assert_almost_equal(layout.inv_batch(a[0]), expected[0])
+
+        out = np.empty_like(a)
+        assert layout.inv_batch(a, out=out) is out
+        np.testing.assert_almost_equal(out, expected)
+        with pytest.raises(ValueError):
+            layout.inv_batch(a, out=out[1:])
+
+        assert layout.inv_batch(a.astype(np.float32)).dtype == np.float32
+        assert layout.inv_batch(np.eye(layout.gaDims, dtype=int)[:1]).dtype == np.float64
+
+    def test_inv_batch_tolerance(self, algebra):
+        layout = algebra[0]
+        a = np.array([layout.randomMV().value for i in range(5)])
+        # the singularity test is relative to the magnitude
+        np.testing.assert_allclose(layout.inv_batch(1e-7 * a), 1e7 * layout.inv_batch(a), rtol=1e-6)
+
+        # single precision versors are inverted by their reverse
+        R = layout.randomRotor().value.astype(np.float32)
+        adjoint = layout.adjoint_func(R)
+        value_adjoint = layout.gmt_func(R, adjoint)
+        out = np.empty_like(R)
+        eps = 1e3 * np.finfo(np.float32).eps
+        assert clifford._numba_versor_inv_into(adjoint, value_adjoint, layout.gradeList.index(0), eps, out)
+        np.testing.assert_allclose(layout.inv_batch(R), out)
+
+    @pytest.mark.parametrize('name, func', [
+        ('adjoint_batch', lambda mv: mv.adjoint().value),
+        ('gradeInvol_batch', lambda mv: mv.gradeInvol().value),
+        ('conjugate_batch', lambda mv: mv.conjugate().value),
+        ('mag2_batch', lambda mv: mv.mag2()),
+        ('abs_batch', lambda mv: abs(mv)),
+        ('normal_batch', lambda mv: mv.normal().value),
+    ])
+    def test_unary_batch(self, algebra, name, func):
+        layout = algebra[0]
+        batch_func = getattr(layout, name)
+        a = np.array([layout.randomMV().value for i in range(20)])
+        expected = np.array([func(layout.MultiVector(value=ai)) for ai in a])
+        np.testing.assert_almost_equal(batch_func(a), expected)
+        np.testing.assert_almost_equal(batch_func(a.reshape(4, 5, -1)), expected.reshape((4, 5) + expected.shape[1:]))
+        np.testing.assert_almost_equal(batch_func(a[0]), expected[0])
+
+        out = np.empty_like(expected)
+        assert batch_func(a, out=out) is out
+        np.testing.assert_almost_equal(out, expected)
+        with pytest.raises(ValueError):
+            batch_func(a, out=out[1:])
+
+        assert batch_func(a.astype(np.float32)).dtype == np.float32
+
+    def test_grade_projection_batch(self, algebra):
+        layout = algebra[0]
+        a = np.array([layout.randomMV().value for i in range(20)])
+        for grades in [1, (1,), (0, 2)]:
+            expected = np.array([layout.MultiVector(value=ai)(*np.atleast_1d(grades)).value for ai in a])
+            np.testing.assert_almost_equal(layout.grade_projection_batch(a, grades), expected)
+        with pytest.raises(ValueError):
+            layout.grade_projection_batch(a, layout.dims + 1)
+
+    def test_grade_projection_non_integer(self, algebra):
+        layout = algebra[0]
+        M = layout.randomMV()
+        # a cached mask for an equal integer must not be used
+        M(1)
+        with pytest.raises(ValueError):
+            M(1.0)
+        with pytest.raises(ValueError):
+            layout.grade_projection_batch(M.value[np.newaxis], (1.0,))
+        np.testing.assert_equal(M(np.int64(1)).value, M(1).value)
+
+    def test_involutions(self, algebra):
+        layout = algebra[0]
+        mv = layout.randomMV()
+        # the definitions these are computed from the tables of
+        np.testing.assert_almost_equal(mv.mag2(), layout.gmt_func(layout.adjoint_func(mv.value), mv.value)[0])
+        np.testing.assert_almost_equal(mv.conjugate().value, (~mv).gradeInvol().value)
+        np.testing.assert_almost_equal(mv.even.value, (0.5 * (mv + mv.gradeInvol())).value)
+        np.testing.assert_almost_equal(mv.odd.value, (0.5 * (mv - mv.gradeInvol())).value)
+        np.testing.assert_almost_equal(mv(0, 2).value, (mv(0) + mv(2)).value)
+
+    def test_reduce(self, algebra):
+        layout = algebra[0]
+        a = np.array([layout.randomMV().value for i in range(7)])
+        np.testing.assert_almost_equal(layout.sum_reduce(a), a.sum(axis=0))
+        np.testing.assert_almost_equal(layout.gmt_reduce(a), reduce(layout.gmt_func, a))
+
+        empty = np.zeros((0, layout.gaDims))
+        np.testing.assert_equal(layout.sum_reduce(empty), layout.MultiVector().value)
+        np.testing.assert_equal(layout.gmt_reduce(empty), layout.scalar.value)
+        with pytest.raises(ValueError):
+            layout.sum_reduce(a[0])
+
+    def test_batch_schedule(self, algebra):
+        layout = algebra[0]
+        a = np.array([layout.randomMV().value for i in range(20)])
+        expected = [layout.gmt_batch(a, a[::-1]), layout.inv_batch(a), layout.normal_batch(a)]
+        expected_sum = layout.sum_reduce(a)
+        old_chunk_size = clifford.batch_chunk_size()
+        try:
+            for chunk_size in [1, 3, 64]:
+                clifford.batch_chunk_size(chunk_size)
+                np.testing.assert_almost_equal(layout.gmt_batch(a, a[::-1]), expected[0])
+                np.testing.assert_almost_equal(layout.inv_batch(a), expected[1])
+                np.testing.assert_almost_equal(layout.normal_batch(a), expected[2])
+                np.testing.assert_almost_equal(layout.sum_reduce(a), expected_sum)
+                np.testing.assert_almost_equal(layout.gmt_reduce(a[:5]), reduce(layout.gmt_func, a[:5]))
+        finally:
+            clifford.batch_chunk_size(old_chunk_size)
+
+    def test_batch_products_bad_shape(self, algebra):
+        layout = algebra[0]
+        a = np.zeros((3, layout.gaDims))
+        with pytest.raises(ValueError):
+            layout.gmt_batch(a, np.zeros(layout.gaDims + 1))
+        with pytest.raises(ValueError):
+            layout.gmt_batch(a, a, out=np.zeros((4, layout.gaDims)))
+
+
+def test_batch_settings():
+    old_threads = clifford.batch_threads()
+    try:
+        # the reductions only depend on the chunk size
+        a = np.random.randn(1000, 8)
+        layout = Cl(3)[0]
+        expected = layout.sum_reduce(a)
+        for n in range(1, numba.config.NUMBA_NUM_THREADS + 1 if clifford.NUMBA_PARALLEL else 2):
+            assert clifford.batch_threads(n) == n
+            np.testing.assert_equal(layout.sum_reduce(a), expected)
+    finally:
+        clifford.batch_threads(old_threads)
+
+    with pytest.raises(ValueError):
+        clifford.batch_threads(0)
+    with pytest.raises(ValueError):
+        clifford.batch_threads(numba.config.NUMBA_NUM_THREADS + 1)
+    with pytest.raises(ValueError):
+        clifford.batch_chunk_size(0)
+
+
+class TestEngines:
+
+    @pytest.fixture(params=['bitmap', 'unrolled'])
+    def engine(self, request):
+        return request.param
+
+    @pytest.fixture(
+        params=[(3, 0, 0), (4, 1, 0), (3, 0, 1)],
+        ids=['Cl(3)', 'Cl(4, 1)', 'Cl(3, 0, 1)']
+    )
+    def algebras(self, request, engine):
+        layout, blades = Cl(*request.param)
+        layout_engine, blades_engine = Cl(*request.param, engine=engine)
+        return layout, layout_engine
+
+    @pytest.mark.parametrize('prod', ['gmt', 'imt', 'omt', 'lcmt'])
+    def test_products_match(self, algebras, prod):
+        layout, layout_engine = algebras
+        a = np.array([layout.randomMV().value for i in range(10)])
+        b = np.array([layout.randomMV().value for i in range(10)])
+        func = getattr(layout, prod + '_func')
+        func_engine = getattr(layout_engine, prod + '_func')
+        for ai, bi in zip(a, b):
+            np.testing.assert_almost_equal(func_engine(ai, bi), func(ai, bi))
+        np.testing.assert_almost_equal(
+            getattr(layout_engine, prod + '_batch')(a, b),
+            getattr(layout, prod + '_batch')(a, b)
+        )
+
+        out = np.empty_like(a[0])
+        assert func_engine(a[0], b[0], out) is out
+        np.testing.assert_almost_equal(out, func(a[0], b[0]))
+
+        if layout_engine.engine == 'bitmap':
+            # no tables were built
+            assert prod not in vars(layout_engine)
+
+    @pytest.mark.parametrize('prod', ['gmt', 'imt', 'omt', 'lcmt'])
+    def test_grade_restricted(self, algebras, prod):
+        layout, layout_engine = algebras
+        a = layout.randomMV().value
+        b = layout.randomMV().value
+        expected = getattr(layout, prod + '_func')(
+            layout.MultiVector(value=a)(1).value, layout.MultiVector(value=b)(1, 2).value)
+        np.testing.assert_almost_equal(
+            getattr(layout_engine, prod + '_func_generator')(grades_a=[1], grades_b=[1, 2])(a, b),
+            expected
+        )
+        np.testing.assert_almost_equal(
+            getattr(layout, prod + '_func_generator')(grades_a=[1], grades_b=[1, 2])(a, b),
+            expected
+        )
+
+    def test_inverse(self, algebras):
+        layout, layout_engine = algebras
+        if 0 in layout.sig:
+            pytest.skip("degenerate algebras have no pseudoscalar inverse")
+        a = layout.randomMV().value
+        np.testing.assert_almost_equal(layout_engine.inv_func(a), layout.inv_func(a))
+        a = np.array([layout.randomMV().value for i in range(5)])
+        np.testing.assert_almost_equal(layout_engine.inv_batch(a), layout.inv_batch(a))
+
+    def test_dtype(self, algebras):
+        layout, layout_engine = algebras
+        a = layout.randomMV().value.astype(np.float32)
+        assert layout_engine.gmt_func(a, a).dtype == np.float32
+        assert layout_engine.gmt_batch(a, a).dtype == np.float32
+
+    def test_conformalize_inherits_engine(self, engine):
+        layout, blades = Cl(3, engine=engine)
+        layout_c, blades_c, stuff = conformalize(layout)
+        assert layout_c.engine == engine
+
+    def test_large_algebra(self):
+        layout, blades = Cl(10, 2, engine='bitmap')
+
+        # blade names are ambiguous above 9 dimensions, so use tuples
+        def blade(*idxs):
+            mv = layout.MultiVector()
+            mv[idxs] = 1
+            return mv
+        e1, e2, e12 = blade(1), blade(2), blade(12)
+        assert e1 * e2 == blade(1, 2)
+        assert e1 * e1 == 1
+        assert e12 * e12 == -1
+        assert e2 * e12 * e1 == blade(1, 2, 12)
+        assert (e1 ^ e2 ^ e1) == 0
+
+    def test_bad_engine(self):
+        with pytest.raises(ValueError):
+            Cl(3, engine='abacus')
+
+
+class TestSinglePrecision:
+
+    @pytest.fixture(params=['tables', 'bitmap', 'unrolled'])
+    def engine(self, request):
+        return request.param
+
+    @pytest.fixture(
+        params=[(3, 0, 0), (4, 1, 0), (3, 0, 1)],
+        ids=['Cl(3)', 'Cl(4, 1)', 'Cl(3, 0, 1)']
+    )
+    def algebra(self, request, engine):
+        return Cl(*request.param, engine=engine, dtype=np.float32)
+
+    def test_no_upcast(self, algebra):
+        layout, blades = algebra
+        e1 = blades['e1']
+        a = layout.randomMV()
+        b = layout.randomMV()
+        B = layout.randomMV()(2)
+        R = layout.randomRotor()
+        results = [
+            a, layout.MultiVector(), layout.scalar, e1,
+            a * b, a ^ b, a | b, a << b, a + 1.0, 2.5 * a, a / 2.0, ~a, a(2),
+            a.normal(), a.leftLaInv(), a.inv(), a.dual(), a.vee(b),
+            B.exp(), R * e1 * ~R,
+        ]
+        if 0 not in layout.sig:
+            # random rotors of mixed signatures may have R*~R == -1, which
+            # have no logarithm
+            results += [R.normalInv(), (0.5 * B).exp().log()]
+        for res in results:
+            assert res.value.dtype == np.float32
+        assert isinstance(a.mag2(), np.float32)
+        assert isinstance(abs(a), np.float32)
+        assert layout.get_left_gmt_matrix(a).dtype == np.float32
+        assert layout.get_versor_matrix(R).dtype == np.float32
+
+    def test_matches_double(self, algebra):
+        layout, blades = algebra
+        a = layout.randomMV()
+        b = layout.randomMV()
+        a64 = a.astype(np.float64)
+        b64 = b.astype(np.float64)
+        np.testing.assert_allclose((a * b).value, (a64 * b64).value, rtol=1e-5, atol=1e-5)
+        np.testing.assert_allclose(a.inv().value, a64.inv().value, rtol=1e-3, atol=1e-3)
+
+    def test_conformalize_inherits_dtype(self, engine):
+        layout, blades = Cl(3, engine=engine, dtype=np.float32)
+        layout_c, blades_c, stuff = conformalize(layout)
+        assert layout_c.dtype == np.float32
+        assert stuff['up'](blades['e1']).value.dtype == np.float32
+
+
+class TestGradeDispatch:
+
+    @pytest.fixture(
+        params=[(3, 0, 0, 'tables'), (4, 1, 0, 'tables'), (3, 0, 1, 'tables'), (4, 1, 0, 'bitmap'),
+                (3, 0, 0, 'unrolled')],
+        ids=['Cl(3)', 'Cl(4, 1)', 'Cl(3, 0, 1)', 'Cl(4, 1) bitmap', 'Cl(3) unrolled']
+    )
+    def algebras(self, request):
+        p, q, r, engine = request.param
+        layout, blades = Cl(p, q, r)
+        layout_dispatch, blades_dispatch = Cl(p, q, r, engine=engine)
+        layout_dispatch.grade_dispatch = True
+        return layout, layout_dispatch
+
+    def test_default(self):
+        assert not Cl(3)[0].grade_dispatch
+        assert Cl(6)[0].grade_dispatch
+        assert not Cl(6, engine='bitmap')[0].grade_dispatch
+
+    @pytest.mark.parametrize('op', [operator.mul, operator.xor, operator.or_, operator.lshift])
+    @pytest.mark.parametrize('grades_a, grades_b', [
+        ((1,), (1,)),
+        ((0, 2), (1,)),
+        ((1, 3), (2,)),
+        (None, None),
+    ])
+    def test_products_match(self, algebras, op, grades_a, grades_b):
+        layout, layout_dispatch = algebras
+        a = layout.randomMV()
+        b = layout.randomMV()
+        if grades_a is not None:
+            a = a(*grades_a)
+            b = b(*grades_b)
+        expected = op(a, b).value
+        a = layout_dispatch.MultiVector(value=a.value)
+        b = layout_dispatch.MultiVector(value=b.value)
+        np.testing.assert_almost_equal(op(a, b).value, expected)
+        expected = op(layout.MultiVector(value=b.value), layout.MultiVector(value=a.value)).value
+        np.testing.assert_almost_equal(op(b, a).value, expected)
+
+    def test_zero(self, algebras):
+        layout, layout_dispatch = algebras
+        a = layout_dispatch.randomMV()
+        assert a * layout_dispatch.MultiVector() == 0
+        assert (a * layout_dispatch.MultiVector()).value.shape == (layout.gaDims,)
+
+    def test_dtype(self, algebras):
+        layout, layout_dispatch = algebras
+        a = layout_dispatch.MultiVector(value=np.ones(layout.gaDims, dtype=np.float32))
+        assert (a * a).value.dtype == np.float32
+        a = layout_dispatch.MultiVector(value=np.ones(layout.gaDims, dtype=int))
+        assert (a * a).value.dtype == int
+
+    def test_inplace(self, algebras):
+        layout, layout_dispatch = algebras
+        a = layout_dispatch.randomMV()(1)
+        b = layout_dispatch.randomMV()(2)
+        expected = (a * b).value
+        value = a.value
+        a *= b
+        assert a.value is value
+        np.testing.assert_almost_equal(a.value, expected)
+
+        out = np.full(layout.gaDims, np.nan)
+        assert layout_dispatch._product('gmt', b.value, b.value, out=out) is out
+        np.testing.assert_almost_equal(out, (b * b).value)
+
+    def test_cache(self):
+        layout, blades = Cl(3)
+        layout.grade_dispatch = True
+        layout.grade_kernel_cache_size = 2
+        e1, e2, e12 = blades['e1'], blades['e2'], blades['e12']
+        assert layout.grade_kernel_cache_info().currsize == 0
+
+        e1 * e2
+        e2 * e1
+        info = layout.grade_kernel_cache_info()
+        assert (info.hits, info.misses) == (1, 1)
+
+        # the cache is bounded
+        e1 * e12
+        e12 * e1
+        e12 * e12
+        info = layout.grade_kernel_cache_info()
+        assert info.maxsize == 2
+        assert info.currsize == 2
+        assert info.misses == 4
+
+        layout.grade_kernel_cache_clear()
+        assert layout.grade_kernel_cache_info().currsize == 0
+
+    def test_generators_are_cached(self):
+        layout, blades = Cl(3)
+        f = layout.omt_func_generator(grades_a=[1], grades_b=[2])
+        assert layout.omt_func_generator(grades_a=(1,), grades_b=[2, 2]) is f
+        assert layout.gmt_func_generator(grades_a=[1], grades_b=[2]) is not f
+
 
 class TestFrame:
 
@@ -0,0 +1,151 @@
+import operator
+
+import pytest
+import numpy as np
+
+from clifford import Cl, conformalize, DenseMVArray, MVArray, MultiVector
+
+
+@pytest.fixture(
+    params=[Cl(3), Cl(4), Cl(3, 0, 1), conformalize(Cl(3)[0])],
+    ids=['Cl(3)', 'Cl(4)', 'Cl(3, 0, 1)', 'conformal Cl(3)']
+)
+def algebra(request):
+    return request.param
+
+
+def random_array(layout, n=10, **kw):
+    return DenseMVArray.from_mvarray(layout.randomMV(n, **kw))
+
+
+class TestDenseMVArray:
+
+    def test_construction(self, algebra):
+        layout = algebra[0]
+        mvs = layout.randomMV(5)
+        arr = DenseMVArray.from_mvarray(mvs)
+        assert arr.shape == (5,)
+        assert len(arr) == 5
+        np.testing.assert_equal(arr.value, MVArray(mvs).value)
+        np.testing.assert_equal(arr.to_mvarray().value, arr.value)
+
+        with pytest.raises(ValueError):
+            DenseMVArray(layout, np.zeros((5, layout.gaDims + 1)))
+
+        empty = DenseMVArray.from_mvarray(MVArray([]), layout=layout)
+        assert empty.value.shape == (0, layout.gaDims)
+        with pytest.raises(ValueError):
+            DenseMVArray.from_mvarray([])
+
+    def test_indexing(self, algebra):
+        layout = algebra[0]
+        arr = random_array(layout)
+        assert isinstance(arr[0], MultiVector)
+        np.testing.assert_equal(arr[3].value, arr.value[3])
+
+        sub = arr[2:5]
+        assert isinstance(sub, DenseMVArray)
+        assert sub.shape == (3,)
+        assert np.shares_memory(sub.value, arr.value)
+
+        arr[1] = layout.scalar
+        np.testing.assert_equal(arr.value[1], layout.scalar.value)
+
+        with pytest.raises(IndexError):
+            arr[0, 0]
+
+    @pytest.mark.parametrize('op', [
+        operator.add,
+        operator.sub,
+        operator.mul,
+        operator.xor,
+        operator.or_,
+        operator.lshift,
+    ])
+    def test_binary_ops(self, algebra, op):
+        layout = algebra[0]
+        a = random_array(layout)
+        b = random_array(layout)
+        m = layout.randomMV()
+
+        expected = [op(ai, bi).value for ai, bi in zip(a, b)]
+        np.testing.assert_almost_equal(op(a, b).value, expected)
+
+        # broadcasting a single multivector, on either side
+        expected = [op(ai, m).value for ai in a]
+        np.testing.assert_almost_equal(op(a, m).value, expected)
+        expected = [op(m, ai).value for ai in a]
+        np.testing.assert_almost_equal(op(m, a).value, expected)
+
+        # scalars
+        expected = [op(ai, 2.0).value for ai in a]
+        np.testing.assert_almost_equal(op(a, 2.0).value, expected)
+        if op is not operator.lshift:
+            expected = [op(2.0, ai).value for ai in a]
+            np.testing.assert_almost_equal(op(2.0, a).value, expected)
+
+    def test_scalar_array(self, algebra):
+        layout = algebra[0]
+        a = random_array(layout)
+        weights = np.arange(len(a), dtype=float)
+        expected = [w * ai.value for w, ai in zip(weights, a)]
+        np.testing.assert_almost_equal((weights * a).value, expected)
+        np.testing.assert_almost_equal((a * weights).value, expected)
+        np.testing.assert_almost_equal((a / (weights + 1)).value,
+                                       [ai.value / (w + 1) for w, ai in zip(weights, a)])
+
+    def test_unary_ops(self, algebra):
+        layout = algebra[0]
+        a = random_array(layout)
+        np.testing.assert_almost_equal((~a).value, [(~ai).value for ai in a])
+        np.testing.assert_almost_equal((-a).value, [(-ai).value for ai in a])
+        np.testing.assert_almost_equal(a(1).value, [ai(1).value for ai in a])
+        np.testing.assert_almost_equal(a(0, 2).value, [ai(0, 2).value for ai in a])
+        np.testing.assert_almost_equal(a.gradeInvol().value, [ai.gradeInvol().value for ai in a])
+        np.testing.assert_almost_equal(a.conjugate().value, [ai.conjugate().value for ai in a])
+        np.testing.assert_almost_equal(a.dual().value, [ai.dual().value for ai in a])
+        np.testing.assert_almost_equal(a.mag2(), [ai.mag2() for ai in a])
+        np.testing.assert_almost_equal(abs(a), [abs(ai) for ai in a])
+
+    def test_inv(self, algebra):
+        layout = algebra[0]
+        a = random_array(layout)
+        np.testing.assert_almost_equal(a.inv().value, [ai.leftLaInv().value for ai in a])
+
+        # versors take a different path
+        rotors = DenseMVArray.from_mvarray([layout.randomRotor() for i in range(10)])
+        np.testing.assert_almost_equal(rotors.inv().value, [(~r / (r * ~r)[()]).value for r in rotors])
+
+        m = layout.randomMV()
+        np.testing.assert_almost_equal((a / m).value, [(ai / m).value for ai in a])
+        np.testing.assert_almost_equal((m / a).value, [(m / ai).value for ai in a])
+        np.testing.assert_almost_equal((a / a).value, [(ai / ai).value for ai in a])
+        np.testing.assert_almost_equal((1 / a).value, a.inv().value)
+
+        singular = a.copy()
+        singular[3] = 1 + next(v for v in layout.basis_vectors_lst if (v*v)[()] == 1)
+        with pytest.raises(ValueError):
+            singular.inv()
+
+    def test_normal(self, algebra):
+        layout = algebra[0]
+        a = random_array(layout, grades=[1])
+        np.testing.assert_almost_equal(a.normal().value, [ai.normal().value for ai in a])
+
+    def test_preserves_dtype(self, algebra):
+        layout = algebra[0]
+        a = random_array(layout).astype(np.float32)
+        assert (a * a).dtype == np.float32
+        assert (a + 1).dtype == np.float32
+        assert (~a).dtype == np.float32
+        assert a.dual().dtype == np.float32
+
+    def test_sum(self, algebra):
+        layout = algebra[0]
+        a = random_array(layout)
+        np.testing.assert_almost_equal(a.sum().value, a.to_mvarray().sum().value)
+
+    def test_gp(self, algebra):
+        layout = algebra[0]
+        a = random_array(layout, n=5)
+        np.testing.assert_almost_equal(a.gp().value, a.to_mvarray().gp().value)
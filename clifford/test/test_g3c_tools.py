@@ -191,20 +191,21 @@ class TestGeneralLogarithm:
 
 
 class TestVisualisation:
-    def test_draw_objects(self):
+    def test_draw_objects(self, tmpdir):
         scene = ConformalMVArray([random_line() for i in range(100)])
         sc_a = str(draw_objects(scene))
-        scene.save('test.ga')
-        sc_b = str(draw_objects('test.ga'))
+        file_name = str(tmpdir.join('test.ga'))
+        scene.save(file_name)
+        sc_b = str(draw_objects(file_name))
         assert sc_a == sc_b
 
-    def test_ganja_scene(self):
+    def test_ganja_scene(self, tmpdir):
         scene = ConformalMVArray([up(0)^up(e1)^einf, up(0)^up(e2)^einf, up(0)^up(e3)^einf]
                                  + [random_line() for i in range(2)])
 
         sc = GanjaScene()
         sc.add_objects(scene)
-        sc.save_to_file('test.json')
+        sc.save_to_file(str(tmpdir.join('test.json')))
 
 
 class TestConformalArray:
@@ -240,6 +241,11 @@ class TestConformalArray:
             for i, v in enumerate(rotated_array):
                 npt.assert_almost_equal(v.value, apply_rotor(up_array[i], R[0]).value)
 
+            # a single rotor
+            rotated_array = up_array.apply_rotor(R[0])
+            for i, v in enumerate(rotated_array):
+                npt.assert_almost_equal(v.value, apply_rotor(up_array[i], R[0]).value)
+
     def test_dual(self):
         mv = []
         for i in range(100):
@@ -311,6 +317,26 @@ class TestG3CTools:
             obj_list = [X1, X2]
             average_objects(obj_list, weights=[0.5, 0.5])
 
+    def test_single_precision_helpers(self):
+        x = random_euc_mv().value.astype(np.float32)
+        R = random_rotation_translation_rotor().value.astype(np.float32)
+        X = val_up(x)
+        T = val_generate_translation_rotor(x)
+        for res in [
+            X, val_down(X), val_homo(X), val_normalise_n_minus_1(X),
+            val_normalInv(R), val_normalised(R), T, val_apply_rotor(X, R),
+            project_val(X, 1), dual_func(X),
+        ]:
+            assert res.dtype == np.float32
+        # up and down square the coordinates, so the rounding errors of
+        # single precision scale with their magnitude
+        atol = 1e-2 * np.max(np.abs(x))
+        npt.assert_allclose(val_down(X), x, rtol=0, atol=atol)
+        npt.assert_allclose(val_down(val_apply_rotor(X, T)), 2 * x, rtol=0, atol=atol)
+
+        # double precision is kept too
+        assert val_up(x.astype(np.float64)).dtype == np.float64
+
     def test_point_beyond_plane(self):
         plane = I5 * ((e1 + e2 + e3).normal() + 2 * einf)
         P = up((e1 + e2 + e3) * 3)
@@ -0,0 +1,107 @@
+import operator
+
+import pytest
+import numpy as np
+
+from clifford import Cl, conformalize, GradedMultiVector, MultiVector
+
+
+@pytest.fixture(
+    params=[Cl(3), Cl(4), Cl(3, 0, 1), conformalize(Cl(3)[0]), Cl(3, engine='unrolled'), Cl(8, engine='bitmap')],
+    ids=['Cl(3)', 'Cl(4)', 'Cl(3, 0, 1)', 'conformal Cl(3)', 'Cl(3) unrolled', 'Cl(8) bitmap']
+)
+def algebra(request):
+    return request.param
+
+
+class TestGradedMultiVector:
+
+    def test_construction(self, algebra):
+        layout = algebra[0]
+        mv = layout.randomMV()(1, 2)
+        g = GradedMultiVector.from_multivector(mv)
+        assert g.grades == (1, 2)
+        assert len(g.value) == sum(1 for grade in layout.gradeList if grade in (1, 2))
+        np.testing.assert_equal(g.to_multivector().value, mv.value)
+
+        # discarding grades
+        g = GradedMultiVector.from_multivector(mv, grades=[2])
+        np.testing.assert_equal(g.to_multivector().value, mv(2).value)
+
+        with pytest.raises(ValueError):
+            GradedMultiVector(layout, [1], np.zeros(layout.gaDims))
+
+    @pytest.mark.parametrize('op', [
+        operator.add,
+        operator.sub,
+        operator.mul,
+        operator.xor,
+        operator.or_,
+        operator.lshift,
+    ])
+    @pytest.mark.parametrize('grades_a, grades_b', [
+        ([1], [1]),
+        ([1], [2]),
+        ([2], [0, 1]),
+        ([0, 2], [2]),
+    ])
+    def test_binary_ops(self, algebra, op, grades_a, grades_b):
+        layout = algebra[0]
+        a = layout.randomMV()(*grades_a)
+        b = layout.randomMV()(*grades_b)
+        ga = GradedMultiVector.from_multivector(a)
+        gb = GradedMultiVector.from_multivector(b)
+        expected = op(a, b).value
+
+        res = op(ga, gb)
+        assert isinstance(res, GradedMultiVector)
+        np.testing.assert_almost_equal(res.to_multivector().value, expected)
+
+        # mixed with dense multivectors, on either side
+        np.testing.assert_almost_equal(op(ga, b).to_multivector().value, expected)
+        np.testing.assert_almost_equal(op(a, gb).to_multivector().value, expected)
+
+        # scalars
+        np.testing.assert_almost_equal(op(ga, 2.0).to_multivector().value, op(a, 2.0).value)
+        if op is not operator.lshift:
+            np.testing.assert_almost_equal(op(2.0, gb).to_multivector().value, op(2.0, b).value)
+
+    def test_result_grades(self, algebra):
+        layout = algebra[0]
+        v = GradedMultiVector.from_multivector(layout.randomV())
+        assert (v * v).grades == (0, 2)
+        assert (v ^ v).grades == (2,)
+        assert (v | v).grades == (0,)
+        assert (v ^ (v ^ v)).grades == (3,)
+
+    def test_unary_ops(self, algebra):
+        layout = algebra[0]
+        mv = layout.randomMV()(0, 1, 2)
+        g = GradedMultiVector.from_multivector(mv)
+        np.testing.assert_almost_equal((~g).to_multivector().value, (~mv).value)
+        np.testing.assert_almost_equal((-g).to_multivector().value, (-mv).value)
+        np.testing.assert_almost_equal((g / 2).to_multivector().value, (mv / 2).value)
+        assert g(2).grades == (2,)
+        np.testing.assert_almost_equal(g(2).to_multivector().value, mv(2).value)
+        assert g(1, 5).grades == (1,)
+
+        g32 = GradedMultiVector.from_multivector(mv.astype(np.float32))
+        assert (~g32).value.dtype == np.float32
+
+    def test_equality(self, algebra):
+        layout = algebra[0]
+        mv = layout.randomMV()(1)
+        g = GradedMultiVector.from_multivector(mv)
+        assert g == mv
+        assert g == GradedMultiVector.from_multivector(mv, grades=[0, 1])
+        assert g != mv + 1
+
+    def test_kernels_are_cached(self, algebra):
+        layout = algebra[0]
+        v = GradedMultiVector.from_multivector(layout.randomV())
+        v * v
+        info = layout.grade_kernel_cache_info()
+        v * v
+        assert layout.grade_kernel_cache_info().misses == info.misses
+        assert layout.grade_kernel_cache_info().hits == info.hits + 1
+        assert isinstance((v * v).to_multivector(), MultiVector)
@@ -1,4 +1,9 @@
+import os
+import tempfile
 import unittest
+
+import h5py
+
 from clifford import *
 from clifford.g3c import *
 from clifford.tools.g3c import *
@@ -13,10 +18,19 @@ class TestParseMultivector(unittest.TestCase):
         np.testing.assert_almost_equal(A.value, B.value, 3)
 
 
-class TestHDF5BasicIO(unittest.TestCase):
+class _TempDirTestCase(unittest.TestCase):
+    """ A test case which writes its files to a fresh temporary directory """
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = tmpdir.name
+
+
+class TestHDF5BasicIO(_TempDirTestCase):
 
     def test_write_and_read(self):
-        file_name = "test.ga"
+        file_name = os.path.join(self.tmpdir, "test.ga")
 
         basis_names = np.array(list(sorted(layout.basis_vectors.keys())), dtype=bytes)
 
@@ -31,7 +45,7 @@ class TestHDF5BasicIO(unittest.TestCase):
         np.testing.assert_equal(basis_names, basis_names_2)
 
     def test_write_and_read_array(self):
-        file_name = "test.ga"
+        file_name = os.path.join(self.tmpdir, "test.ga")
 
         mv_array = MVArray([random_point_pair() for i in range(1000)])
         mv_array.save(file_name, compression=True, transpose=False, sparse=False, support=False)
@@ -41,10 +55,266 @@ class TestHDF5BasicIO(unittest.TestCase):
         np.testing.assert_equal(loaded_array.value, mv_array.value)
 
 
-class TestJSONBasicIO(unittest.TestCase):
+class TestHDF5StreamingIO(_TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.basis_names = np.array(list(sorted(layout.basis_vectors.keys())), dtype=bytes)
+        self.mv_array = ConformalMVArray([random_point_pair() for i in range(1000)]).value
+
+    def test_append(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        for transpose in [False, True]:
+            write_ga_file(file_name, self.mv_array[:100], layout.metric, self.basis_names,
+                          transpose=transpose, chunk_rows=64)
+            with GAFileWriter(file_name, layout.metric, self.basis_names, mode='a') as writer:
+                writer.append(self.mv_array[100:-1])
+                writer.append(self.mv_array[-1])
+                self.assertEqual(len(writer), len(self.mv_array))
+
+            data_array, metric_2, basis_names_2, support = read_ga_file(file_name)
+            np.testing.assert_equal(data_array, self.mv_array)
+            np.testing.assert_equal(layout.metric, metric_2)
+            np.testing.assert_equal(self.basis_names, basis_names_2)
+
+    def test_writer(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        with GAFileWriter(file_name, layout.metric, self.basis_names, compression=False) as writer:
+            for frame in self.mv_array:
+                writer.append(frame)
+        data_array, metric_2, basis_names_2, support = read_ga_file(file_name)
+        np.testing.assert_equal(data_array, self.mv_array)
+
+        with self.assertRaises(ValueError):
+            GAFileWriter(file_name, np.eye(3), self.basis_names, mode='a')
+
+    def test_lazy_read(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        for transpose in [False, True]:
+            write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names,
+                          transpose=transpose, chunk_rows=64)
+            with GAFile(file_name) as f:
+                self.assertEqual(f.shape, self.mv_array.shape)
+                self.assertEqual(len(f), len(self.mv_array))
+                np.testing.assert_equal(f[10], self.mv_array[10])
+                np.testing.assert_equal(f[-10:], self.mv_array[-10:])
+                np.testing.assert_equal(f[5:20, 1:4], self.mv_array[5:20, 1:4])
+                np.testing.assert_equal(np.asarray(f), self.mv_array)
+
+                blocks = list(f.iter_blocks())
+                self.assertEqual(len(blocks[0]), 64)
+                np.testing.assert_equal(np.concatenate(blocks), self.mv_array)
+
+            blocks = list(iter_ga_file(file_name, block_size=300))
+            self.assertEqual([len(b) for b in blocks], [300, 300, 300, 100])
+            np.testing.assert_equal(np.concatenate(blocks), self.mv_array)
+
+    def test_read_version_0_0_1(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        with h5py.File(file_name, "w") as f:
+            f.attrs['version'] = '0.0.1'
+            dset_data = f.create_dataset("data", data=self.mv_array.T)
+            dset_data.attrs['transpose'] = True
+            dset_data.attrs['sparse'] = False
+            f.create_dataset("support", data=np.array([], dtype=np.uint64))
+            f.create_dataset("metric", data=layout.metric)
+            f.create_dataset("basis_names", data=self.basis_names)
+
+        data_array, metric_2, basis_names_2, support = read_ga_file(file_name)
+        np.testing.assert_equal(data_array, self.mv_array)
+        with GAFile(file_name) as f:
+            np.testing.assert_equal(np.concatenate(list(f.iter_blocks(100))), self.mv_array)
+        with self.assertRaises(ValueError):
+            GAFileWriter(file_name, layout.metric, self.basis_names, mode='a')
+
+
+class TestHDF5SparseIO(_TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.basis_names = np.array(list(sorted(layout.basis_vectors.keys())), dtype=bytes)
+        self.mv_array = ConformalMVArray([random_line() for i in range(1000)]).value
+
+    def test_auto_sparse(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        for transpose in [False, True]:
+            # contiguous files are only sparse on request, see TestHDF5MemoryMap
+            write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names,
+                          compression=False, transpose=transpose, chunk_rows=len(self.mv_array))
+            data_array, metric_2, basis_names_2, support = read_ga_file(file_name)
+            np.testing.assert_equal(data_array, self.mv_array)
+            # lines are all grade 3
+            assert set(layout.gradeList[i] for i in support) == {3}
+            with GAFile(file_name) as f:
+                self.assertEqual(f.shape, self.mv_array.shape)
+                np.testing.assert_equal(f[3:7, 5:20], self.mv_array[3:7, 5:20])
+                np.testing.assert_equal(f[-1], self.mv_array[-1])
+        sparse_size = os.path.getsize(file_name)
+
+        write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names,
+                      compression=False, sparse=False)
+        data_array, metric_2, basis_names_2, support = read_ga_file(file_name)
+        np.testing.assert_equal(data_array, self.mv_array)
+        self.assertIsNone(support)
+        assert os.path.getsize(file_name) > 3 * sparse_size
+
+    def test_explicit_support(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        support = np.flatnonzero(layout.grade_mask(3))
+        write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names,
+                      sparse=True, support=support)
+        data_array, metric_2, basis_names_2, support_2 = read_ga_file(file_name)
+        np.testing.assert_equal(data_array, self.mv_array)
+        np.testing.assert_equal(support_2, support)
+
+        with GAFileWriter(file_name, layout.metric, self.basis_names, mode='a') as writer:
+            writer.append(self.mv_array[:10])
+            with self.assertRaises(ValueError):
+                writer.append(layout.randomMV().value)
+        data_array, metric_2, basis_names_2, support_2 = read_ga_file(file_name)
+        np.testing.assert_equal(data_array[-10:], self.mv_array[:10])
+
+        with self.assertRaises(ValueError):
+            write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names,
+                          sparse=True, support=[layout.gaDims])
+        with self.assertRaises(ValueError):
+            GAFileWriter(file_name, layout.metric, self.basis_names, sparse=True)
+
+    def test_mvarray_save(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        mv_array = MVArray([random_line() for i in range(10)])
+        mv_array.save(file_name)
+        loaded_array = layout.load_ga_file(file_name)
+        np.testing.assert_equal(loaded_array.value, mv_array.value)
+
+
+class TestHDF5MemoryMap(_TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.basis_names = np.array(list(sorted(layout.basis_vectors.keys())), dtype=bytes)
+        self.mv_array = ConformalMVArray([random_point_pair() for i in range(1000)]).value
+
+    def test_read_mmap(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        for transpose in [False, True]:
+            write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names,
+                          compression=False, transpose=transpose, sparse=False)
+            data_array, metric_2, basis_names_2, support = read_ga_file(file_name, mmap=True)
+            assert isinstance(data_array, np.memmap)
+            assert not data_array.flags.writeable
+            np.testing.assert_equal(data_array, self.mv_array)
+            np.testing.assert_equal(layout.metric, metric_2)
+
+            # contiguous files cannot grow
+            with self.assertRaises(ValueError):
+                GAFileWriter(file_name, layout.metric, self.basis_names, mode='a')
+
+    def test_read_mmap_default_sparse(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        # point pairs would be stored sparsely if they were compressed
+        write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names, compression=False)
+        data_array, metric_2, basis_names_2, support = read_ga_file(file_name, mmap=True)
+        assert isinstance(data_array, np.memmap)
+        self.assertIsNone(support)
+        np.testing.assert_equal(data_array, self.mv_array)
+
+        mv_array = DenseMVArray(layout, self.mv_array)
+        mv_array.save(file_name, compression=False)
+        np.testing.assert_equal(DenseMVArray.open(layout, file_name).value, mv_array.value)
+
+    def test_cannot_mmap(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names, compression=True)
+        with self.assertRaises(ValueError):
+            read_ga_file(file_name, mmap=True)
+        write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names,
+                      compression=False, chunk_rows=100)
+        with self.assertRaises(ValueError):
+            read_ga_file(file_name, mmap=True)
+        write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names,
+                      compression=False, sparse=True)
+        with self.assertRaises(ValueError):
+            read_ga_file(file_name, mmap=True)
+
+    def test_dense_mvarray_open(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        mv_array = DenseMVArray(layout, self.mv_array)
+        mv_array.save(file_name, compression=False, sparse=False)
+        loaded_array = DenseMVArray.open(layout, file_name)
+        np.testing.assert_equal(loaded_array.value, mv_array.value)
+        np.testing.assert_equal((loaded_array * loaded_array).value, (mv_array * mv_array).value)
+        with self.assertRaises(ValueError):
+            DenseMVArray.open(Cl(3)[0], file_name)
+
+
+class TestHDF5Compression(_TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.basis_names = np.array(list(sorted(layout.basis_vectors.keys())), dtype=bytes)
+        self.mv_array = ConformalMVArray([random_line() for i in range(1000)]).value
+
+    def test_compressors(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        for compression in [True, 'gzip', 'lzf']:
+            for shuffle in [False, True]:
+                for transpose in [False, True]:
+                    for threads in [1, 4]:
+                        write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names,
+                                      compression=compression, shuffle=shuffle, transpose=transpose,
+                                      chunk_rows=64, threads=threads)
+                        with h5py.File(file_name, 'r') as f:
+                            self.assertEqual(f['data'].compression, 'lzf' if compression == 'lzf' else 'gzip')
+                            self.assertEqual(f['data'].shuffle, shuffle)
+                        for read_threads in [1, 4]:
+                            with GAFile(file_name, threads=read_threads) as f:
+                                np.testing.assert_equal(f[:], self.mv_array)
+                                np.testing.assert_equal(f[100:300], self.mv_array[100:300])
+                                np.testing.assert_equal(f[-10:], self.mv_array[-10:])
+                                np.testing.assert_equal(f[10:500:3], self.mv_array[10:500:3])
+
+    def test_parallel_append(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        for transpose in [False, True]:
+            with GAFileWriter(file_name, layout.metric, self.basis_names, shuffle=True,
+                              transpose=transpose, chunk_rows=64, threads=4) as writer:
+                # partial chunks on both sides of whole ones
+                writer.append(self.mv_array[:10])
+                writer.append(self.mv_array[10:500])
+                writer.append(self.mv_array[500])
+            with GAFileWriter(file_name, layout.metric, None, mode='a', threads=4) as writer:
+                writer.append(self.mv_array[501:])
+            # chunks compressed in parallel can be read by HDF5 itself
+            data_array, metric_2, basis_names_2, support = read_ga_file(file_name, threads=1)
+            np.testing.assert_equal(data_array, self.mv_array)
+            data_array, metric_2, basis_names_2, support = read_ga_file(file_name, threads=4)
+            np.testing.assert_equal(data_array, self.mv_array)
+
+    @unittest.skipUnless(hdf5plugin_available, 'hdf5plugin is not installed')
+    def test_blosc(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        for compression in ['blosc', 'blosc:lz4', 'blosc:zstd']:
+            for shuffle in [False, True]:
+                write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names,
+                              compression=compression, shuffle=shuffle)
+                data_array, metric_2, basis_names_2, support = read_ga_file(file_name)
+                np.testing.assert_equal(data_array, self.mv_array)
+
+    def test_invalid(self):
+        file_name = os.path.join(self.tmpdir, "test.ga")
+        for compression in ['zip', 'blosc:zip']:
+            with self.assertRaises(ValueError):
+                write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names,
+                              compression=compression)
+        with self.assertRaises(ValueError):
+            write_ga_file(file_name, self.mv_array, layout.metric, self.basis_names, threads=0)
+
+
+class TestJSONBasicIO(_TempDirTestCase):
 
     def test_write_and_read(self):
-        file_name = "test.ga.json"
+        file_name = os.path.join(self.tmpdir, "test.ga.json")
 
         basis_names = np.array(list(sorted(layout.basis_vectors.keys())))
 
@@ -58,8 +328,49 @@ class TestJSONBasicIO(unittest.TestCase):
         np.testing.assert_equal(layout.metric, metric_2)
         np.testing.assert_equal(basis_names, basis_names_2)
 
+    def test_encodings(self):
+        file_name = os.path.join(self.tmpdir, "test.ga.json")
+
+        basis_names = np.array(list(sorted(layout.basis_vectors.keys())))
+
+        mv_array = ConformalMVArray([random_point_pair() for i in range(1000)]).value
+        for encoding in ['base64', 'buffer', 'list']:
+            for transpose in [False, True]:
+                write_json_file(file_name, mv_array, layout.metric, basis_names,
+                                transpose=transpose, encoding=encoding)
+                data_array, metric_2, basis_names_2, support = read_json_file(file_name)
+                np.testing.assert_equal(data_array, mv_array)
+                np.testing.assert_equal(layout.metric, metric_2)
+                np.testing.assert_equal(basis_names, basis_names_2)
+                self.assertIsNone(support)
+                # the loaded data can be modified
+                data_array[0] = 0
+
+        with self.assertRaises(ValueError):
+            write_json_file(file_name, mv_array, layout.metric, basis_names, encoding='csv')
+
+    def test_sparse(self):
+        file_name = os.path.join(self.tmpdir, "test.ga.json")
+
+        basis_names = np.array(list(sorted(layout.basis_vectors.keys())))
+
+        mv_array = ConformalMVArray([random_line() for i in range(100)]).value
+        for encoding in ['base64', 'buffer']:
+            write_json_file(file_name, mv_array, layout.metric, basis_names,
+                            sparse=True, encoding=encoding)
+            data_array, metric_2, basis_names_2, support = read_json_file(file_name)
+            np.testing.assert_equal(data_array, mv_array)
+            assert set(layout.gradeList[i] for i in support) == {3}
+
+        support = np.flatnonzero(layout.grade_mask(3))
+        write_json_file(file_name, mv_array, layout.metric, basis_names,
+                        sparse=True, support=support, transpose=True)
+        data_array, metric_2, basis_names_2, support_2 = read_json_file(file_name)
+        np.testing.assert_equal(data_array, mv_array)
+        np.testing.assert_equal(support_2, support)
+
     # def test_write_and_read_array(self):
-    #     file_name = "test.ga.json"
+    #     file_name = os.path.join(self.tmpdir, "test.ga.json")
     #
     #     mv_array = MVArray([random_point_pair() for i in range(1000)])
     #     mv_array.save(file_name, compression=True, transpose=False, sparse=False, support=False)
@@ -0,0 +1,152 @@
+import pytest
+import numpy as np
+
+from clifford import Cl, conformalize, jit_expr, MultiVector
+
+
+@pytest.fixture(
+    params=[Cl(3), Cl(3, 0, 1), conformalize(Cl(3)[0]), Cl(6, engine='bitmap')],
+    ids=['Cl(3)', 'Cl(3, 0, 1)', 'conformal Cl(3)', 'Cl(6) bitmap']
+)
+def algebra(request):
+    return request.param
+
+
+class TestJitExpr:
+
+    @pytest.mark.parametrize('func', [
+        lambda a, b: a * b * ~a,
+        lambda a, b: (a ^ b) | b,
+        lambda a, b: a << b,
+        lambda a, b: a + 2 - b,
+        lambda a, b: 3 - a * 2 + b / 4,
+        lambda a, b: -a(1) * b(2),
+        lambda a, b: (a * b)(0, 2),
+        lambda a, b: (a ^ b).normal(),
+        lambda a, b: abs(a) * b + a.mag2(),
+        lambda a, b: a / abs(b),
+        lambda a, b: 2 ^ a ^ b,
+    ], ids=[
+        'sandwich', 'inner', 'lc', 'sum', 'scalars', 'grades', 'projection',
+        'normal', 'abs', 'div', 'outer'
+    ])
+    def test_matches_python(self, algebra, func):
+        layout = algebra[0]
+        fused = jit_expr(layout)(func)
+        a = layout.randomMV()
+        b = layout.randomMV()
+        res = fused(a, b)
+        assert isinstance(res, MultiVector)
+        np.testing.assert_almost_equal(res.value, func(a, b).value)
+
+    def test_constants(self, algebra):
+        layout = algebra[0]
+        e1 = layout.blades_list[1]
+
+        @jit_expr(layout)
+        def f(a):
+            return e1 * a + (a ^ e1) + 1
+
+        a = layout.randomMV()
+        np.testing.assert_almost_equal(f(a).value, (e1 * a + (a ^ e1) + 1).value)
+
+    def test_grades(self, algebra):
+        layout = algebra[0]
+
+        @jit_expr(layout, grades=[[1], None])
+        def f(a, b):
+            return a * b
+
+        a = layout.randomMV()
+        b = layout.randomMV()
+        # other grades of `a` are ignored
+        np.testing.assert_almost_equal(f(a, b).value, (a(1) * b).value)
+
+        with pytest.raises(ValueError):
+            jit_expr(layout, grades=[[1]])(lambda a, b: a * b)
+
+    def test_zero_structure(self, algebra):
+        layout = algebra[0]
+
+        @jit_expr(layout, grades=[[1]])
+        def wedge_self(x):
+            return x ^ x
+
+        assert 'out[' not in wedge_self.source.split('def fused_batch')[0]
+        assert wedge_self(layout.randomMV()) == 0
+
+        # the grade 3 part only cancels once every product is expanded
+        @jit_expr(layout, grades=[range(0, layout.dims + 1, 2), [1]])
+        def sandwich(R, X):
+            return R * X * ~R
+
+        grade_3 = [i for i, g in enumerate(layout.gradeList) if g == 3]
+        assert not any('out[{}]'.format(i) in sandwich.source for i in grade_3)
+        R = layout.randomRotor()
+        X = layout.randomV()
+        np.testing.assert_almost_equal(sandwich(R, X).value, (R * X * ~R).value)
+
+    def test_common_subexpressions(self, algebra):
+        layout = algebra[0]
+        once = jit_expr(layout)(lambda a, b: a * b)
+        twice = jit_expr(layout)(lambda a, b: (a * b) + (a * b))
+        assert once.source.count(' * ') == twice.source.count(' * ')
+
+    def test_batch(self, algebra):
+        layout = algebra[0]
+
+        @jit_expr(layout)
+        def f(a, b):
+            return a * b * ~a + 1
+
+        a = np.random.randn(3, 1, layout.gaDims)
+        b = np.random.randn(4, layout.gaDims)
+        res = f.batch(a, b)
+        assert res.shape == (3, 4, layout.gaDims)
+        for i in range(3):
+            for j in range(4):
+                expected = f(layout.MultiVector(value=a[i, 0]), layout.MultiVector(value=b[j]))
+                np.testing.assert_almost_equal(res[i, j], expected.value)
+
+        out = np.full((3, 4, layout.gaDims), np.nan)
+        assert f.batch(a, b, out=out) is out
+        np.testing.assert_equal(out, res)
+
+        # the output may be one of the arguments
+        a_full = np.broadcast_to(a, res.shape).copy()
+        assert f.batch(a_full, b, out=a_full) is a_full
+        np.testing.assert_almost_equal(a_full, res)
+
+        with pytest.raises(ValueError):
+            f.batch(a, b, out=np.empty((4, layout.gaDims)))
+        with pytest.raises(ValueError):
+            f.batch(a, b[:, :-1])
+
+    def test_dtype(self, algebra):
+        layout = algebra[0]
+        a = MultiVector(layout, np.arange(layout.gaDims))
+
+        f = jit_expr(layout)(lambda a: a * a - 1)
+        assert f(a).value.dtype == (a * a - 1).value.dtype
+        np.testing.assert_equal(f(a).value, (a * a - 1).value)
+
+        f = jit_expr(layout)(lambda a: a / 2)
+        np.testing.assert_equal(f(a).value, (a / 2).value)
+
+        a = a.astype(np.float32)
+        assert f(a).value.dtype == np.float32
+
+    def test_errors(self, algebra):
+        layout = algebra[0]
+        f = jit_expr(layout)(lambda a, b: a * b)
+        a = layout.randomMV()
+        with pytest.raises(TypeError):
+            f(a)
+        with pytest.raises(TypeError):
+            f(a, 1)
+        with pytest.raises(ValueError):
+            f(a, Cl(2)[0].randomMV())
+        with pytest.raises(TypeError):
+            jit_expr(layout)(lambda a, b: a / b)
+        with pytest.raises(TypeError):
+            jit_expr(layout)(lambda a: None)
@@ -0,0 +1,171 @@
+import gc
+import operator
+import weakref
+
+import pytest
+import numpy as np
+import numba
+
+from clifford import Cl, conformalize, MultiVector
+
+
+@pytest.fixture(
+    params=[Cl(3), Cl(3, 0, 1), conformalize(Cl(3)[0]), Cl(3, engine='unrolled'), Cl(6, engine='bitmap')],
+    ids=['Cl(3)', 'Cl(3, 0, 1)', 'conformal Cl(3)', 'Cl(3) unrolled', 'Cl(6) bitmap']
+)
+def algebra(request):
+    return request.param
+
+
+class TestNumbaTypes:
+
+    def test_roundtrip(self, algebra):
+        layout = algebra[0]
+
+        @numba.njit
+        def identity(x):
+            return x
+
+        mv = layout.randomMV()
+        res = identity(mv)
+        assert isinstance(res, MultiVector)
+        assert res.layout is layout
+        np.testing.assert_equal(res.value, mv.value)
+        assert identity(layout) is layout
+
+    def test_attributes(self, algebra):
+        layout = algebra[0]
+
+        @numba.njit
+        def unpack(x):
+            return x.layout, x.value
+
+        mv = layout.randomMV()
+        res_layout, res_value = unpack(mv)
+        assert res_layout is layout
+        np.testing.assert_equal(res_value, mv.value)
+
+    def test_construction(self, algebra):
+        layout = algebra[0]
+
+        @numba.njit
+        def construct(layout, value):
+            return MultiVector(layout, value), layout.MultiVector(value)
+
+        value = np.arange(layout.gaDims, dtype=np.float64)
+        for res in construct(layout, value):
+            assert res.layout is layout
+            np.testing.assert_equal(res.value, value)
+
+    @pytest.mark.parametrize('op', [
+        operator.add,
+        operator.sub,
+        operator.mul,
+        operator.xor,
+        operator.or_,
+        operator.lshift,
+    ])
+    def test_binary_ops(self, algebra, op):
+        layout = algebra[0]
+
+        @numba.njit
+        def f(a, b):
+            return op(a, b)
+
+        a = layout.randomMV()
+        b = layout.randomMV()
+        np.testing.assert_almost_equal(f(a, b).value, op(a, b).value)
+
+        # scalars, on either side
+        if op is not operator.lshift:
+            np.testing.assert_almost_equal(f(a, 2.0).value, op(a, 2.0).value)
+            np.testing.assert_almost_equal(f(2.0, b).value, op(2.0, b).value)
+
+    def test_unary_ops(self, algebra):
+        layout = algebra[0]
+
+        @numba.njit
+        def f(a):
+            return ~a, -a, +a, a / 2, a(2)
+
+        mv = layout.randomMV()
+        expected = ~mv, -mv, +mv, mv / 2, mv(2)
+        for r, e in zip(f(mv), expected):
+            np.testing.assert_almost_equal(r.value, e.value)
+
+    def test_sandwich(self, algebra):
+        layout = algebra[0]
+
+        @numba.njit
+        def apply(R, x):
+            return R * x * ~R
+
+        R = layout.randomRotor()
+        x = layout.randomV()
+        np.testing.assert_almost_equal(apply(R, x).value, (R * x * ~R).value)
+
+    def test_dtype(self, algebra):
+        layout = algebra[0]
+
+        @numba.njit
+        def f(a):
+            return a + 1, a * 2
+
+        mv = MultiVector(layout, np.arange(layout.gaDims))
+        for r, e in zip(f(mv), (mv + 1, mv * 2)):
+            assert r.value.dtype == e.value.dtype
+            np.testing.assert_equal(r.value, e.value)
+
+    def test_globals(self, algebra):
+        layout = algebra[0]
+        e1 = layout.blades_list[1]
+
+        @numba.njit
+        def f(a):
+            return e1 * a
+
+        mv = layout.randomMV()
+        np.testing.assert_almost_equal(f(mv).value, (e1 * mv).value)
+
+    def test_different_layouts(self):
+        layout_a, blades_a = Cl(3)
+        layout_b, blades_b = Cl(4)
+
+        @numba.njit
+        def f(a, b):
+            return a * b
+
+        with pytest.raises(numba.TypingError):
+            f(blades_a['e1'], blades_b['e1'])
+
+    def test_no_aliasing(self, algebra):
+        layout = algebra[0]
+
+        @numba.njit
+        def f(a):
+            return a, MultiVector(a.layout, a.value)
+
+        mv = layout.randomMV()
+        res_a, res_b = f(mv)
+        assert res_a.value is not mv.value
+        assert not np.shares_memory(res_a.value, mv.value)
+        assert not np.shares_memory(res_a.value, res_b.value)
+        np.testing.assert_equal(res_b.value, mv.value)
+
+    def test_layout_not_kept_alive(self):
+        layout, blades = Cl(3)
+        layout_type = numba.typeof(layout)
+        assert layout_type.obj is layout
+        # equal layouts are still different types
+        assert numba.typeof(Cl(3)[0]) != layout_type
+
+        layout_ref = weakref.ref(layout)
+        del layout, blades
+        gc.collect()
+        assert layout_ref() is None
+        with pytest.raises(ReferenceError):
+            layout_type.obj
+
+        # the key of the dead layout is not reused
+        for i in range(5):
+            assert numba.typeof(Cl(3)[0]) != layout_type
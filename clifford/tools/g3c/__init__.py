@@ -174,11 +174,11 @@ ninf = einf
 no = -eo
 
 # Define some useful objects
-E = ninf ^ (no)
+# E0 comes from clifford.g3c, and is ninf ^ -no
+E = -E0
 I5 = e12345
 I3 = e123
-E0 = ninf ^ -no
-niono = ninf ^ no
+niono = -E0
 E0_val = E0.value
 I5_val = I5.value
 ninf_val = ninf.value
@@ -189,6 +189,15 @@ eo_val = eo.value
 unit_scalar_mv = 1.0 + 0.0*e1
 unit_scalar_mv_val = unit_scalar_mv.value
 
+# Single precision copies of the constants above, which are all exact. Values
+# of any type can be combined with these without being upcast, which the
+# point cloud helpers below rely on to keep float32 values in float32.
+_E0_val32 = E0_val.astype(np.float32)
+_I5_val32 = I5_val.astype(np.float32)
+_ninf_val32 = ninf_val.astype(np.float32)
+_no_val32 = no_val.astype(np.float32)
+_half_ninf_val32 = _ninf_val32 / 2
+
 adjoint_func = layout.adjoint_func
 gmt_func = layout.gmt_func
 omt_func = layout.omt_func
@@ -775,7 +784,7 @@ def random_rotation_translation_rotor(maximum_translation=10.0, maximum_angle=np
 @numba.njit
 def project_val(val, grade):
     """ fast grade projection """
-    output = np.zeros(32)
+    output = np.zeros(32, dtype=val.dtype)
     if grade == 0:
         output[0] = val[0]
     elif grade == 1:
@@ -822,7 +831,7 @@ def val_generate_translation_rotor(euc_vector_a):
     """
     Generates a rotor that translates objects along the euclidean vector euc_vector_a
     """
-    T = gmt_func(ninf_val, euc_vector_a) / 2
+    T = gmt_func(_half_ninf_val32, euc_vector_a)
     T[0] += 1
     return T
 
@@ -882,7 +891,7 @@ def val_normalise_n_minus_1(mv_val):
     """
     Normalises a conformal point so that it has an inner product of -1 with einf
     """
-    scale = imt_func(mv_val, ninf_val)[0]
+    scale = imt_func(mv_val, _ninf_val32)[0]
     if scale != 0.0:
         return -mv_val/scale
     else:
@@ -1707,9 +1716,9 @@ def convert_2D_polar_line_to_conformal_line(rho, theta):
 @numba.njit
 def val_up(mv_val):
     """ Fast jitted up mapping """
-    temp = np.zeros(32)
+    temp = np.zeros(32, dtype=np.float32)
     temp[0] = 0.5
-    return mv_val - no_val + omt_func(temp, gmt_func(gmt_func(mv_val, mv_val), ninf_val))
+    return mv_val - _no_val32 + omt_func(temp, gmt_func(gmt_func(mv_val, mv_val), _ninf_val32))
 
 
 def fast_up(mv):
@@ -1728,13 +1737,13 @@ def val_normalInv(mv_val):
 @numba.njit
 def val_homo(mv_val):
     """ A fast, jitted version of homo() """
-    return gmt_func(mv_val, val_normalInv(imt_func(-mv_val, ninf_val)))
+    return gmt_func(mv_val, val_normalInv(imt_func(-mv_val, _ninf_val32)))
 
 
 @numba.njit
 def val_down(mv_val):
     """ A fast, jitted version of down() """
-    return gmt_func(omt_func(val_homo(mv_val), E0_val), E0_val)
+    return gmt_func(omt_func(val_homo(mv_val), _E0_val32), _E0_val32)
 
 
 def fast_down(mv):
@@ -1778,7 +1787,7 @@ def dual_func(a_val):
     """
     Fast dual
     """
-    return dual_gmt_func(I5_val, a_val)
+    return dual_gmt_func(_I5_val32, a_val)
 
 
 def fast_dual(a):
@@ -1825,6 +1834,10 @@ class ConformalMVArray(cf.MVArray):
         """
         Application of a rotor
         """
+        if isinstance(R, cf.MultiVector):
+            # a single rotor can be applied to every element in one go
+            M = layout.get_versor_matrix(R)
+            return ConformalMVArray.from_value_array(self.value @ M.T)
         R_inv = ~R
         return v_apply_rotor_inv(self, R, R_inv)
 
@@ -1,5 +1,6 @@
 
 from . import *
+import clifford as cf
 from clifford import NUMBA_PARALLEL, MVArray
 import itertools
 from .rotor_parameterisation import general_logarithm
@@ -236,49 +237,74 @@ def object_set_cost_sum(object_set_a, object_set_b,
 
 
 @numba.njit(parallel=NUMBA_PARALLEL, nogil=True)
-def val_object_set_cost_matrix(object_array_a, object_array_b):
+def val_object_set_cost_matrix(object_array_a, object_array_b, n_workers=1, chunk_size=1):
     """
     Evaluates the rotor cost matrix between two sets of objects
-    """
-    matrix = np.zeros((object_array_a.shape[0], object_array_b.shape[0]))
-    for a_ind in range(object_array_a.shape[0]):
-        l_a = object_array_a[a_ind, :]
-        for b_ind in range(object_array_b.shape[0]):
-            l_b = object_array_b[b_ind, :]
-            matrix[a_ind, b_ind] = val_object_cost_function(l_a, l_b)
+
+    The rows are split between `n_workers` threads, which take `chunk_size`
+    rows at a time.
+    """
+    n_a = object_array_a.shape[0]
+    matrix = np.zeros((n_a, object_array_b.shape[0]))
+    for worker in numba.prange(n_workers):
+        for start in range(worker * chunk_size, n_a, n_workers * chunk_size):
+            for a_ind in range(start, min(n_a, start + chunk_size)):
+                l_a = object_array_a[a_ind, :]
+                for b_ind in range(object_array_b.shape[0]):
+                    l_b = object_array_b[b_ind, :]
+                    matrix[a_ind, b_ind] = val_object_cost_function(l_a, l_b)
     return matrix
 
 
 @numba.njit(parallel=NUMBA_PARALLEL, nogil=True)
-def val_line_set_cost_matrix(object_array_a, object_array_b):
+def val_line_set_cost_matrix(object_array_a, object_array_b, n_workers=1, chunk_size=1):
     """
     Evaluates the rotor cost matrix between two sets of objects
-    """
-    matrix = np.zeros((object_array_a.shape[0], object_array_b.shape[0]))
-    for a_ind in range(object_array_a.shape[0]):
-        l_a = object_array_a[a_ind, :]
-        for b_ind in range(object_array_b.shape[0]):
-            l_b = object_array_b[b_ind, :]
-            matrix[a_ind, b_ind] = val_line_cost_function(l_a, l_b)
+
+    The rows are split between `n_workers` threads, which take `chunk_size`
+    rows at a time.
+    """
+    n_a = object_array_a.shape[0]
+    matrix = np.zeros((n_a, object_array_b.shape[0]))
+    for worker in numba.prange(n_workers):
+        for start in range(worker * chunk_size, n_a, n_workers * chunk_size):
+            for a_ind in range(start, min(n_a, start + chunk_size)):
+                l_a = object_array_a[a_ind, :]
+                for b_ind in range(object_array_b.shape[0]):
+                    l_b = object_array_b[b_ind, :]
+                    matrix[a_ind, b_ind] = val_line_cost_function(l_a, l_b)
     return matrix
 
 
+def _cost_matrix_schedule(n_a, n_b):
+    """
+    Split the rows of an ``(n_a, n_b)`` cost matrix into chunks of about
+    `clifford.batch_chunk_size` elements, between `clifford.batch_threads`
+    threads
+    """
+    n_workers, chunk_size = cf._batch_schedule(n_a * n_b)
+    return n_workers, max(1, chunk_size // max(n_b, 1))
+
+
 def object_set_cost_matrix(object_set_a, object_set_b,
                            object_type="generic", symmetric=False):
     """
     Evaluates the rotor cost matrix between two sets of objects
+
+    This is computed in parallel, see :func:`clifford.batch_threads`.
     """
     object_array_a = MVArray(object_set_a).value
     object_array_b = MVArray(object_set_b).value
+    schedule = _cost_matrix_schedule(len(object_array_a), len(object_array_b))
     if object_type == 'lines':
-        ret_mat = val_line_set_cost_matrix(object_array_a, object_array_b)
+        ret_mat = val_line_set_cost_matrix(object_array_a, object_array_b, *schedule)
         if symmetric:
-            ret_mat = np.minimum(ret_mat, val_line_set_cost_matrix(object_array_a, -object_array_b))
+            ret_mat = np.minimum(ret_mat, val_line_set_cost_matrix(object_array_a, -object_array_b, *schedule))
         return ret_mat
     else:
-        ret_mat = val_object_set_cost_matrix(object_array_a, object_array_b)
+        ret_mat = val_object_set_cost_matrix(object_array_a, object_array_b, *schedule)
         if symmetric:
-            ret_mat = np.minimum(ret_mat, val_object_set_cost_matrix(object_array_a, -object_array_b))
+            ret_mat = np.minimum(ret_mat, val_object_set_cost_matrix(object_array_a, -object_array_b, *schedule))
         return ret_mat
 
 
@@ -9,7 +9,6 @@ from . import apply_rotor
 from .cost_functions import object_set_cost_matrix, object_cost_function, check_p_cost
 import numpy as np
 from clifford.g3c import *
-from clifford.tools.g3c.cuda import sequential_rotor_estimation_cuda_mvs
 
 import clifford as cf
 
@@ -245,6 +244,9 @@ def REFORM_sequential(reference_model, query_model, n_samples=100, objects_per_s
 
 def REFORM_cuda(reference_model, query_model, n_samples=100, objects_per_sample=5, iterations=100,
                 covergence_threshold=0.00000001, mutation_probability=None, start_labels=None):
+    # imported here, since importing numba.cuda is slow
+    from clifford.tools.g3c.cuda import sequential_rotor_estimation_cuda_mvs
+
     #  Get the starting labels
     if start_labels is None:
         labels, costs = assign_measurements_to_objects_matrix(reference_model, query_model,
@@ -8,8 +8,6 @@ from . import average_objects
 from .rotor_estimation import estimate_rotor_objects
 from .GAOnline import GAScene
 
-from .cuda import object_set_cost_cuda_mvs
-
 
 def compare_labels(old_labels, new_labels):
     """
@@ -29,6 +27,8 @@ def assign_measurements_to_objects_matrix(objects, objects_measurements, object_
     Assigns each object in objects_measurements to one in objects based on minimum cost
     """
     if cuda:
+        # imported here, since importing numba.cuda is slow
+        from .cuda import object_set_cost_cuda_mvs
         matrix = object_set_cost_cuda_mvs(objects, objects_measurements)
     else:
         matrix = object_set_cost_matrix(objects, objects_measurements,
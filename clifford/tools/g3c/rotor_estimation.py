@@ -475,10 +475,10 @@ def sequential_rotor_estimation_jit(reference_model, query_model, rotor_output,
             r_temp[0] += 1.0
             r_root = pos_twiddle_root_val(r_temp)[0, :]
 
-            # Update the set rotor and the running rotor
-            r_temp = gmt_func(r_root, r_set)
+            # Update the set rotor and the running rotor, reusing r_temp
+            gmt_func(r_root, r_set, r_temp)
             r_set = val_normalised(r_temp)
-            r_temp = gmt_func(r_root, r_running)
+            gmt_func(r_root, r_running, r_temp)
             r_running = val_normalised(r_temp)
 
             # Check if we have converged
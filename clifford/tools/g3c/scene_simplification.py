@@ -2,7 +2,6 @@
 import numpy as np
 from . import average_objects
 from .cost_functions import object_set_cost_matrix, object_cost_function
-from .cuda import object_set_cost_cuda_mvs
 import random
 from clifford.g3c import *
 